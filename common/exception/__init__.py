@@ -2,14 +2,24 @@ from .custom_exceptions import (
     BaseCustomException,
     VectorOperationException,
     FileOperationException,
+    FileTooLargeException,
     ModelOperationException,
-    IndexOperationException
+    IndexOperationException,
+    IndexNotReadyException,
+    ServiceOverloadedException,
+    OperationTimeoutException,
+    CircuitOpenException
 )
 
 __all__ = [
     'BaseCustomException',
     'VectorOperationException',
     'FileOperationException',
+    'FileTooLargeException',
     'ModelOperationException',
-    'IndexOperationException'
+    'IndexOperationException',
+    'IndexNotReadyException',
+    'ServiceOverloadedException',
+    'OperationTimeoutException',
+    'CircuitOpenException'
 ] 
\ No newline at end of file
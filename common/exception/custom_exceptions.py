@@ -18,4 +18,24 @@ class ModelOperationException(BaseCustomException):
 
 class IndexOperationException(BaseCustomException):
     """索引操作相关异常"""
-    pass 
\ No newline at end of file
+    pass
+
+class IndexNotReadyException(IndexOperationException):
+    """索引尚未加载完成"""
+    pass
+
+class FileTooLargeException(FileOperationException):
+    """上传文件超过大小限制"""
+    pass
+
+class ServiceOverloadedException(BaseCustomException):
+    """任务队列已满，拒绝新的请求"""
+    pass
+
+class OperationTimeoutException(BaseCustomException):
+    """操作超时"""
+    pass
+
+class CircuitOpenException(ModelOperationException):
+    """熔断器已打开，暂时拒绝对该后端的调用"""
+    pass
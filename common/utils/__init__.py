@@ -3,6 +3,7 @@
 
 这个包提供了项目中常用的工具函数，包括：
 - 文件处理工具 (file_utils)
+- 文本分块工具 (chunk_utils)
 - 日志工具 (logger)
 - 时间处理工具 (time_utils)
 - 向量处理工具 (vector_utils)
@@ -11,16 +12,31 @@
 # 文件处理工具
 from .file_utils import (
     clean_text,
+    compute_file_hash,
     load_text_file,
     load_docx_file,
     load_pdf_file,
     load_markdown_file,
     load_excel_file,
+    iter_document_text,
+    iter_pdf_pages,
+    configure_parsing,
+    register_extractor,
+    get_extractor,
     load_documents_from_directory,
     get_default_documents,
     create_example_files
 )
 
+# 文本分块工具
+from .chunk_utils import (
+    FixedSizeChunker,
+    SentenceChunker,
+    create_chunker,
+    register_chunker,
+    available_chunkers
+)
+
 # 日志工具
 from .logger import (
     setup_logger,
@@ -40,15 +56,28 @@ from .vector_utils import VectorUtils
 __all__ = [
     # 文件处理工具
     'clean_text',
+    'compute_file_hash',
     'load_text_file',
     'load_docx_file',
     'load_pdf_file',
     'load_markdown_file',
     'load_excel_file',
+    'iter_document_text',
+    'iter_pdf_pages',
+    'configure_parsing',
+    'register_extractor',
+    'get_extractor',
     'load_documents_from_directory',
     'get_default_documents',
     'create_example_files',
     
+    # 文本分块工具
+    'FixedSizeChunker',
+    'SentenceChunker',
+    'create_chunker',
+    'register_chunker',
+    'available_chunkers',
+    
     # 日志工具
     'setup_logger',
     'get_logger',
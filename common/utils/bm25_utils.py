@@ -0,0 +1,303 @@
+import os
+import re
+import math
+import sqlite3
+import logging
+import threading
+from collections import Counter
+from typing import List, Dict, Any, Iterable, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 尝试导入可能不存在的包
+try:
+    import jieba
+    jieba.setLogLevel(logging.WARNING)
+    JIEBA_AVAILABLE = True
+except ImportError:
+    JIEBA_AVAILABLE = False
+
+# 标识符(产品编号、错误码、版本号等)整体作为一个词，同时拆出各个部分
+_IDENTIFIER_PATTERN = re.compile(r'[a-z0-9]+(?:[-_.:/][a-z0-9]+)*')
+_CJK_PATTERN = re.compile(r'[\u3400-\u9fff\uf900-\ufaff]+')
+_PART_PATTERN = re.compile(r'[a-z0-9]+')
+
+
+def tokenize(text: str, use_jieba: bool = True) -> List[str]:
+    """
+    分词: 英文/数字按标识符切分，中文使用 jieba 搜索引擎模式，未安装 jieba 时使用单字+二元组
+
+    Args:
+        text: 文本
+        use_jieba: 是否使用 jieba 切分中文
+
+    Returns:
+        词列表(小写)
+    """
+    text = text.lower()
+    tokens = []
+    for match in _IDENTIFIER_PATTERN.finditer(text):
+        identifier = match.group(0)
+        tokens.append(identifier)
+        parts = _PART_PATTERN.findall(identifier)
+        if len(parts) > 1:
+            tokens.extend(parts)
+    for match in _CJK_PATTERN.finditer(text):
+        segment = match.group(0)
+        if use_jieba and JIEBA_AVAILABLE:
+            tokens.extend(word for word in jieba.lcut_for_search(segment) if word.strip())
+        else:
+            tokens.extend(segment)
+            tokens.extend(segment[i:i + 2] for i in range(len(segment) - 1))
+    return tokens
+
+
+class BM25Index:
+    """
+    基于SQLite倒排表的BM25词法索引
+
+    与向量索引使用相同的分块ID，随分块的写入/删除增量更新；
+    用于补充向量检索对产品编号、错误码等精确标识符的召回。
+    写入使用一个连接并加锁；检索使用每个线程自己的只读连接(WAL 模式下读写互不阻塞)。
+    """
+
+    # SQLite 单条语句的参数数量上限
+    _BATCH_SIZE = 500
+
+    def __init__(self, db_path: str, k1: float = 1.5, b: float = 0.75, use_jieba: bool = True,
+                 max_df_ratio: float = 0.5, max_postings_per_term: int = 1000):
+        """
+        初始化词法索引
+
+        Args:
+            db_path: SQLite数据库文件路径
+            k1: BM25 词频饱和参数
+            b: BM25 文档长度归一化参数
+            use_jieba: 是否使用 jieba 切分中文
+            max_df_ratio: 出现在超过该比例分块中的词视为停用词，检索时忽略
+            max_postings_per_term: 每个查询词最多读取的倒排项数(按该词的 BM25 贡献从高到低)
+        """
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.db_path = db_path
+        self.k1 = k1
+        self.b = b
+        self.use_jieba = use_jieba
+        self.max_df_ratio = max_df_ratio
+        self.max_postings_per_term = max_postings_per_term
+        if use_jieba and not JIEBA_AVAILABLE:
+            logger.warning("jieba 未安装，中文按单字和二元组切分")
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS postings (
+                term TEXT NOT NULL,
+                chunk_id INTEGER NOT NULL,
+                tf INTEGER NOT NULL,
+                PRIMARY KEY (term, chunk_id)
+            ) WITHOUT ROWID
+        """)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS chunk_lengths (
+                chunk_id INTEGER PRIMARY KEY,
+                length INTEGER NOT NULL
+            )
+        """)
+        # 每个词出现的分块数(df)，检索时先按 df 跳过停用词，不读取其倒排表
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS term_stats (
+                term TEXT PRIMARY KEY,
+                df INTEGER NOT NULL
+            ) WITHOUT ROWID
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_postings_chunk ON postings(chunk_id)")
+        # 旧版本的索引没有 term_stats，从倒排表生成
+        if self._conn.execute("SELECT 1 FROM term_stats LIMIT 1").fetchone() is None:
+            self._conn.execute("INSERT INTO term_stats (term, df) SELECT term, COUNT(*) FROM postings GROUP BY term")
+        self._conn.commit()
+        # 检索使用的每线程只读连接
+        self._local = threading.local()
+        self._readers: List[sqlite3.Connection] = []
+        # 分块总数和总长度，用于计算 idf 和平均长度
+        self._doc_count, self._total_length = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(length), 0) FROM chunk_lengths"
+        ).fetchone()
+
+    def add_many(self, chunks: Dict[int, str]):
+        """
+        批量写入分块，已存在的分块ID先删除再写入
+
+        Args:
+            chunks: 分块ID -> 分块文本
+        """
+        postings, lengths = [], []
+        for chunk_id, text in chunks.items():
+            tokens = tokenize(text, self.use_jieba)
+            lengths.append((int(chunk_id), len(tokens)))
+            postings.extend((term, int(chunk_id), tf) for term, tf in Counter(tokens).items())
+        with self._lock:
+            self._delete_ids_locked([chunk_id for chunk_id, _ in lengths])
+            self._conn.executemany("INSERT INTO postings (term, chunk_id, tf) VALUES (?, ?, ?)", postings)
+            self._conn.executemany("INSERT INTO chunk_lengths (chunk_id, length) VALUES (?, ?)", lengths)
+            self._conn.executemany(
+                "INSERT INTO term_stats (term, df) VALUES (?, ?) ON CONFLICT(term) DO UPDATE SET df = df + excluded.df",
+                Counter(term for term, _, _ in postings).items()
+            )
+            self._conn.commit()
+            self._doc_count += len(lengths)
+            self._total_length += sum(length for _, length in lengths)
+
+    def _delete_ids_locked(self, ids: List[int]):
+        for start in range(0, len(ids), self._BATCH_SIZE):
+            batch = ids[start:start + self._BATCH_SIZE]
+            placeholders = ",".join("?" * len(batch))
+            count, total = self._conn.execute(
+                f"SELECT COUNT(*), COALESCE(SUM(length), 0) FROM chunk_lengths WHERE chunk_id IN ({placeholders})",
+                batch
+            ).fetchone()
+            if not count:
+                continue
+            term_counts = self._conn.execute(
+                f"SELECT term, COUNT(*) FROM postings WHERE chunk_id IN ({placeholders}) GROUP BY term", batch
+            ).fetchall()
+            self._conn.executemany("UPDATE term_stats SET df = df - ? WHERE term = ?",
+                                   [(df, term) for term, df in term_counts])
+            self._conn.execute("DELETE FROM term_stats WHERE df <= 0")
+            self._conn.execute(f"DELETE FROM postings WHERE chunk_id IN ({placeholders})", batch)
+            self._conn.execute(f"DELETE FROM chunk_lengths WHERE chunk_id IN ({placeholders})", batch)
+            self._doc_count -= count
+            self._total_length -= total
+
+    def delete_ids(self, ids: Iterable[int]):
+        """按分块ID批量删除"""
+        ids = [int(i) for i in ids]
+        if not ids:
+            return
+        with self._lock:
+            self._delete_ids_locked(ids)
+            self._conn.commit()
+
+    def search(self, query: str, top_k: int = 10, allowed_ids: Optional[Set[int]] = None) -> List[Tuple[int, float]]:
+        """
+        BM25 检索
+
+        Args:
+            query: 查询文本
+            top_k: 返回结果数量
+            allowed_ids: 只在这些分块ID中检索，默认不限制
+
+        Returns:
+            [(分块ID, BM25分数)]，按分数从高到低
+        """
+        terms = list(set(tokenize(query, self.use_jieba)))
+        if not terms or (allowed_ids is not None and not allowed_ids):
+            return []
+        with self._lock:
+            doc_count, total_length = self._doc_count, self._total_length
+        if doc_count == 0:
+            return []
+        avg_length = total_length / doc_count
+        conn = self._reader()
+        # 一次检索在同一个读事务(快照)中完成，结束后释放，之后的检索能看到新的写入
+        conn.execute("BEGIN")
+        try:
+            scores = self._score_snapshot(conn, terms, allowed_ids, doc_count, avg_length)
+        finally:
+            conn.execute("COMMIT")
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+
+    def _score_snapshot(self, conn: sqlite3.Connection, terms: List[str], allowed_ids: Optional[Set[int]],
+                        doc_count: int, avg_length: float) -> Dict[int, float]:
+        """在读事务中计算各分块的 BM25 分数"""
+        placeholders = ",".join("?" * len(terms))
+        dfs = dict(conn.execute(f"SELECT term, df FROM term_stats WHERE term IN ({placeholders})", terms))
+
+        join_allowed = ""
+        if allowed_ids is not None:
+            # 过滤条件放进SQL，只读取允许的分块的倒排项
+            conn.execute("DELETE FROM temp.allowed_ids")
+            conn.executemany("INSERT OR IGNORE INTO temp.allowed_ids (chunk_id) VALUES (?)",
+                             ((int(chunk_id),) for chunk_id in allowed_ids))
+            join_allowed = "JOIN temp.allowed_ids a ON a.chunk_id = p.chunk_id "
+
+        scores: Dict[int, float] = {}
+        for term, df in dfs.items():
+            # 几乎所有分块都包含的词没有区分度，跳过，不读取其倒排表
+            if df <= 0 or (doc_count > 100 and df > doc_count * self.max_df_ratio):
+                continue
+            idf = math.log(1 + (doc_count - df + 0.5) / (df + 0.5))
+            # 每个词只读取 BM25 贡献最高的若干个倒排项
+            rows = conn.execute(
+                "SELECT p.chunk_id, p.tf, l.length FROM postings p "
+                "JOIN chunk_lengths l ON l.chunk_id = p.chunk_id " + join_allowed +
+                "WHERE p.term = ? ORDER BY p.tf * 1.0 / (p.tf + ? * (1 - ? + ? * l.length / ?)) DESC LIMIT ?",
+                (term, self.k1, self.b, self.b, avg_length, self.max_postings_per_term)
+            ).fetchall()
+            for chunk_id, tf, length in rows:
+                norm = self.k1 * (1 - self.b + self.b * length / avg_length)
+                scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+        return scores
+
+    def _reader(self) -> sqlite3.Connection:
+        """当前线程的只读连接"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True, check_same_thread=False,
+                                   isolation_level=None)
+            conn.execute("CREATE TEMP TABLE IF NOT EXISTS allowed_ids (chunk_id INTEGER PRIMARY KEY)")
+            self._local.conn = conn
+            with self._lock:
+                self._readers.append(conn)
+        return conn
+
+    def count(self) -> int:
+        """分块总数"""
+        return self._doc_count
+
+    def stats(self) -> Dict[str, Any]:
+        """索引统计信息"""
+        return {
+            "chunks": self._doc_count,
+            "avg_length": round(self._total_length / self._doc_count, 2) if self._doc_count else 0.0,
+            "tokenizer": "jieba" if self.use_jieba and JIEBA_AVAILABLE else "bigram"
+        }
+
+    def clear(self):
+        """清空索引"""
+        with self._lock:
+            self._conn.execute("DELETE FROM postings")
+            self._conn.execute("DELETE FROM chunk_lengths")
+            self._conn.execute("DELETE FROM term_stats")
+            self._conn.commit()
+            self._doc_count = 0
+            self._total_length = 0
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            for conn in self._readers:
+                conn.close()
+            self._readers.clear()
+            self._conn.close()
+
+
+def reciprocal_rank_fusion(rankings: List[List[int]], k: int = 60,
+                           weights: List[float] = None) -> Dict[int, float]:
+    """
+    倒数排名融合(RRF)
+
+    Args:
+        rankings: 多路召回的ID列表，各自按相关度从高到低
+        k: 平滑常数
+        weights: 各路召回的权重，默认相同
+
+    Returns:
+        ID -> 融合分数
+    """
+    weights = weights or [1.0] * len(rankings)
+    scores: Dict[int, float] = {}
+    for ranking, weight in zip(rankings, weights):
+        for rank, item in enumerate(ranking, 1):
+            scores[item] = scores.get(item, 0.0) + weight / (k + rank)
+    return scores
@@ -0,0 +1,218 @@
+"""
+文本分块
+
+分块器接收流式产出的文本段(页/段落/工作表等)，逐个产出分块，文本段之间视为段落边界。
+分块大小可以按字符数或按近似 token 数计算；分块器只依赖标准库，可以传入进程池的子进程中使用。
+"""
+
+import re
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+# 近似 token: 单个中日韩字符、连续的字母数字、单个标点符号各计为 1 个
+_TOKEN_PATTERN = re.compile(r'[\u3040-\u30ff\u3400-\u9fff\uf900-\ufaff\uac00-\ud7af]|[A-Za-z0-9_]+|[^\sA-Za-z0-9_]')
+# 句子: 以中文句末标点、英文句末标点加空白、换行或文本结尾结束，句末的引号/括号归入本句
+_SENTENCE_PATTERN = re.compile(r'.+?(?:[。！？；!?;…]+[”’"\'）)]*|[.](?=\s)|\n|$)', re.S)
+
+SIZE_UNITS = ('char', 'token')
+
+
+def count_tokens(text: str) -> int:
+    """估算文本的 token 数"""
+    return sum(1 for _ in _TOKEN_PATTERN.finditer(text))
+
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    """截取文本的前 max_tokens 个近似 token"""
+    if max_tokens <= 0:
+        return ''
+    for count, match in enumerate(_TOKEN_PATTERN.finditer(text), 1):
+        if count == max_tokens:
+            return text[:match.end()]
+    return text
+
+
+def split_sentences(text: str) -> List[str]:
+    """
+    按中英文句子边界切分文本，保留句子原有的空白，拼接后与原文一致
+    """
+    return [match.group(0) for match in _SENTENCE_PATTERN.finditer(text) if match.group(0)]
+
+
+class BaseChunker:
+    """分块器基类"""
+
+    name = 'base'
+
+    def __init__(self, chunk_size: int = 500, chunk_overlap: int = 0, size_unit: str = 'char'):
+        """
+        Args:
+            chunk_size: 分块大小
+            chunk_overlap: 相邻分块的重叠大小
+            size_unit: 大小单位, char 按字符数, token 按近似 token 数
+        """
+        if chunk_size <= 0:
+            raise ValueError("chunk_size 必须大于 0")
+        if not 0 <= chunk_overlap < chunk_size:
+            raise ValueError("chunk_overlap 必须大于等于 0 且小于 chunk_size")
+        if size_unit not in SIZE_UNITS:
+            raise ValueError(f"不支持的分块单位: {size_unit}，可选: {', '.join(SIZE_UNITS)}")
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.size_unit = size_unit
+
+    def length(self, text: str) -> int:
+        """按分块单位计算文本大小"""
+        return len(text) if self.size_unit == 'char' else count_tokens(text)
+
+    def _offset(self, text: str, size: int) -> Optional[int]:
+        """
+        文本中前 size 个单位结束处的字符偏移，文本不足 size 个单位时返回 None
+        """
+        if size <= 0:
+            return 0
+        if self.size_unit == 'char':
+            return size if len(text) >= size else None
+        matches = _TOKEN_PATTERN.finditer(text)
+        for count, match in enumerate(matches, 1):
+            if count == size:
+                # 下一个 token 之前的空白归入当前分块
+                following = next(matches, None)
+                return following.start() if following else len(text)
+        return None
+
+    def chunk(self, segments: Iterable[str]) -> Iterator[str]:
+        """
+        对流式文本段分块
+
+        Args:
+            segments: 文本段
+
+        Yields:
+            str: 分块文本
+        """
+        raise NotImplementedError
+
+    def chunk_text(self, text: str) -> List[str]:
+        """对整段文本分块"""
+        return list(self.chunk([text]))
+
+    def __repr__(self) -> str:
+        return (f"{self.__class__.__name__}(chunk_size={self.chunk_size}, "
+                f"chunk_overlap={self.chunk_overlap}, size_unit={self.size_unit!r})")
+
+
+class FixedSizeChunker(BaseChunker):
+    """定长分块，不考虑句子边界，适合表格等没有自然句子的文本"""
+
+    name = 'fixed'
+
+    def chunk(self, segments: Iterable[str]) -> Iterator[str]:
+        step = self.chunk_size - self.chunk_overlap
+        buffer = ''
+        emitted = False
+        for segment in segments:
+            buffer = f"{buffer}\n{segment}" if buffer else segment
+            while True:
+                end = self._offset(buffer, self.chunk_size)
+                if end is None:
+                    break
+                yield buffer[:end].strip()
+                emitted = True
+                buffer = buffer[self._offset(buffer, step):]
+        # 剩余内容只有上一个分块的重叠部分时不再单独成块
+        if buffer.strip() and (not emitted or self.length(buffer) > self.chunk_overlap):
+            yield buffer.strip()
+
+
+class SentenceChunker(BaseChunker):
+    """
+    按句子和段落边界分块
+
+    依次累积完整的句子直到超过分块大小，不在句子中间切断；文本段之间按段落换行拼接。
+    新分块以上一个分块末尾不超过 chunk_overlap 的完整句子开头，超长的单个句子按定长切开。
+    """
+
+    name = 'sentence'
+
+    def _split_long(self, sentence: str) -> Iterator[str]:
+        """按定长切开超过分块大小的句子"""
+        while True:
+            end = self._offset(sentence, self.chunk_size)
+            if end is None or end >= len(sentence):
+                break
+            yield sentence[:end]
+            sentence = sentence[end:]
+        if sentence:
+            yield sentence
+
+    def _overlap_tail(self, window: List[Tuple[str, int]]) -> List[Tuple[str, int]]:
+        """取窗口末尾总大小不超过 chunk_overlap 的完整句子"""
+        tail, size = [], 0
+        for sentence, length in reversed(window):
+            if size + length > self.chunk_overlap:
+                break
+            tail.insert(0, (sentence, length))
+            size += length
+        return tail
+
+    def chunk(self, segments: Iterable[str]) -> Iterator[str]:
+        window: List[Tuple[str, int]] = []
+        size = 0
+        for segment in segments:
+            paragraph_start = True
+            for sentence in split_sentences(segment):
+                for piece in self._split_long(sentence):
+                    length = self.length(piece)
+                    if length == 0:
+                        continue
+                    if window and size + length > self.chunk_size:
+                        yield ''.join(text for text, _ in window).strip()
+                        window = self._overlap_tail(window)
+                        size = sum(n for _, n in window)
+                        # 重叠部分放不下新句子时，从前面丢弃
+                        while window and size + length > self.chunk_size:
+                            size -= window.pop(0)[1]
+                    if paragraph_start and window:
+                        piece = '\n' + piece
+                    paragraph_start = False
+                    window.append((piece, length))
+                    size += length
+        if window:
+            text = ''.join(text for text, _ in window).strip()
+            if text:
+                yield text
+
+
+# 分块器名称 -> 分块器类
+_CHUNKERS: Dict[str, type] = {}
+
+
+def register_chunker(chunker_class: type):
+    """注册分块器，按类属性 name 选择"""
+    _CHUNKERS[chunker_class.name] = chunker_class
+    return chunker_class
+
+
+def available_chunkers() -> List[str]:
+    """已注册的分块器名称"""
+    return list(_CHUNKERS.keys())
+
+
+def create_chunker(name: str, **options) -> BaseChunker:
+    """
+    按名称创建分块器
+
+    Args:
+        name: 分块器名称, 如 fixed / sentence
+        options: chunk_size / chunk_overlap / size_unit
+
+    Raises:
+        ValueError: 分块器不存在或参数不合法
+    """
+    if name not in _CHUNKERS:
+        raise ValueError(f"不支持的分块器: {name}，可选: {', '.join(available_chunkers())}")
+    return _CHUNKERS[name](**options)
+
+
+register_chunker(FixedSizeChunker)
+register_chunker(SentenceChunker)
@@ -0,0 +1,115 @@
+"""
+检索结果上下文打包
+
+将向量检索结果整理为送入大模型的上下文：去除重复和相互重叠的分块，按相似度排序，
+在 token 预算内尽量多地放入内容，保证提示词长度(以及大模型的延迟和费用)有上限。
+"""
+
+import os
+from typing import Any, Dict, List, Optional
+
+from common.utils.chunk_utils import count_tokens, truncate_tokens
+
+
+def _shingles(text: str, size: int = 3) -> set:
+    text = ''.join(text.split())
+    if len(text) <= size:
+        return {text}
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+def _similarity(a: set, b: set) -> float:
+    """两段文本字符 n-gram 集合的重合度(以较小集合为分母，能识别包含关系)"""
+    if not a or not b:
+        return 0.0
+    return len(a & b) / min(len(a), len(b))
+
+
+def _strip_overlap(previous: str, text: str, min_overlap: int = 20) -> str:
+    """
+    去掉 text 开头与 previous 结尾重叠的部分(相邻分块的重叠区)
+
+    两个参数都传入反转后的文本时，去掉的是 text 结尾与后一个分块开头重叠的部分
+    """
+    max_overlap = min(len(previous), len(text))
+    for size in range(max_overlap, min_overlap - 1, -1):
+        if previous.endswith(text[:size]):
+            return text[size:].strip()
+    return text
+
+
+def pack_context(results: List[Dict[str, Any]], max_tokens: int = 2000, min_score: float = 0.0,
+                 dedupe_threshold: float = 0.85, min_chunk_tokens: int = 32,
+                 max_chunks: Optional[int] = None, score_key: str = "similarity_score") -> List[Dict[str, Any]]:
+    """
+    打包检索结果
+
+    Args:
+        results: 检索结果，每项包含 file_path / chunk / chunk_index / similarity_score
+        max_tokens: 上下文 token 预算
+        min_score: 最低相似度，低于该值的结果丢弃
+        dedupe_threshold: 与已选分块的重合度达到该值时视为重复
+        min_chunk_tokens: 剩余预算不足以放入完整分块时，至少还有这么多 token 才截断放入
+        max_chunks: 最多放入的分块数
+        score_key: 排序使用的分数字段，重排序后为 rerank_score
+
+    Returns:
+        list: 选中的结果(按分数从高到低)，chunk 为去重叠/截断后的文本，附带 tokens 字段
+    """
+    candidates = sorted(
+        (result for result in results if result.get(score_key, 0.0) >= min_score),
+        key=lambda result: result.get(score_key, 0.0),
+        reverse=True
+    )
+    packed: List[Dict[str, Any]] = []
+    selected_shingles: List[set] = []
+    # (文件路径, 分块序号) -> 已选分块原文，用于去除相邻分块的重叠区
+    selected_chunks: Dict[tuple, str] = {}
+    remaining = max_tokens
+
+    for result in candidates:
+        if remaining <= 0 or (max_chunks and len(packed) >= max_chunks):
+            break
+        text = (result.get("chunk") or '').strip()
+        key = (result.get("file_path"), result.get("chunk_index"))
+        if not text or key in selected_chunks:
+            continue
+        shingles = _shingles(text)
+        if any(_similarity(shingles, other) >= dedupe_threshold for other in selected_shingles):
+            continue
+
+        trimmed = text
+        if key[1] is not None:
+            previous = selected_chunks.get((key[0], key[1] - 1))
+            if previous:
+                trimmed = _strip_overlap(previous, trimmed)
+            following = selected_chunks.get((key[0], key[1] + 1))
+            if following:
+                trimmed = _strip_overlap(following[::-1], trimmed[::-1])[::-1]
+        if not trimmed:
+            continue
+
+        tokens = count_tokens(trimmed)
+        if tokens > remaining:
+            if remaining < min_chunk_tokens:
+                continue
+            trimmed = truncate_tokens(trimmed, remaining)
+            tokens = count_tokens(trimmed)
+
+        packed.append({**result, "chunk": trimmed, "tokens": tokens})
+        selected_shingles.append(shingles)
+        selected_chunks[key] = text
+        remaining -= tokens
+    return packed
+
+
+def format_context(packed: List[Dict[str, Any]], score_key: str = "similarity_score") -> str:
+    """
+    将打包结果格式化为提示词中的上下文文本
+    """
+    blocks = []
+    for i, result in enumerate(packed, 1):
+        source = os.path.basename(result.get("file_path") or '')
+        score = result.get(score_key, 0.0)
+        blocks.append(f"[{i}] 来源: {source} (相关度: {score:.2f})\n{result['chunk']}")
+    return "\n\n".join(blocks)
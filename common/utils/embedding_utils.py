@@ -0,0 +1,123 @@
+import os
+import hashlib
+import sqlite3
+import logging
+import threading
+from typing import List, Dict, Any
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingCache:
+    """
+    持久化的分块向量缓存
+
+    以 (模型名称, 分块文本) 的哈希为键保存向量，重建索引时内容未变化的分块
+    直接复用缓存向量，只对新增或变化的分块调用模型
+    """
+
+    # SQLite 单条语句的参数数量上限
+    _BATCH_SIZE = 500
+
+    def __init__(self, db_path: str, model_name: str, dimension: int, dtype: str = 'float16'):
+        """
+        初始化向量缓存
+
+        Args:
+            db_path: SQLite数据库文件路径
+            model_name: 向量模型名称，不同模型的向量互不复用
+            dimension: 向量维度
+            dtype: 存储精度, float16 或 float32
+        """
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.db_path = db_path
+        self.model_name = model_name
+        self.dimension = dimension
+        self.dtype = np.dtype(dtype)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS embeddings (
+                key TEXT PRIMARY KEY,
+                dtype TEXT NOT NULL,
+                vector BLOB NOT NULL
+            )
+        """)
+        self._conn.commit()
+
+    def _key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model_name}\0{text}".encode('utf-8')).hexdigest()
+
+    def get_many(self, texts: List[str]) -> Dict[int, np.ndarray]:
+        """
+        批量读取缓存向量
+
+        Args:
+            texts: 分块文本列表
+
+        Returns:
+            dict: texts 中的下标 -> float32 向量，未命中的下标不会出现在结果中
+        """
+        keys = [self._key(text) for text in texts]
+        found = {}
+        with self._lock:
+            for start in range(0, len(keys), self._BATCH_SIZE):
+                batch = list(set(keys[start:start + self._BATCH_SIZE]))
+                placeholders = ",".join("?" * len(batch))
+                cursor = self._conn.execute(
+                    f"SELECT key, dtype, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                )
+                for key, dtype, blob in cursor:
+                    found[key] = np.frombuffer(blob, dtype=dtype).astype('float32')
+        result = {i: found[key] for i, key in enumerate(keys) if key in found}
+        self.hits += len(result)
+        self.misses += len(texts) - len(result)
+        return result
+
+    def put_many(self, texts: List[str], vectors: np.ndarray):
+        """
+        批量写入向量
+
+        Args:
+            texts: 分块文本列表
+            vectors: 与 texts 一一对应的向量
+        """
+        rows = [
+            (self._key(text), self.dtype.name, np.asarray(vector, dtype=self.dtype).tobytes())
+            for text, vector in zip(texts, vectors)
+        ]
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO embeddings (key, dtype, vector) VALUES (?, ?, ?)", rows)
+            self._conn.commit()
+
+    def count(self) -> int:
+        """缓存条目数"""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def stats(self) -> Dict[str, Any]:
+        """缓存统计信息"""
+        total = self.hits + self.misses
+        return {
+            "dtype": self.dtype.name,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0
+        }
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._conn.execute("DELETE FROM embeddings")
+            self._conn.commit()
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
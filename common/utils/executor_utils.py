@@ -0,0 +1,96 @@
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from common.exception import ServiceOverloadedException, OperationTimeoutException
+
+logger = logging.getLogger(__name__)
+
+
+class BoundedExecutor:
+    """
+    有界线程池，用于在异步代码中执行阻塞的CPU密集任务
+
+    同时执行的任务数为 max_workers，排队等待的任务数不超过 max_pending，
+    队列已满时立即拒绝新任务(ServiceOverloadedException)，而不是无限堆积；
+    每次调用可以设置超时，超时后尚未开始执行的任务会被取消。
+    """
+
+    def __init__(self, max_workers: int = 4, max_pending: int = 64, name: str = 'bounded'):
+        """
+        初始化线程池
+
+        Args:
+            max_workers: 工作线程数
+            max_pending: 最大排队任务数
+            name: 线程名前缀
+        """
+        self.name = name
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._slots = threading.BoundedSemaphore(max_workers + max_pending)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self.submitted = 0
+        self.rejected = 0
+        self.timeouts = 0
+
+    def _release(self, _future):
+        with self._lock:
+            self._in_flight -= 1
+        self._slots.release()
+
+    async def run(self, func: Callable, *args, timeout: Optional[float] = None, **kwargs) -> Any:
+        """
+        在线程池中执行 func(*args, **kwargs) 并等待结果
+
+        Args:
+            func: 阻塞函数
+            timeout: 超时时间(秒)，None 或 0 表示不超时
+
+        Raises:
+            ServiceOverloadedException: 排队任务已满
+            OperationTimeoutException: 执行超时
+        """
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise ServiceOverloadedException(f"{self.name} 任务队列已满，请稍后再试")
+        try:
+            future = self._executor.submit(func, *args, **kwargs)
+        except BaseException:
+            self._slots.release()
+            raise
+        with self._lock:
+            self._in_flight += 1
+            self.submitted += 1
+        # 任务结束(包括超时后在后台执行完)时才释放名额
+        future.add_done_callback(self._release)
+
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout=timeout or None)
+        except asyncio.TimeoutError:
+            # 尚未开始执行的任务直接取消，已经在执行的任务无法中断
+            future.cancel()
+            with self._lock:
+                self.timeouts += 1
+            raise OperationTimeoutException(f"{self.name} 任务执行超时({timeout}秒)")
+
+    def stats(self) -> Dict[str, Any]:
+        """线程池统计信息"""
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "max_pending": self.max_pending,
+                "in_flight": self._in_flight,
+                "submitted": self.submitted,
+                "rejected": self.rejected,
+                "timeouts": self.timeouts
+            }
+
+    def shutdown(self, wait: bool = False):
+        """关闭线程池"""
+        self._executor.shutdown(wait=wait)
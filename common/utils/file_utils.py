@@ -3,6 +3,15 @@
 import os
 import glob
 import re
+import io
+import json
+import hashlib
+import atexit
+import logging
+import tempfile
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
 from bs4 import BeautifulSoup
 import markdown
@@ -22,6 +31,17 @@ except ImportError:
     PDF_AVAILABLE = False
     print("警告: PyPDF2 未安装，无法处理 .pdf 文件")
 
+logger = logging.getLogger(__name__)
+
+# 解析配置，由 configure_parsing 设置
+_PARSE_CACHE_DIR = None  # 解析结果缓存目录，None 表示不缓存
+_PDF_WORKERS = 1  # PDF逐页解析的进程数
+_PDF_PARALLEL_MIN_PAGES = 32  # 页数达到该值时才使用多进程解析
+
+# PDF逐页解析的进程池，首次使用时创建，整个进程共享
+_PDF_POOL = None
+_PDF_POOL_LOCK = threading.Lock()
+
 def clean_text(text):
     """
     清理文本，去除多余的空格和换行
@@ -33,6 +53,16 @@ def clean_text(text):
     # 去除首尾空白
     return text.strip()
 
+def compute_file_hash(file_path, chunk_size=1024 * 1024):
+    """
+    分块计算文件内容的SHA-256哈希，不会一次性读入整个文件
+    """
+    sha256 = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(chunk_size), b''):
+            sha256.update(block)
+    return sha256.hexdigest()
+
 def load_text_file(file_path):
     """加载文本文件"""
     try:
@@ -69,18 +99,12 @@ def load_pdf_file(file_path):
         return None, "PyPDF2 包未安装，无法处理 .pdf 文件"
     
     try:
-        content = ''
-        with open(file_path, 'rb') as f:
-            pdf_reader = PyPDF2.PdfReader(f)
-            for page_num in range(len(pdf_reader.pages)):
-                page_content = pdf_reader.pages[page_num].extract_text()
-                if page_content:  # 有些PDF页面可能提取不出文本
-                    content += page_content + '\n'
+        content = '\n'.join(iter_pdf_pages(file_path))
         
         if not content.strip():
             return None, f"PDF文件 {file_path} 未能提取到文本内容"
         
-        return clean_text(content), None
+        return content, None
     except Exception as e:
         return None, f"读取PDF文件 {file_path} 时出错: {str(e)}"
 
@@ -122,6 +146,281 @@ def load_excel_file(file_path):
     except Exception as e:
         return None, f"读取Excel文件 {file_path} 时出错: {str(e)}"
 
+# 流式文本提取器: 按页/段落/工作表逐段产出文本，调用方无需一次性拼接整个文档
+def _split_text_block(buffer, max_chars):
+    """
+    在段落边界(空行)切分缓冲区，返回 (完整部分, 剩余部分)；没有完整段落时返回 (None, buffer)
+
+    分块器按段落拼接各文本段，只在原文的边界切分才不会引入原文中没有的换行。
+    缓冲区超过 max_chars 仍没有空行时依次退回到换行、空白处切分
+    """
+    index = buffer.rfind('\n\n')
+    if index >= 0:
+        return buffer[:index], buffer[index + 2:].lstrip('\n')
+    if len(buffer) < max_chars:
+        return None, buffer
+    for separator in ('\n', ' '):
+        index = buffer.rfind(separator)
+        if index > 0:
+            return buffer[:index], buffer[index + 1:]
+    return buffer, ''
+
+def iter_text_file(file_path, block_size=64 * 1024):
+    """逐块读取文本文件，按段落边界产出文本段，UTF-8解码失败时改用GBK"""
+    max_chars = block_size * 16
+    for encoding in ('utf-8', 'gbk'):
+        started = False
+        try:
+            with open(file_path, 'r', encoding=encoding) as f:
+                buffer = ''
+                for block in iter(lambda: f.read(block_size), ''):
+                    buffer += block
+                    segment, buffer = _split_text_block(buffer, max_chars)
+                    if segment is not None:
+                        started = True
+                        yield segment
+                if buffer:
+                    yield buffer
+            return
+        except UnicodeDecodeError:
+            # 已经产出过内容时无法切换编码
+            if started or encoding == 'gbk':
+                raise
+
+def configure_parsing(cache_dir=None, pdf_workers=None, pdf_parallel_min_pages=None):
+    """
+    设置文档解析参数
+
+    参数:
+        cache_dir: 解析结果缓存目录，按文件内容哈希缓存逐页文本
+        pdf_workers: PDF逐页解析的进程数
+        pdf_parallel_min_pages: 页数达到该值时才使用多进程解析
+    """
+    global _PARSE_CACHE_DIR, _PDF_WORKERS, _PDF_PARALLEL_MIN_PAGES
+    if cache_dir is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        _PARSE_CACHE_DIR = cache_dir
+    if pdf_workers is not None and max(1, int(pdf_workers)) != _PDF_WORKERS:
+        _PDF_WORKERS = max(1, int(pdf_workers))
+        # 进程数变化后按新配置重建进程池
+        _shutdown_pdf_pool()
+    if pdf_parallel_min_pages is not None:
+        _PDF_PARALLEL_MIN_PAGES = int(pdf_parallel_min_pages)
+
+def parsing_settings():
+    """当前的文档解析参数，用于在 spawn 方式启动的子进程中调用 configure_parsing 恢复相同配置"""
+    return {
+        'cache_dir': _PARSE_CACHE_DIR,
+        'pdf_workers': _PDF_WORKERS,
+        'pdf_parallel_min_pages': _PDF_PARALLEL_MIN_PAGES
+    }
+
+def _parse_cache_path(content_hash, kind):
+    if not _PARSE_CACHE_DIR:
+        return None
+    return os.path.join(_PARSE_CACHE_DIR, f"{kind}_{content_hash}.json")
+
+def delete_parse_cache(content_hash):
+    """删除内容哈希对应的全部解析缓存，文档删除或内容变化时调用"""
+    if not _PARSE_CACHE_DIR or not content_hash:
+        return
+    for cache_path in glob.glob(os.path.join(glob.escape(_PARSE_CACHE_DIR), f"*_{content_hash}.json")):
+        try:
+            os.remove(cache_path)
+        except OSError as e:
+            logger.warning(f"删除解析缓存 {cache_path} 失败: {str(e)}")
+
+def _read_parse_cache(cache_path):
+    if not cache_path or not os.path.exists(cache_path):
+        return None
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception as e:
+        logger.warning(f"读取解析缓存 {cache_path} 失败: {str(e)}")
+        return None
+
+def _write_parse_cache(cache_path, pages):
+    if not cache_path:
+        return
+    try:
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(pages, f, ensure_ascii=False)
+        os.replace(tmp_path, cache_path)
+    except Exception as e:
+        logger.warning(f"写入解析缓存 {cache_path} 失败: {str(e)}")
+
+def _open_pdf(source):
+    """source 为文件路径或PDF二进制数据"""
+    if isinstance(source, (bytes, bytearray)):
+        return PyPDF2.PdfReader(io.BytesIO(source))
+    return PyPDF2.PdfReader(source)
+
+def _init_pdf_worker(settings):
+    """进程池子进程的初始化函数，spawn 方式启动的子进程不继承父进程的解析配置"""
+    configure_parsing(**settings)
+
+def _get_pdf_pool():
+    """获取共享的PDF解析进程池，使用 spawn 方式启动，避免 fork 复制父进程中的模型和线程"""
+    global _PDF_POOL
+    with _PDF_POOL_LOCK:
+        if _PDF_POOL is None:
+            _PDF_POOL = ProcessPoolExecutor(
+                max_workers=_PDF_WORKERS,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_pdf_worker,
+                initargs=({'pdf_workers': 1, 'pdf_parallel_min_pages': _PDF_PARALLEL_MIN_PAGES},)
+            )
+        return _PDF_POOL
+
+def _shutdown_pdf_pool():
+    """关闭共享的PDF解析进程池"""
+    global _PDF_POOL
+    with _PDF_POOL_LOCK:
+        pool, _PDF_POOL = _PDF_POOL, None
+    if pool is not None:
+        pool.shutdown(wait=False)
+
+atexit.register(_shutdown_pdf_pool)
+
+def _extract_pdf_page_range(file_path, start, end):
+    """在子进程中提取 [start, end) 页的文本"""
+    pdf_reader = _open_pdf(file_path)
+    return [pdf_reader.pages[i].extract_text() or '' for i in range(start, end)]
+
+def _extract_pdf_pages(source):
+    """逐页产出PDF原始文本，页数较多时按页段分发到进程池"""
+    pdf_reader = _open_pdf(source)
+    page_count = len(pdf_reader.pages)
+    # 已经在子进程中(如批量入库的进程池)时不再嵌套创建进程池
+    if (_PDF_WORKERS <= 1 or page_count < _PDF_PARALLEL_MIN_PAGES
+            or multiprocessing.parent_process() is not None):
+        for page in pdf_reader.pages:
+            yield page.extract_text() or ''
+        return
+
+    workers = min(_PDF_WORKERS, page_count)
+    step = -(-page_count // (workers * 4))  # 每个任务的页数，任务数约为进程数的4倍
+    starts = list(range(0, page_count, step))
+    ends = [min(start + step, page_count) for start in starts]
+    # 子进程只接收文件路径，二进制数据先写入临时文件，避免每个任务都序列化整个PDF
+    temp_path = None
+    if isinstance(source, (bytes, bytearray)):
+        with tempfile.NamedTemporaryFile(suffix='.pdf', delete=False) as f:
+            f.write(source)
+            temp_path = f.name
+    file_path = temp_path or source
+    try:
+        # map 按提交顺序返回结果，保证页序
+        for pages in _get_pdf_pool().map(_extract_pdf_page_range, [file_path] * len(starts), starts, ends):
+            yield from pages
+    finally:
+        if temp_path and os.path.exists(temp_path):
+            os.remove(temp_path)
+
+def iter_pdf_pages(source, use_cache=True):
+    """
+    逐页提取PDF文本
+
+    参数:
+        source: PDF文件路径或二进制数据
+        use_cache: 是否使用解析缓存，含个人信息且不入库的文件(如简历)应关闭，避免文本留在磁盘上
+
+    返回:
+        生成器，逐页产出清理后的文本(跳过提取不出文本的页面)。
+        配置了缓存目录时，完整解析的结果按内容哈希缓存，再次解析同一文件直接读取缓存
+    """
+    if not PDF_AVAILABLE:
+        raise RuntimeError("PyPDF2 包未安装，无法处理 .pdf 文件")
+
+    cache_path = None
+    if _PARSE_CACHE_DIR and use_cache:
+        if isinstance(source, (bytes, bytearray)):
+            content_hash = hashlib.sha256(source).hexdigest()
+        else:
+            content_hash = compute_file_hash(source)
+        cache_path = _parse_cache_path(content_hash, 'pdf')
+        pages = _read_parse_cache(cache_path)
+        if pages is not None:
+            yield from pages
+            return
+
+    pages = []
+    for page_content in _extract_pdf_pages(source):
+        if page_content.strip():  # 有些PDF页面可能提取不出文本
+            page_content = clean_text(page_content)
+            pages.append(page_content)
+            yield page_content
+    _write_parse_cache(cache_path, pages)
+
+def iter_docx_paragraphs(file_path):
+    """逐段落提取Word文档文本"""
+    if not DOCX_AVAILABLE:
+        raise RuntimeError("python-docx 包未安装，无法处理 .docx 文件")
+    doc = docx.Document(file_path)
+    for para in doc.paragraphs:
+        if para.text.strip():
+            yield clean_text(para.text)
+
+def iter_markdown_file(file_path):
+    """提取Markdown文本(需要整体转换为HTML，按文档产出)"""
+    content, error = load_markdown_file(file_path)
+    if error:
+        raise RuntimeError(error)
+    if content:
+        yield content
+
+def iter_excel_sheets(file_path):
+    """逐工作表提取Excel文本"""
+    df_list = pd.read_excel(file_path, sheet_name=None)
+    for sheet_name, df in df_list.items():
+        lines = [f"表格: {sheet_name}"]
+        for _, row in df.iterrows():
+            for col_name, value in row.items():
+                str_value = str(value)
+                if len(str_value) > 100:  # 如果单元格内容过长，截断
+                    str_value = str_value[:100] + "..."
+                lines.append(f"{col_name}: {str_value}")
+            lines.append("---")  # 行分隔符
+        yield clean_text('\n'.join(lines))
+
+# 扩展名 -> 流式文本提取器
+_EXTRACTORS = {}
+
+def register_extractor(extensions, extractor):
+    """
+    注册文本提取器
+
+    参数:
+        extensions: 扩展名或扩展名列表，如 '.pdf' 或 ['.xlsx', '.xls']
+        extractor: 接收文件路径、逐段产出文本的生成器函数
+    """
+    if isinstance(extensions, str):
+        extensions = [extensions]
+    for extension in extensions:
+        _EXTRACTORS[extension.lower()] = extractor
+
+def get_extractor(file_path):
+    """根据扩展名获取文本提取器，未注册的类型按纯文本读取"""
+    extension = os.path.splitext(file_path)[1].lower()
+    return _EXTRACTORS.get(extension, iter_text_file)
+
+def iter_document_text(file_path):
+    """
+    按文件类型流式提取文档文本
+
+    返回:
+        生成器，逐段(页/段落/工作表/文本块)产出文本
+    """
+    return get_extractor(file_path)(file_path)
+
+register_extractor(['.txt'], iter_text_file)
+register_extractor(['.pdf'], iter_pdf_pages)
+register_extractor(['.docx'], iter_docx_paragraphs)
+register_extractor(['.md'], iter_markdown_file)
+register_extractor(['.xlsx', '.xls'], iter_excel_sheets)
+
 def load_documents_from_directory(directory_path, file_types=None):
     """
     从指定目录加载多种类型的文档
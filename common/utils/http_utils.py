@@ -0,0 +1,111 @@
+import asyncio
+import logging
+import threading
+import weakref
+from typing import Dict, Any, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# 默认连接池配置，可通过 LLM['http_pool'] 覆盖
+DEFAULT_POOL_CONFIG = {
+    'max_connections': 100,
+    'max_keepalive_connections': 20,
+    'keepalive_expiry': 30,
+    'connect_timeout': 5,
+    'read_timeout': 60,
+    'write_timeout': 10,
+    'pool_timeout': 5,
+    'http2': False
+}
+
+_lock = threading.Lock()
+_sync_client: Optional[httpx.Client] = None
+# 异步客户端绑定创建时的事件循环，每个事件循环一个
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+_pool_config: Dict[str, Any] = dict(DEFAULT_POOL_CONFIG)
+
+
+def configure_http_pool(config: Optional[Dict[str, Any]] = None):
+    """
+    设置连接池参数，只对之后创建的客户端生效
+
+    Args:
+        config: 连接池配置，未设置的字段使用 DEFAULT_POOL_CONFIG
+    """
+    global _pool_config
+    with _lock:
+        _pool_config = {**DEFAULT_POOL_CONFIG, **(config or {})}
+
+
+def _client_kwargs() -> Dict[str, Any]:
+    config = _pool_config
+    return {
+        'limits': httpx.Limits(
+            max_connections=config['max_connections'],
+            max_keepalive_connections=config['max_keepalive_connections'],
+            keepalive_expiry=config['keepalive_expiry']
+        ),
+        'timeout': httpx.Timeout(
+            connect=config['connect_timeout'],
+            read=config['read_timeout'],
+            write=config['write_timeout'],
+            pool=config['pool_timeout']
+        ),
+        'http2': config['http2']
+    }
+
+
+def get_http_client() -> httpx.Client:
+    """获取进程内共享的同步HTTP客户端(连接池 + keep-alive)"""
+    global _sync_client
+    with _lock:
+        if _sync_client is None or _sync_client.is_closed:
+            _sync_client = httpx.Client(**_client_kwargs())
+            logger.debug(f"创建共享HTTP连接池: {_pool_config}")
+        return _sync_client
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """
+    获取当前事件循环共享的异步HTTP客户端(连接池 + keep-alive)
+
+    必须在事件循环中调用
+    """
+    loop = asyncio.get_running_loop()
+    with _lock:
+        client = _async_clients.get(loop)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(**_client_kwargs())
+            _async_clients[loop] = client
+            logger.debug(f"创建共享异步HTTP连接池: {_pool_config}")
+        return client
+
+
+async def aclose_async_http_client():
+    """关闭当前事件循环的异步客户端，临时创建的事件循环在关闭前调用，避免连接泄漏"""
+    with _lock:
+        client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+async def aclose_http_clients():
+    """关闭当前事件循环的异步客户端和同步客户端，应用关闭时调用"""
+    global _sync_client
+    await aclose_async_http_client()
+    with _lock:
+        sync_client, _sync_client = _sync_client, None
+    if sync_client is not None:
+        sync_client.close()
+
+
+def http_pool_stats() -> Dict[str, Any]:
+    """连接池配置和客户端数量"""
+    with _lock:
+        return {
+            **_pool_config,
+            'sync_client': _sync_client is not None and not _sync_client.is_closed,
+            'async_clients': len(_async_clients)
+        }
@@ -0,0 +1,82 @@
+"""
+文档入库的解析/分块步骤
+
+这里的函数会在进程池的子进程中执行，只依赖轻量模块，不加载向量模型
+"""
+
+import atexit
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple
+
+from common.utils.file_utils import iter_document_text, configure_parsing, parsing_settings
+from common.utils.chunk_utils import BaseChunker, FixedSizeChunker
+
+# 解析/分块进程池，首次使用时创建，整个进程共享
+_INGEST_POOL = None
+_INGEST_POOL_WORKERS = 0
+_INGEST_POOL_LOCK = threading.Lock()
+
+
+def _init_ingest_worker(settings: dict):
+    """进程池子进程的初始化函数，spawn 方式启动的子进程不继承父进程的解析配置"""
+    configure_parsing(**settings)
+
+
+def get_ingest_pool(max_workers: int) -> ProcessPoolExecutor:
+    """
+    获取共享的解析/分块进程池
+
+    使用 spawn 方式启动子进程：父进程中已加载向量模型、BLAS线程、SQLite连接和后台合并线程，
+    fork 会复制这些状态，可能导致子进程死锁或继承的锁损坏。进程数变化时重建进程池。
+
+    Args:
+        max_workers: 进程数
+    """
+    global _INGEST_POOL, _INGEST_POOL_WORKERS
+    with _INGEST_POOL_LOCK:
+        if _INGEST_POOL is not None and _INGEST_POOL_WORKERS != max_workers:
+            _INGEST_POOL.shutdown(wait=False)
+            _INGEST_POOL = None
+        if _INGEST_POOL is None:
+            _INGEST_POOL = ProcessPoolExecutor(
+                max_workers=max_workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_ingest_worker,
+                initargs=(parsing_settings(),)
+            )
+            _INGEST_POOL_WORKERS = max_workers
+        return _INGEST_POOL
+
+
+def shutdown_ingest_pool():
+    """关闭共享的解析/分块进程池"""
+    global _INGEST_POOL
+    with _INGEST_POOL_LOCK:
+        pool, _INGEST_POOL = _INGEST_POOL, None
+    if pool is not None:
+        pool.shutdown(wait=False)
+
+
+atexit.register(shutdown_ingest_pool)
+
+
+def read_and_chunk(file_path: str, chunker: Optional[BaseChunker] = None) -> Tuple[str, List[str], Optional[str]]:
+    """
+    按文件类型流式提取文本并分块
+
+    Args:
+        file_path: 文件路径
+        chunker: 分块器，默认按 1000 字符定长分块
+
+    Returns:
+        (文件路径, 分块列表, 错误信息)
+    """
+    if chunker is None:
+        chunker = FixedSizeChunker(1000)
+    try:
+        chunks = list(chunker.chunk(iter_document_text(file_path)))
+        return file_path, chunks, None
+    except Exception as e:
+        return file_path, [], f"读取文件 {file_path} 时出错: {str(e)}"
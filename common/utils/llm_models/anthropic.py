@@ -1,7 +1,8 @@
-from typing import Dict, Any, List, Tuple, Generator, Union
+from typing import Dict, Any, List, Tuple, Generator, Union, AsyncGenerator
 import anthropic
 
 from .base import BaseLLM
+from common.utils.http_utils import get_http_client
 
 class AnthropicLLM(BaseLLM):
     """Anthropic模型实现"""
@@ -10,7 +11,7 @@ class AnthropicLLM(BaseLLM):
         super().__init__(config)
         self.api_key = config.get('api_key')
         self.model_name = config.get('model_name', 'claude-3-opus-20240229')
-        self.client = anthropic.Anthropic(api_key=self.api_key)
+        self.client = anthropic.Anthropic(api_key=self.api_key, http_client=get_http_client())
     
     def load_model(self):
         """Anthropic不需要显式加载模型"""
@@ -81,6 +82,44 @@ class AnthropicLLM(BaseLLM):
         except Exception as e:
             raise RuntimeError(f"Anthropic stream chat error: {str(e)}")
     
+    def _get_async_client(self) -> anthropic.AsyncAnthropic:
+        """获取异步客户端，使用当前事件循环的共享连接池"""
+        return self._loop_client(
+            lambda http_client: anthropic.AsyncAnthropic(api_key=self.api_key, http_client=http_client))
+
+    def _chat_params(self, **kwargs) -> Dict[str, Any]:
+        return {
+            'model': kwargs.get('model', self.model_name),
+            'temperature': kwargs.get('temperature', self.config.get('temperature', 0.7)),
+            'max_tokens_to_sample': kwargs.get('max_tokens', self.config.get('max_tokens', 2048)),
+            'top_p': kwargs.get('top_p', self.config.get('top_p', 0.9))
+        }
+
+    async def achat(self, messages: List[Dict[str, str]], **kwargs) -> str:
+        """异步对话接口"""
+        try:
+            response = await self._get_async_client().completions.create(
+                prompt=self._format_messages(messages),
+                **self._chat_params(**kwargs)
+            )
+            return response.completion.strip()
+        except Exception as e:
+            raise RuntimeError(f"Anthropic chat error: {str(e)}")
+
+    async def astream(self, messages: List[Dict[str, str]], **kwargs) -> AsyncGenerator[str, None]:
+        """异步流式对话接口"""
+        try:
+            response = await self._get_async_client().completions.create(
+                prompt=self._format_messages(messages),
+                stream=True,
+                **self._chat_params(**kwargs)
+            )
+            async for chunk in response:
+                if chunk.completion:
+                    yield chunk.completion
+        except Exception as e:
+            raise RuntimeError(f"Anthropic stream chat error: {str(e)}")
+
     def _format_messages(self, messages: List[Dict[str, str]]) -> str:
         """将消息列表格式化为Anthropic格式"""
         formatted = ""
@@ -1,5 +1,8 @@
+import asyncio
+import threading
+import weakref
 from abc import ABC, abstractmethod
-from typing import Optional, Dict, Any, List, Tuple, Generator, Union
+from typing import Optional, Dict, Any, List, Tuple, Generator, Union, AsyncGenerator, Callable
 
 class BaseLLM(ABC):
     """大模型基类，定义所有模型必须实现的接口"""
@@ -8,6 +11,9 @@ class BaseLLM(ABC):
         self.config = config
         self.model = None
         self.tokenizer = None
+        # 事件循环 -> (异步HTTP客户端, 异步SDK客户端)；客户端绑定创建时的事件循环，不能跨循环共用
+        self._async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, tuple]" = weakref.WeakKeyDictionary()
+        self._async_clients_lock = threading.Lock()
     
     @abstractmethod
     def load_model(self):
@@ -38,6 +44,46 @@ class BaseLLM(ABC):
         """
         pass
     
+    def _loop_client(self, factory: Callable[[Any], Any]) -> Any:
+        """
+        获取当前事件循环的异步SDK客户端，首次使用时用 factory(当前事件循环的共享HTTP客户端) 创建
+
+        必须在事件循环中调用；HTTP客户端被关闭重建后SDK客户端随之重建
+        """
+        from common.utils.http_utils import get_async_http_client
+        loop = asyncio.get_running_loop()
+        http_client = get_async_http_client()
+        with self._async_clients_lock:
+            cached = self._async_clients.get(loop)
+            if cached is None or cached[0] is not http_client:
+                cached = (http_client, factory(http_client))
+                self._async_clients[loop] = cached
+            return cached[1]
+
+    async def achat(self, messages: List[Dict[str, str]], **kwargs) -> str:
+        """异步对话接口，返回完整响应
+
+        默认在线程池中执行同步的 chat，远程API模型应覆盖为原生异步实现
+        """
+        kwargs.pop('stream', None)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, lambda: self.chat(messages, stream=False, **kwargs))
+
+    async def astream(self, messages: List[Dict[str, str]], **kwargs) -> AsyncGenerator[str, None]:
+        """异步流式对话接口
+
+        默认在线程池中逐块迭代同步的流式生成器，不阻塞事件循环；远程API模型应覆盖为原生异步实现
+        """
+        kwargs.pop('stream', None)
+        loop = asyncio.get_running_loop()
+        generator = await loop.run_in_executor(None, lambda: self.chat(messages, stream=True, **kwargs))
+        end = object()
+        while True:
+            chunk = await loop.run_in_executor(None, next, generator, end)
+            if chunk is end:
+                break
+            yield chunk
+
     def update_config(self, **kwargs):
         """更新配置"""
         for key, value in kwargs.items():
@@ -1,9 +1,11 @@
-from typing import Dict, Any, List, Generator, Union
+from typing import Dict, Any, List, Generator, Union, AsyncGenerator
 import os
-from openai import OpenAI
+from openai import OpenAI, AsyncOpenAI
 import logging
 
 from .base import BaseLLM
+from .openai import PASSTHROUGH_PARAMS
+from common.utils.http_utils import get_http_client
 
 logger = logging.getLogger(__name__)
 
@@ -29,7 +31,8 @@ class DoubaoLLM(BaseLLM):
             logger.debug(f"正在初始化豆包客户端，base_url: {self.base_url}")
             self.client = OpenAI(
                 base_url=self.base_url,
-                api_key=self.api_key
+                api_key=self.api_key,
+                http_client=get_http_client()
             )
             logger.debug(f"豆包模型初始化成功: {self.client}")
         except Exception as e:
@@ -42,6 +45,7 @@ class DoubaoLLM(BaseLLM):
         try:
             if hasattr(self, 'client') and self.client is not None:
                 self.client = None
+            self._async_clients.clear()
         except Exception as e:
             logger.error(f"豆包模型清理失败: {str(e)}")
             
@@ -99,13 +103,7 @@ class DoubaoLLM(BaseLLM):
         if not self.client:
             raise RuntimeError("豆包客户端未初始化")
             
-        params = {
-            'model': kwargs.get('model', self.model_name),
-            'temperature': kwargs.get('temperature', self.config.get('temperature', 0.7)),
-            'max_tokens': kwargs.get('max_tokens', self.config.get('max_tokens', 2048)),
-            'top_p': kwargs.get('top_p', self.config.get('top_p', 0.9)),
-            'stream': kwargs.get('stream', False)
-        }
+        params = {**self._chat_params(**kwargs), 'stream': kwargs.get('stream', False)}
 
         logger.debug(f"豆包对话接口参数: {params}")
         
@@ -124,6 +122,49 @@ class DoubaoLLM(BaseLLM):
             logger.error(f"豆包对话失败: {str(e)}")
             raise RuntimeError(f"豆包 chat error: {str(e)}")
     
+    def _get_async_client(self) -> AsyncOpenAI:
+        """获取异步客户端，使用当前事件循环的共享连接池"""
+        return self._loop_client(
+            lambda http_client: AsyncOpenAI(base_url=self.base_url, api_key=self.api_key, http_client=http_client))
+
+    def _chat_params(self, **kwargs) -> Dict[str, Any]:
+        """同步和异步对话共用的请求参数(不含 stream)"""
+        params = {
+            'model': kwargs.get('model', self.model_name),
+            'temperature': kwargs.get('temperature', self.config.get('temperature', 0.7)),
+            'max_tokens': kwargs.get('max_tokens', self.config.get('max_tokens', 2048)),
+            'top_p': kwargs.get('top_p', self.config.get('top_p', 0.9))
+        }
+        params.update({key: kwargs[key] for key in PASSTHROUGH_PARAMS if kwargs.get(key) is not None})
+        return params
+
+    async def achat(self, messages: List[Dict[str, str]], **kwargs) -> str:
+        """异步对话接口"""
+        params = self._chat_params(**kwargs)
+        try:
+            logger.debug("豆包异步对话开始")
+            response = await self._get_async_client().chat.completions.create(messages=messages, **params)
+            return response.choices[0].message.content
+        except Exception as e:
+            logger.error(f"豆包异步对话失败: {str(e)}")
+            raise RuntimeError(f"豆包 chat error: {str(e)}")
+
+    async def astream(self, messages: List[Dict[str, str]], **kwargs) -> AsyncGenerator[str, None]:
+        """异步流式对话接口"""
+        params = self._chat_params(**kwargs)
+        try:
+            logger.debug("豆包异步流式对话开始")
+            response = await self._get_async_client().chat.completions.create(messages=messages, stream=True, **params)
+            async for chunk in response:
+                if chunk.choices and getattr(chunk.choices[0], 'delta', None) is not None:
+                    content = chunk.choices[0].delta.content
+                    if content:
+                        yield content
+            logger.debug("豆包异步流式对话完成")
+        except Exception as e:
+            logger.error(f"豆包异步流式对话失败: {str(e)}")
+            raise RuntimeError(f"豆包 stream chat error: {str(e)}")
+
     def _stream_chat(self, messages: List[Dict[str, str]], **kwargs) -> Generator[str, None, None]:
         """流式对话"""
         if not self.client:
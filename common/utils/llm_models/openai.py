@@ -1,7 +1,14 @@
-from typing import Dict, Any, List, Tuple, Generator, Union
+from typing import Dict, Any, List, Tuple, Generator, Union, AsyncGenerator
 import openai
 
 from .base import BaseLLM
+from common.utils.http_utils import get_http_client
+
+# 原样转发给 chat.completions 的参数，同步和异步接口保持一致
+PASSTHROUGH_PARAMS = (
+    'response_format', 'stop', 'seed', 'presence_penalty', 'frequency_penalty',
+    'logit_bias', 'n', 'user', 'tools', 'tool_choice'
+)
 
 class OpenAILLM(BaseLLM):
     """OpenAI模型实现"""
@@ -10,7 +17,8 @@ class OpenAILLM(BaseLLM):
         super().__init__(config)
         self.api_key = config.get('api_key')
         self.model_name = config.get('model_name', 'gpt-3.5-turbo')
-        openai.api_key = self.api_key
+        # 同步客户端使用进程内共享的连接池
+        self.client = openai.OpenAI(api_key=self.api_key, http_client=get_http_client())
     
     def load_model(self):
         """OpenAI不需要显式加载模型"""
@@ -26,7 +34,7 @@ class OpenAILLM(BaseLLM):
         }
         
         try:
-            response = openai.Completion.create(
+            response = self.client.completions.create(
                 prompt=prompt,
                 **params
             )
@@ -37,32 +45,23 @@ class OpenAILLM(BaseLLM):
     def get_embeddings(self, text: str) -> List[float]:
         """获取文本嵌入"""
         try:
-            response = openai.Embedding.create(
+            response = self.client.embeddings.create(
                 input=text,
                 model="text-embedding-ada-002"
             )
-            return response['data'][0]['embedding']
+            return response.data[0].embedding
         except Exception as e:
             raise RuntimeError(f"OpenAI embeddings error: {str(e)}")
     
     def chat(self, messages: List[Dict[str, str]], **kwargs) -> Union[str, Generator[str, None, None]]:
         """对话接口"""
-        params = {
-            'model': kwargs.get('model', self.model_name),
-            'temperature': kwargs.get('temperature', self.config.get('temperature', 0.7)),
-            'max_tokens': kwargs.get('max_tokens', self.config.get('max_tokens', 2048)),
-            'top_p': kwargs.get('top_p', self.config.get('top_p', 0.9))
-        }
-        
-        # 获取流式输出参数
-        stream = kwargs.pop('stream', False)
-        params['stream'] = stream
+        params = self._chat_params(**kwargs)
         
         try:
-            if stream:
+            if kwargs.get('stream', False):
                 return self._stream_chat(messages, **params)
             else:
-                response = openai.ChatCompletion.create(
+                response = self.client.chat.completions.create(
                     messages=messages,
                     **params
                 )
@@ -73,13 +72,55 @@ class OpenAILLM(BaseLLM):
     def _stream_chat(self, messages: List[Dict[str, str]], **kwargs) -> Generator[str, None, None]:
         """流式对话"""
         try:
-            response = openai.ChatCompletion.create(
+            response = self.client.chat.completions.create(
                 messages=messages,
+                stream=True,
                 **kwargs
             )
             
             for chunk in response:
-                if chunk.choices[0].delta.content:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        except Exception as e:
+            raise RuntimeError(f"OpenAI stream chat error: {str(e)}") 
+
+    def _get_async_client(self) -> openai.AsyncOpenAI:
+        """获取异步客户端，使用当前事件循环的共享连接池"""
+        return self._loop_client(
+            lambda http_client: openai.AsyncOpenAI(api_key=self.api_key, http_client=http_client))
+
+    def _chat_params(self, **kwargs) -> Dict[str, Any]:
+        """同步和异步对话共用的请求参数(不含 stream)"""
+        params = {
+            'model': kwargs.get('model', self.model_name),
+            'temperature': kwargs.get('temperature', self.config.get('temperature', 0.7)),
+            'max_tokens': kwargs.get('max_tokens', self.config.get('max_tokens', 2048)),
+            'top_p': kwargs.get('top_p', self.config.get('top_p', 0.9))
+        }
+        params.update({key: kwargs[key] for key in PASSTHROUGH_PARAMS if kwargs.get(key) is not None})
+        return params
+
+    async def achat(self, messages: List[Dict[str, str]], **kwargs) -> str:
+        """异步对话接口"""
+        try:
+            response = await self._get_async_client().chat.completions.create(
+                messages=messages,
+                **self._chat_params(**kwargs)
+            )
+            return response.choices[0].message.content
+        except Exception as e:
+            raise RuntimeError(f"OpenAI chat error: {str(e)}")
+
+    async def astream(self, messages: List[Dict[str, str]], **kwargs) -> AsyncGenerator[str, None]:
+        """异步流式对话接口"""
+        try:
+            response = await self._get_async_client().chat.completions.create(
+                messages=messages,
+                stream=True,
+                **self._chat_params(**kwargs)
+            )
+            async for chunk in response:
+                if chunk.choices and chunk.choices[0].delta.content:
                     yield chunk.choices[0].delta.content
         except Exception as e:
-            raise RuntimeError(f"OpenAI stream chat error: {str(e)}") 
\ No newline at end of file
+            raise RuntimeError(f"OpenAI stream chat error: {str(e)}")
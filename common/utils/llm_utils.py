@@ -1,13 +1,62 @@
 import os
-from typing import Optional, Dict, Any, List, Generator, Union
+from typing import Optional, Dict, Any, List, Generator, Union, AsyncGenerator
 import logging
-from functools import wraps
-import time
 import atexit
+import asyncio
 import threading
+from functools import partial
 import torch
 
 from common.utils.llm_models import ChatGLM, OpenAILLM, AnthropicLLM, DoubaoLLM
+from common.utils.http_utils import configure_http_pool
+from common.utils.resilience_utils import Resilience, RetryBudget, CircuitBreaker
+from common.utils.router_utils import Backend, LLMRouter
+from common.utils.response_cache_utils import (
+    ResponseCache, CacheLookup, replay_stream, areplay_stream, record_stream, arecord_stream
+)
+
+# 默认重试和熔断配置，可通过 LLM['resilience'] 覆盖
+DEFAULT_RESILIENCE_CONFIG = {
+    'max_retries': 3,
+    'base_delay': 0.5,
+    'max_delay': 8.0,
+    'multiplier': 2.0,
+    'max_retry_after': 30.0,
+    'retry_budget_ratio': 0.2,
+    'retry_budget_min_per_second': 1.0,
+    'retry_budget_window': 10.0,
+    'breaker_failure_threshold': 5,
+    'breaker_recovery_timeout': 30.0
+}
+
+# 默认路由配置，可通过 LLM['router'] 覆盖
+DEFAULT_ROUTER_CONFIG = {
+    'strategy': 'weighted',
+    'failover': True,
+    'max_failover': 2,
+    'latency_window': 200,
+    'min_samples': 20,
+    'hedge': False,
+    'hedge_delay_ms': 0,
+    'hedge_min_delay_ms': 200
+}
+
+# 默认响应缓存配置，可通过 LLM['response_cache'] 覆盖；只有 routes 中开启的调用方才使用缓存
+DEFAULT_RESPONSE_CACHE_CONFIG = {
+    'enabled': True,
+    'max_size': 1000,
+    'ttl': 3600,
+    'semantic': False,
+    'similarity_threshold': 0.95,
+    'replay_chunk_chars': 32,
+    'routes': {}
+}
+
+# 模型名称前缀 -> 模型类型，后端配置中未指定 provider 时使用
+MODEL_PREFIXES = ('chatglm', 'gpt', 'claude', 'doubao')
+
+# 后端配置中不传给模型实例的字段
+BACKEND_EXCLUDED_KEYS = ('backends', 'router', 'resilience', 'http_pool', 'response_cache', 'name', 'weight')
 
 logger = logging.getLogger(__name__)
 
@@ -92,6 +141,22 @@ class LLMUtils:
         
         # 设置环境变量，禁用多进程
         os.environ["TOKENIZERS_PARALLELISM"] = "false"
+
+        # 远程模型共用的HTTP连接池
+        configure_http_pool(self.config.get('http_pool'))
+
+        # 重试和熔断
+        resilience_config = {**DEFAULT_RESILIENCE_CONFIG, **(self.config.get('resilience') or {})}
+        self._retry_budget = RetryBudget(
+            ratio=resilience_config['retry_budget_ratio'],
+            min_per_second=resilience_config['retry_budget_min_per_second'],
+            window=resilience_config['retry_budget_window']
+        )
+        self._resiliences: Dict[str, Resilience] = {}
+        self._resilience_lock = threading.Lock()
+
+        # 响应缓存
+        self._init_response_cache()
         
         # 验证必要的配置
         if not self.config.get('api_key'):
@@ -100,114 +165,304 @@ class LLMUtils:
             raise ValueError("LLM初始化失败: 缺少 base_url")
             
     def _init_models(self):
-        """初始化模型"""
+        """初始化模型和路由"""
         logger.debug(f"初始化模型: {self.config['model_name']}")
         self.models = {}
         try:
-            self._load_model(self.config['model_name'])
+            self._init_router()
+            for backend in self._router.backends:
+                self._load_model(backend.name)
         except Exception as e:
             logger.error(f"模型初始化失败: {str(e)}")
             raise
-    
+
+    def _init_router(self):
+        """
+        根据 LLM['backends'] 创建路由，未配置时只有默认模型一个后端
+
+        每个后端的配置为顶层配置加上后端自己的字段(model_name、api_key、base_url 等)，
+        后端名称默认为模型名称
+        """
+        self._backend_configs: Dict[str, Dict[str, Any]] = {}
+        base_config = {key: value for key, value in self.config.items() if key not in BACKEND_EXCLUDED_KEYS}
+        backends_config = self.config.get('backends') or [{'model_name': self.config['model_name']}]
+        router_config = {**DEFAULT_ROUTER_CONFIG, **(self.config.get('router') or {})}
+
+        backends = []
+        for backend_config in backends_config:
+            model_name = backend_config.get('model_name') or self.config['model_name']
+            name = backend_config.get('name') or model_name
+            if name in self._backend_configs:
+                raise ValueError(f"大模型后端名称重复: {name}")
+            self._backend_configs[name] = {
+                **base_config,
+                **{key: value for key, value in backend_config.items() if key not in BACKEND_EXCLUDED_KEYS},
+                'model_name': model_name
+            }
+            backends.append(Backend(name, backend_config.get('weight', 1.0), self._resilience(name),
+                                    window=router_config['latency_window']))
+
+        hedge_delay_ms = router_config['hedge_delay_ms']
+        self._router = LLMRouter(
+            backends,
+            strategy=router_config['strategy'],
+            failover=router_config['failover'],
+            max_failover=router_config['max_failover'],
+            min_samples=router_config['min_samples'],
+            hedge=router_config['hedge'],
+            hedge_delay=hedge_delay_ms / 1000 if hedge_delay_ms else None,
+            hedge_min_delay=router_config['hedge_min_delay_ms'] / 1000
+        )
+        logger.info(f"大模型路由: {[backend.name for backend in backends]}，策略: {router_config['strategy']}")
+
+    def _init_response_cache(self):
+        """根据 LLM['response_cache'] 创建响应缓存，语义匹配复用向量检索的编码模型"""
+        cache_config = {**DEFAULT_RESPONSE_CACHE_CONFIG, **(self.config.get('response_cache') or {})}
+        self._cache_config = cache_config
+        self._response_cache: Optional[ResponseCache] = None
+        if not cache_config['enabled']:
+            return
+        self._response_cache = ResponseCache(
+            max_size=cache_config['max_size'],
+            ttl=cache_config['ttl'],
+            semantic=cache_config['semantic'],
+            similarity_threshold=cache_config['similarity_threshold'],
+            encoder=self._resolve_prompt_encoder() if cache_config['semantic'] else None
+        )
+
+    @staticmethod
+    def _resolve_prompt_encoder():
+        """创建缓存时获取一次编码函数，查询缓存时不再重复获取向量检索实例；获取失败时不开启语义匹配"""
+        try:
+            from common.utils.vector_utils import VectorUtils
+            return VectorUtils().encode
+        except Exception as e:
+            logger.warning(f"获取提示词编码模型失败，响应缓存不开启语义匹配: {str(e)}")
+            return None
+
+    def _cache_lookup(self, route: Optional[str], messages: List[Dict[str, str]], model_name: Optional[str],
+                      kwargs: Dict[str, Any]) -> Optional[CacheLookup]:
+        """调用方开启了缓存时查询缓存，未开启时返回 None"""
+        if self._response_cache is None or not route or not self._cache_config['routes'].get(route):
+            return None
+        # 流式和非流式输出的内容相同，共用缓存
+        params = {key: value for key, value in kwargs.items() if key != 'stream'}
+        params['model_name'] = model_name
+        return self._response_cache.lookup(messages, params, route)
+
+    async def _acache_lookup(self, route: Optional[str], messages: List[Dict[str, str]], model_name: Optional[str],
+                             kwargs: Dict[str, Any]) -> Optional[CacheLookup]:
+        """异步查询缓存，语义匹配需要生成向量时在线程池中执行"""
+        if self._response_cache is not None and self._response_cache.semantic:
+            return await asyncio.get_running_loop().run_in_executor(
+                None, self._cache_lookup, route, messages, model_name, kwargs)
+        return self._cache_lookup(route, messages, model_name, kwargs)
+
+    @staticmethod
+    def _model_type(config: Dict[str, Any]) -> str:
+        """模型类型: 后端配置的 provider，未配置时按模型名称前缀判断"""
+        model_type = config.get('provider')
+        if model_type:
+            if model_type not in MODEL_PREFIXES:
+                raise ValueError(f"Unsupported provider: {model_type}")
+            return model_type
+        for prefix in MODEL_PREFIXES:
+            if config['model_name'].startswith(prefix):
+                return prefix
+        raise ValueError(f"Unsupported model: {config['model_name']}")
+
     def _load_model(self, model_name: str):
-        """加载指定模型"""
+        """
+        加载指定模型
+
+        Args:
+            model_name: 后端名称或模型名称，不是已配置的后端时使用顶层配置加上该模型名称
+        """
         logger.debug(f"加载模型 开始: {model_name}")
         try:
             # 检查模型是否已经加载
             if model_name in self.models:
                 return
-                
-            # 获取模型类型
-            model_type = None
-            if model_name.startswith('chatglm'):
-                model_type = 'chatglm'
-            elif model_name.startswith('gpt'):
-                model_type = 'gpt'
-            elif model_name.startswith('claude'):
-                model_type = 'claude'
-            elif model_name.startswith('doubao'):
-                model_type = 'doubao'
-            else:
-                raise ValueError(f"Unsupported model: {model_name}")
-            
-            # 检查是否已存在同类型模型实例
-            for existing_model_name, existing_model in self.models.items():
-                if existing_model_name.startswith(model_type):
-                    logger.info(f"复用已存在的{model_type}模型实例: {existing_model_name}")
-                    self.models[model_name] = existing_model
-                    return
-            
-            # 创建新的模型实例
+
+            config = self._backend_configs.get(model_name)
+            if config is None:
+                config = {key: value for key, value in self.config.items() if key not in BACKEND_EXCLUDED_KEYS}
+                config['model_name'] = model_name
+            model_type = self._model_type(config)
+
+            # 每个后端一个模型实例，不同模型名称不能共用实例(实例使用自己的 model_name 发起请求)
             if model_type == 'chatglm':
-                self.models[model_name] = ChatGLM(self.config)
+                model = ChatGLM(config)
             elif model_type == 'gpt':
-                self.models[model_name] = OpenAILLM(self.config)
+                model = OpenAILLM(config)
             elif model_type == 'claude':
-                self.models[model_name] = AnthropicLLM(self.config)
-            elif model_type == 'doubao':
+                model = AnthropicLLM(config)
+            else:
                 logger.debug(f"加载doubao模型开始: {model_name}")
-                self.models[model_name] = DoubaoLLM(self.config)
-                logger.debug(f"加载doubao模型成功: {self.models[model_name]}")
-            
-            self.models[model_name].load_model()
+                model = DoubaoLLM(config)
+
+            model.load_model()
+            self.models[model_name] = model
+            logger.debug(f"加载模型成功: {model_name}")
         except Exception as e:
             self.logger.error(f"Failed to load model {model_name}: {str(e)}")
             raise
     
-    def retry_on_error(max_retries: int = 3, delay: int = 1):
-        """重试装饰器"""
-        def decorator(func):
-            @wraps(func)
-            def wrapper(*args, **kwargs):
-                for i in range(max_retries):
-                    try:
-                        return func(*args, **kwargs)
-                    except Exception as e:
-                        if i == max_retries - 1:
-                            raise
-                        logger.warning(f"Retry {i+1}/{max_retries} due to error: {str(e)}")
-                        time.sleep(delay)
-                return None
-            return wrapper
-        return decorator
-    
-    @retry_on_error()
-    def generate_text(self, prompt: str, model_name: Optional[str] = None, **kwargs) -> str:
-        """生成文本"""
+    def _resilience(self, model_name: str) -> Resilience:
+        """获取模型对应后端的容错调用器(重试、熔断)，所有后端共用一个重试预算"""
+        with self._resilience_lock:
+            resilience = self._resiliences.get(model_name)
+            if resilience is None:
+                config = {**DEFAULT_RESILIENCE_CONFIG, **(self.config.get('resilience') or {})}
+                resilience = Resilience(
+                    model_name,
+                    max_retries=config['max_retries'],
+                    base_delay=config['base_delay'],
+                    max_delay=config['max_delay'],
+                    multiplier=config['multiplier'],
+                    max_retry_after=config['max_retry_after'],
+                    budget=self._retry_budget,
+                    breaker=CircuitBreaker(model_name, config['breaker_failure_threshold'],
+                                           config['breaker_recovery_timeout'])
+                )
+                self._resiliences[model_name] = resilience
+            return resilience
+
+    def _get_model(self, model_name: Optional[str] = None):
         model_name = model_name or self.config['model_name']
         if model_name not in self.models:
             self._load_model(model_name)
-        
-        return self.models[model_name].generate_text(prompt, **kwargs)
+        return model_name, self.models[model_name]
+
+    def generate_text(self, prompt: str, model_name: Optional[str] = None, **kwargs) -> str:
+        """生成文本，未指定模型时经过路由"""
+        if model_name is None:
+            return self._router.call(lambda backend: self.models[backend.name].generate_text(prompt, **kwargs))
+        model_name, model = self._get_model(model_name)
+        return self._resilience(model_name).call(model.generate_text, prompt, **kwargs)
     
-    @retry_on_error()
     def get_embeddings(self, text: str, model_name: Optional[str] = None) -> List[float]:
         """获取文本嵌入"""
-        model_name = model_name or self.config['model_name']
-        if model_name not in self.models:
-            self._load_model(model_name)
-        
-        return self.models[model_name].get_embeddings(text)
+        model_name, model = self._get_model(model_name)
+        return self._resilience(model_name).call(model.get_embeddings, text)
     
-    @retry_on_error()
-    def chat(self, messages: List[Dict[str, str]], model_name: Optional[str] = None, **kwargs) -> Union[str, Generator[str, None, None]]:
+    def chat(self, messages: List[Dict[str, str]], model_name: Optional[str] = None,
+             cache_route: Optional[str] = None, **kwargs) -> Union[str, Generator[str, None, None]]:
         """对话接口
         
         Args:
             messages: 消息列表
-            model_name: 模型名称
+            model_name: 模型名称，为空时经过路由选择后端
+            cache_route: 调用方名称，在 LLM['response_cache']['routes'] 中开启时使用响应缓存
             stream: 是否使用流式输出
             **kwargs: 其他参数
             
         Returns:
-            如果stream=True，返回生成器，否则返回完整响应
+            如果stream=True，返回生成器(输出第一个数据块之前失败时自动重试，缓存命中时重放缓存的响应)，
+            否则返回完整响应
         """
-        model_name = model_name or self.config['model_name']
-        if model_name not in self.models:
-            self._load_model(model_name)
-        
-        return self.models[model_name].chat(messages, **kwargs)
+        lookup = self._cache_lookup(cache_route, messages, model_name, kwargs)
+        if lookup is not None and lookup.response is not None:
+            if kwargs.get('stream'):
+                return replay_stream(lookup.response, self._cache_config['replay_chunk_chars'])
+            return lookup.response
+        response = self._chat(messages, model_name, **kwargs)
+        if lookup is None:
+            return response
+        if kwargs.get('stream'):
+            return record_stream(response, partial(self._response_cache.store, lookup))
+        self._response_cache.store(lookup, response)
+        return response
+
+    def _chat(self, messages: List[Dict[str, str]], model_name: Optional[str] = None,
+              **kwargs) -> Union[str, Generator[str, None, None]]:
+        if model_name is None:
+            if kwargs.get('stream'):
+                return self._router.stream(lambda backend: self.models[backend.name].chat(messages, **kwargs))
+            return self._router.call(lambda backend: self.models[backend.name].chat(messages, **kwargs))
+        model_name, model = self._get_model(model_name)
+        resilience = self._resilience(model_name)
+        if kwargs.get('stream'):
+            return resilience.stream(lambda: model.chat(messages, **kwargs))
+        return resilience.call(model.chat, messages, **kwargs)
     
+    async def achat(self, messages: List[Dict[str, str]], model_name: Optional[str] = None,
+                    cache_route: Optional[str] = None, **kwargs) -> str:
+        """异步对话接口，返回完整响应
+
+        远程模型使用原生异步客户端(共享连接池)，本地模型在线程池中执行，不阻塞事件循环
+
+        Args:
+            messages: 消息列表
+            model_name: 模型名称，为空时经过路由选择后端
+            cache_route: 调用方名称，在 LLM['response_cache']['routes'] 中开启时使用响应缓存
+            **kwargs: 其他参数
+        """
+        lookup = await self._acache_lookup(cache_route, messages, model_name, kwargs)
+        if lookup is not None and lookup.response is not None:
+            return lookup.response
+        response = await self._achat(messages, model_name, **kwargs)
+        if lookup is not None:
+            self._response_cache.store(lookup, response)
+        return response
+
+    async def _achat(self, messages: List[Dict[str, str]], model_name: Optional[str] = None, **kwargs) -> str:
+        if model_name is None:
+            return await self._router.acall(lambda backend: self.models[backend.name].achat(messages, **kwargs))
+        model_name, model = self._get_model(model_name)
+        return await self._resilience(model_name).acall(model.achat, messages, **kwargs)
+
+    async def astream(self, messages: List[Dict[str, str]], model_name: Optional[str] = None,
+                      cache_route: Optional[str] = None, **kwargs) -> AsyncGenerator[str, None]:
+        """异步流式对话接口，输出第一个数据块之前失败时自动重试
+
+        未指定模型时经过路由选择后端，出错时切换后端，开启对冲时首 token 过慢会同时请求备用后端；
+        响应缓存命中时按流式输出重放缓存的响应，未命中时完整输出结束后写入缓存
+
+        Args:
+            messages: 消息列表
+            model_name: 模型名称，为空时经过路由选择后端
+            cache_route: 调用方名称，在 LLM['response_cache']['routes'] 中开启时使用响应缓存
+            **kwargs: 其他参数
+
+        Yields:
+            str: 增量内容
+        """
+        lookup = await self._acache_lookup(cache_route, messages, model_name, kwargs)
+        if lookup is not None and lookup.response is not None:
+            stream = areplay_stream(lookup.response, self._cache_config['replay_chunk_chars'])
+        else:
+            if model_name is None:
+                stream = self._router.astream(lambda backend: self.models[backend.name].astream(messages, **kwargs))
+            else:
+                model_name, model = self._get_model(model_name)
+                stream = self._resilience(model_name).astream(lambda: model.astream(messages, **kwargs))
+            if lookup is not None:
+                stream = arecord_stream(stream, partial(self._response_cache.store, lookup))
+        async for chunk in stream:
+            yield chunk
+
+    def resilience_stats(self) -> Dict[str, Any]:
+        """各后端的重试和熔断指标"""
+        with self._resilience_lock:
+            resiliences = dict(self._resiliences)
+        return {model_name: resilience.stats() for model_name, resilience in resiliences.items()}
+
+    def response_cache_stats(self) -> Dict[str, Any]:
+        """响应缓存的命中率等指标"""
+        if self._response_cache is None:
+            return {"enabled": False}
+        return {"enabled": True, "routes_enabled": self._cache_config['routes'], **self._response_cache.stats()}
+
+    def clear_response_cache(self):
+        """清空响应缓存"""
+        if self._response_cache is not None:
+            self._response_cache.clear()
+
+    def router_stats(self) -> Dict[str, Any]:
+        """路由指标: 切换、对冲次数和各后端的延迟分位数"""
+        return self._router.stats()
+
     def update_config(self, **kwargs):
         """更新配置"""
         for key, value in kwargs.items():
@@ -222,5 +477,8 @@ class LLMUtils:
         self.config = config
         # 清空已加载的模型
         self.models.clear()
-        # 重新加载默认模型
-        self._load_model(self.config['model_name']) 
\ No newline at end of file
+        # 重新创建响应缓存、路由并加载各后端模型
+        self._init_response_cache()
+        self._init_router()
+        for backend in self._router.backends:
+            self._load_model(backend.name)
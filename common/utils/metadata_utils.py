@@ -0,0 +1,342 @@
+import os
+import json
+import sqlite3
+import logging
+import threading
+from typing import List, Dict, Any, Iterable, Iterator, Tuple, Optional
+
+logger = logging.getLogger(__name__)
+
+# 单条SQL的参数个数上限(旧版SQLite默认999)
+MAX_SQL_PARAMS = 900
+
+
+def _file_ext(file_path: str) -> str:
+    """归一化的文件扩展名，如 .pdf"""
+    return os.path.splitext(file_path)[1].lower()
+
+
+class ChunkMetadataStore:
+    """
+    基于SQLite的分块元数据存储
+
+    元数据按向量ID存放在磁盘表中，检索时只读取 top_k 对应的行，
+    进程内不再常驻全部分块文本。
+    """
+
+    COLUMNS = ("file_path", "chunk", "chunk_index", "processed_at", "file_hash")
+
+    def __init__(self, db_path: str):
+        """
+        初始化元数据存储
+
+        Args:
+            db_path: SQLite数据库文件路径
+        """
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.db_path = db_path
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._create_tables()
+
+    def _create_tables(self):
+        with self._lock:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS chunks (
+                    id INTEGER PRIMARY KEY,
+                    file_path TEXT NOT NULL,
+                    chunk TEXT NOT NULL,
+                    chunk_index INTEGER NOT NULL,
+                    processed_at TEXT,
+                    file_hash TEXT,
+                    file_ext TEXT
+                )
+            """)
+            # 兼容旧表结构
+            columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(chunks)")}
+            if "file_hash" not in columns:
+                self._conn.execute("ALTER TABLE chunks ADD COLUMN file_hash TEXT")
+            if "file_ext" not in columns:
+                self._conn.execute("ALTER TABLE chunks ADD COLUMN file_ext TEXT")
+                file_paths = [row["file_path"] for row in self._conn.execute("SELECT DISTINCT file_path FROM chunks")]
+                self._conn.executemany("UPDATE chunks SET file_ext = ? WHERE file_path = ?",
+                                       [(_file_ext(file_path), file_path) for file_path in file_paths])
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_chunks_file_path ON chunks(file_path)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_chunks_processed_at ON chunks(processed_at)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_chunks_file_ext ON chunks(file_ext)")
+            # 文件标签属于文档本身，重建索引时保留
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS file_tags (
+                    file_path TEXT NOT NULL,
+                    tag TEXT NOT NULL,
+                    PRIMARY KEY (file_path, tag)
+                ) WITHOUT ROWID
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_file_tags_tag ON file_tags(tag)")
+            # 文件处理时的大小和修改时间，大小和修改时间都未变化时跳过内容哈希
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS file_stats (
+                    file_path TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL
+                ) WITHOUT ROWID
+            """)
+            self._conn.commit()
+
+    def _row_to_dict(self, row: sqlite3.Row) -> Dict[str, Any]:
+        return {column: row[column] for column in self.COLUMNS}
+
+    def add_many(self, metadata: Dict[int, Dict[str, Any]]):
+        """
+        批量写入元数据
+
+        Args:
+            metadata: 向量ID -> 元数据
+        """
+        rows = [
+            (int(idx), meta["file_path"], meta["chunk"], meta["chunk_index"],
+             meta.get("processed_at"), meta.get("file_hash"), _file_ext(meta["file_path"]))
+            for idx, meta in metadata.items()
+        ]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO chunks (id, file_path, chunk, chunk_index, processed_at, file_hash, file_ext) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            self._conn.commit()
+
+    def get_many(self, ids: Iterable[int]) -> Dict[int, Dict[str, Any]]:
+        """
+        按向量ID批量读取元数据
+
+        Args:
+            ids: 向量ID列表
+
+        Returns:
+            dict: 向量ID -> 元数据，不存在的ID不会出现在结果中
+        """
+        ids = [int(i) for i in ids if int(i) >= 0]
+        if not ids:
+            return {}
+        result = {}
+        with self._lock:
+            # 分批查询，避免超过SQLite的参数个数上限
+            for start in range(0, len(ids), MAX_SQL_PARAMS):
+                batch = ids[start:start + MAX_SQL_PARAMS]
+                cursor = self._conn.execute(f"SELECT * FROM chunks WHERE id IN ({','.join('?' * len(batch))})", batch)
+                result.update((row["id"], self._row_to_dict(row)) for row in cursor)
+        return result
+
+    def existing_ids(self, ids: Iterable[int]) -> set:
+        """返回 ids 中在元数据表里存在的向量ID"""
+        ids = [int(i) for i in ids]
+        existing = set()
+        with self._lock:
+            for start in range(0, len(ids), MAX_SQL_PARAMS):
+                batch = ids[start:start + MAX_SQL_PARAMS]
+                cursor = self._conn.execute(f"SELECT id FROM chunks WHERE id IN ({','.join('?' * len(batch))})", batch)
+                existing.update(row["id"] for row in cursor)
+        return existing
+
+    def iter_file_ids(self) -> Iterator[Tuple[int, str, Optional[str]]]:
+        """
+        遍历全部 (向量ID, 文件路径, 文件哈希)，不读取分块文本，用于构建内存倒排索引
+        """
+        with self._lock:
+            rows = self._conn.execute("SELECT id, file_path, file_hash FROM chunks ORDER BY id").fetchall()
+        for row in rows:
+            yield row["id"], row["file_path"], row["file_hash"]
+
+    def iter_chunks(self, batch_size: int = 1000) -> Iterator[List[Tuple[int, str]]]:
+        """
+        按ID顺序分批遍历 (向量ID, 分块文本)
+
+        Args:
+            batch_size: 每批数量
+        """
+        last_id = -1
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT id, chunk FROM chunks WHERE id > ? ORDER BY id LIMIT ?", (last_id, batch_size)
+                ).fetchall()
+            if not rows:
+                return
+            last_id = rows[-1]["id"]
+            yield [(row["id"], row["chunk"]) for row in rows]
+
+    def max_id(self) -> int:
+        """当前最大的向量ID，没有记录时返回 -1"""
+        with self._lock:
+            value = self._conn.execute("SELECT MAX(id) FROM chunks").fetchone()[0]
+        return -1 if value is None else value
+
+    def ids_by_file(self, file_path: str) -> List[int]:
+        """获取文件对应的全部向量ID"""
+        with self._lock:
+            cursor = self._conn.execute("SELECT id FROM chunks WHERE file_path = ?", (file_path,))
+            return [row["id"] for row in cursor]
+
+    def has_file(self, file_path: str) -> bool:
+        """文件是否已经写入过元数据"""
+        with self._lock:
+            cursor = self._conn.execute("SELECT 1 FROM chunks WHERE file_path = ? LIMIT 1", (file_path,))
+            return cursor.fetchone() is not None
+
+    def delete_ids(self, ids: Iterable[int]):
+        """按向量ID批量删除元数据"""
+        ids = [(int(i),) for i in ids]
+        with self._lock:
+            self._conn.executemany("DELETE FROM chunks WHERE id = ?", ids)
+            self._conn.commit()
+
+    def set_file_tags(self, file_path: str, tags: Iterable[str]):
+        """
+        设置文件的标签(覆盖原有标签)
+
+        Args:
+            file_path: 文件路径
+            tags: 标签列表
+        """
+        rows = [(file_path, tag) for tag in sorted(set(tags))]
+        with self._lock:
+            self._conn.execute("DELETE FROM file_tags WHERE file_path = ?", (file_path,))
+            self._conn.executemany("INSERT INTO file_tags (file_path, tag) VALUES (?, ?)", rows)
+            self._conn.commit()
+
+    def get_file_tags(self, file_path: str) -> List[str]:
+        """获取文件的标签"""
+        with self._lock:
+            cursor = self._conn.execute("SELECT tag FROM file_tags WHERE file_path = ? ORDER BY tag", (file_path,))
+            return [row["tag"] for row in cursor]
+
+    def delete_file_tags(self, file_path: str):
+        """删除文件的标签"""
+        with self._lock:
+            self._conn.execute("DELETE FROM file_tags WHERE file_path = ?", (file_path,))
+            self._conn.commit()
+
+    def set_file_stat(self, file_path: str, size: int, mtime_ns: int):
+        """记录文件处理时的大小和修改时间(纳秒)"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO file_stats (file_path, size, mtime_ns) VALUES (?, ?, ?)",
+                (file_path, int(size), int(mtime_ns))
+            )
+            self._conn.commit()
+
+    def get_file_stat(self, file_path: str) -> Optional[Tuple[int, int]]:
+        """获取文件处理时的 (大小, 修改时间纳秒)，没有记录时返回 None"""
+        with self._lock:
+            row = self._conn.execute("SELECT size, mtime_ns FROM file_stats WHERE file_path = ?",
+                                     (file_path,)).fetchone()
+        return (row["size"], row["mtime_ns"]) if row else None
+
+    def delete_file_stat(self, file_path: str):
+        """删除文件的大小和修改时间记录"""
+        with self._lock:
+            self._conn.execute("DELETE FROM file_stats WHERE file_path = ?", (file_path,))
+            self._conn.commit()
+
+    def filter_ids(self, file_paths: Optional[Iterable[str]] = None, file_types: Optional[Iterable[str]] = None,
+                   processed_after: Optional[str] = None, processed_before: Optional[str] = None,
+                   tags: Optional[Iterable[str]] = None) -> List[int]:
+        """
+        按元数据条件筛选向量ID，各条件之间为"且"，同一条件的多个取值之间为"或"
+
+        Args:
+            file_paths: 文件路径列表
+            file_types: 文件扩展名列表，如 .pdf
+            processed_after: 处理时间下限(ISO格式，含)
+            processed_before: 处理时间上限(ISO格式，含)
+            tags: 标签列表，文件包含任一标签即匹配
+
+        Returns:
+            List[int]: 满足条件的向量ID
+        """
+        # 取值列表写入临时表后用子查询匹配，不受SQL参数个数上限限制
+        clauses, params, values = [], [], {}
+        if file_paths is not None:
+            values['file_path'] = list(file_paths)
+            clauses.append("file_path IN (SELECT value FROM temp.filter_values WHERE name = 'file_path')")
+        if file_types is not None:
+            values['file_ext'] = [file_type.lower() if file_type.startswith('.') else f".{file_type.lower()}"
+                                  for file_type in file_types]
+            clauses.append("file_ext IN (SELECT value FROM temp.filter_values WHERE name = 'file_ext')")
+        if processed_after:
+            clauses.append("processed_at >= ?")
+            params.append(processed_after)
+        if processed_before:
+            clauses.append("processed_at <= ?")
+            params.append(processed_before)
+        if tags is not None:
+            values['tag'] = list(tags)
+            clauses.append("file_path IN (SELECT file_path FROM file_tags WHERE tag IN "
+                           "(SELECT value FROM temp.filter_values WHERE name = 'tag'))")
+        query = "SELECT id FROM chunks"
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        with self._lock:
+            if values:
+                self._conn.execute("CREATE TEMP TABLE IF NOT EXISTS filter_values (name TEXT NOT NULL, value TEXT NOT NULL)")
+                self._conn.execute("DELETE FROM temp.filter_values")
+                self._conn.executemany("INSERT INTO temp.filter_values (name, value) VALUES (?, ?)",
+                                       [(name, value) for name, items in values.items() for value in items])
+            try:
+                return [row["id"] for row in self._conn.execute(query, params)]
+            finally:
+                if values:
+                    self._conn.execute("DELETE FROM temp.filter_values")
+                    self._conn.commit()
+
+    def count(self) -> int:
+        """分块总数"""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def file_count(self) -> int:
+        """文件总数"""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(DISTINCT file_path) FROM chunks").fetchone()[0]
+
+    def import_json(self, json_path: str) -> int:
+        """
+        从旧版 metadata.json 导入元数据
+
+        Args:
+            json_path: metadata.json 文件路径
+
+        Returns:
+            int: 导入的记录数
+        """
+        with open(json_path, 'r', encoding='utf-8') as f:
+            metadata = json.load(f)
+        self.add_many({int(idx): meta for idx, meta in metadata.items()})
+        return len(metadata)
+
+    def clear(self, keep_tags: bool = False):
+        """
+        删除全部分块元数据和文件标签
+
+        Args:
+            keep_tags: 保留磁盘上仍存在的文件的标签(重建索引时使用)，已不存在的文件的标签仍会删除
+        """
+        with self._lock:
+            self._conn.execute("DELETE FROM chunks")
+            self._conn.execute("DELETE FROM file_stats")
+            if keep_tags:
+                file_paths = [row["file_path"] for row in self._conn.execute("SELECT DISTINCT file_path FROM file_tags")]
+                self._conn.executemany("DELETE FROM file_tags WHERE file_path = ?",
+                                       [(file_path,) for file_path in file_paths if not os.path.exists(file_path)])
+            else:
+                self._conn.execute("DELETE FROM file_tags")
+            self._conn.commit()
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
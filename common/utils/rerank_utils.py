@@ -0,0 +1,193 @@
+import os
+import hashlib
+import logging
+import threading
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+import torch
+from sentence_transformers import CrossEncoder
+
+from common.utils.cache_utils import LRUCache
+from common.utils.executor_utils import BoundedExecutor
+
+logger = logging.getLogger(__name__)
+
+# 尝试导入可能不存在的包
+try:
+    from transformers import AutoTokenizer
+    from optimum.onnxruntime import ORTModelForSequenceClassification, ORTQuantizer
+    from optimum.onnxruntime.configuration import AutoQuantizationConfig
+    ONNX_AVAILABLE = True
+except ImportError:
+    ONNX_AVAILABLE = False
+
+BACKENDS = ('torch', 'onnx')
+
+
+class Reranker:
+    """
+    交叉编码器重排序
+
+    对向量检索召回的候选分块按 (查询, 分块) 逐对打分后重新排序。打分按批进行，
+    (查询, 分块) 的分数缓存在 LRU 缓存中；异步接口在独立的有界线程池中执行，
+    线程池繁忙或超时时由调用方跳过重排序，直接使用向量检索的顺序。
+
+    后端:
+        torch: sentence-transformers CrossEncoder，CPU 上可开启 int8 动态量化
+        onnx: optimum + onnxruntime，首次加载时导出 ONNX 模型，可开启 int8 量化
+    """
+
+    def __init__(self, model_name: str, model_dir: str, backend: str = 'torch', quantize: bool = False,
+                 batch_size: int = 32, max_length: int = 512, cache_size: int = 4096,
+                 cache_ttl: Optional[float] = 3600, workers: int = 1, max_pending: int = 8,
+                 device: str = "cuda" if torch.cuda.is_available() else "cpu"):
+        """
+        初始化重排序模型
+
+        Args:
+            model_name: 交叉编码器模型名称
+            model_dir: 模型保存目录
+            backend: 推理后端, torch 或 onnx
+            quantize: 是否使用 int8 量化(仅CPU)
+            batch_size: 打分批大小
+            max_length: (查询, 分块) 拼接后的最大长度
+            cache_size: 分数缓存条目数
+            cache_ttl: 分数缓存过期时间(秒)
+            workers: 重排序线程数
+            max_pending: 重排序最大排队数
+            device: 运行设备
+        """
+        if backend not in BACKENDS:
+            raise ValueError(f"不支持的重排序后端: {backend}，可选: {', '.join(BACKENDS)}")
+        if backend == 'onnx' and not ONNX_AVAILABLE:
+            logger.warning("optimum/onnxruntime 未安装，重排序改用 torch 后端")
+            backend = 'torch'
+        self.model_name = model_name
+        self.backend = backend
+        self.quantize = quantize and device == 'cpu'
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self.device = device
+        self._model_path = os.path.join(model_dir, model_name)
+        self._model = None
+        self._tokenizer = None
+        self._load_lock = threading.Lock()
+        self._cache = LRUCache(cache_size, cache_ttl)
+        self._executor = BoundedExecutor(max_workers=workers, max_pending=max_pending, name='rerank')
+
+    def _load_torch(self):
+        if os.path.exists(self._model_path):
+            model = CrossEncoder(self._model_path, max_length=self.max_length, device=self.device)
+        else:
+            logger.info(f"重排序模型不存在，开始下载: {self.model_name}")
+            model = CrossEncoder(self.model_name, max_length=self.max_length, device=self.device)
+            model.save(self._model_path)
+        model.model.eval()
+        if self.quantize:
+            model.model = torch.quantization.quantize_dynamic(model.model, {torch.nn.Linear}, dtype=torch.qint8)
+        return model, None
+
+    def _load_onnx(self):
+        onnx_path = f"{self._model_path}-onnx"
+        if not os.path.exists(onnx_path):
+            logger.info(f"导出重排序模型为ONNX: {self.model_name}")
+            model = ORTModelForSequenceClassification.from_pretrained(self.model_name, export=True)
+            model.save_pretrained(onnx_path)
+            AutoTokenizer.from_pretrained(self.model_name).save_pretrained(onnx_path)
+        file_name = "model.onnx"
+        if self.quantize:
+            file_name = "model_quantized.onnx"
+            if not os.path.exists(os.path.join(onnx_path, file_name)):
+                logger.info("对ONNX重排序模型做int8动态量化")
+                quantizer = ORTQuantizer.from_pretrained(onnx_path)
+                quantizer.quantize(save_dir=onnx_path,
+                                   quantization_config=AutoQuantizationConfig.avx2(is_static=False, per_channel=False))
+        model = ORTModelForSequenceClassification.from_pretrained(onnx_path, file_name=file_name)
+        return model, AutoTokenizer.from_pretrained(onnx_path)
+
+    def _ensure_model(self):
+        """首次使用时加载模型"""
+        if self._model is None:
+            with self._load_lock:
+                if self._model is None:
+                    logger.info(f"正在加载重排序模型: {self.model_name}，后端: {self.backend}，int8: {self.quantize}")
+                    loader = self._load_onnx if self.backend == 'onnx' else self._load_torch
+                    self._model, self._tokenizer = loader()
+                    logger.info("重排序模型加载成功")
+        return self._model
+
+    def _predict(self, pairs: List[List[str]]) -> np.ndarray:
+        """对 (查询, 分块) 批量打分，返回 0~1 之间的相关度"""
+        model = self._ensure_model()
+        # 直接调用底层模型取 logits，不依赖 CrossEncoder.predict 在各版本间变化的激活函数参数
+        if self.backend == 'torch':
+            tokenizer, network = model.tokenizer, model.model
+        else:
+            tokenizer, network = self._tokenizer, model
+        batches = []
+        for start in range(0, len(pairs), self.batch_size):
+            batch = pairs[start:start + self.batch_size]
+            inputs = tokenizer([p[0] for p in batch], [p[1] for p in batch], padding=True,
+                               truncation=True, max_length=self.max_length, return_tensors='pt')
+            if self.backend == 'torch':
+                inputs = inputs.to(self.device)
+            with torch.no_grad():
+                batches.append(network(**inputs).logits.detach().cpu().float().numpy())
+        logits = np.concatenate(batches).reshape(len(pairs), -1)[:, -1]
+        return 1 / (1 + np.exp(-logits))
+
+    @staticmethod
+    def _cache_key(query: str, chunk: str) -> tuple:
+        return query, hashlib.sha1(chunk.encode('utf-8')).hexdigest()
+
+    def rerank(self, query: str, results: List[Dict[str, Any]], top_n: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        对检索结果重排序
+
+        Args:
+            query: 查询文本
+            results: 检索结果，每项包含 chunk 字段
+            top_n: 返回前 top_n 个结果，默认全部返回
+
+        Returns:
+            按 rerank_score 从高到低排序的结果副本
+        """
+        if not results:
+            return []
+        query = query.strip()
+        keys = [self._cache_key(query, result.get("chunk") or '') for result in results]
+        scores = [self._cache.get(key) for key in keys]
+        missing = [i for i, score in enumerate(scores) if score is None]
+        if missing:
+            predicted = self._predict([[query, results[i].get("chunk") or ''] for i in missing])
+            for i, score in zip(missing, predicted):
+                scores[i] = float(score)
+                self._cache.set(keys[i], scores[i])
+        reranked = [{**result, "rerank_score": score} for result, score in zip(results, scores)]
+        reranked.sort(key=lambda result: result["rerank_score"], reverse=True)
+        return reranked[:top_n] if top_n else reranked
+
+    async def arerank(self, query: str, results: List[Dict[str, Any]], top_n: Optional[int] = None,
+                      timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        异步重排序，在独立的有界线程池中执行
+
+        Raises:
+            ServiceOverloadedException: 重排序队列已满
+            OperationTimeoutException: 重排序超时
+        """
+        if not results:
+            return []
+        return await self._executor.run(self.rerank, query, results, top_n, timeout=timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        """重排序统计信息"""
+        return {
+            "model_name": self.model_name,
+            "backend": self.backend,
+            "quantize": self.quantize,
+            "loaded": self._model is not None,
+            "cache": self._cache.stats(),
+            "executor": self._executor.stats()
+        }
@@ -0,0 +1,400 @@
+"""
+调用远程服务的容错策略: 指数退避 + 随机抖动重试、重试预算、熔断器、Retry-After
+
+同步调用在当前线程中等待，异步调用使用 asyncio.sleep，不阻塞事件循环；
+流式调用在输出第一个数据块之前失败时重试，已经输出内容后失败直接抛出(无法在不重复内容的情况下续传)。
+"""
+
+import time
+import random
+import asyncio
+import logging
+import threading
+from collections import deque
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, AsyncGenerator, Callable, Dict, Generator, Iterator, Optional
+
+from common.exception import CircuitOpenException
+
+logger = logging.getLogger(__name__)
+
+# 可以重试的HTTP状态码，其余 4xx 为请求本身的问题，重试没有意义
+RETRYABLE_STATUS_CODES = {408, 409, 425, 429}
+
+# 没有状态码时视为网络错误的异常类名(按类名匹配，不依赖具体SDK):
+# openai / anthropic 的连接和超时错误，httpx 的传输层错误，requests 的连接和超时错误
+NETWORK_ERROR_NAMES = {
+    'APIConnectionError', 'APITimeoutError', 'TransportError', 'TimeoutException',
+    'ConnectionError', 'Timeout', 'ConnectTimeout', 'ReadTimeout'
+}
+
+
+def _exception_chain(exc: BaseException) -> Iterator[BaseException]:
+    """遍历异常及其 __cause__ / __context__ (模型实现会把SDK异常包装成 RuntimeError)"""
+    seen = set()
+    while exc is not None and id(exc) not in seen:
+        seen.add(id(exc))
+        yield exc
+        exc = exc.__cause__ or exc.__context__
+
+
+def get_status_code(exc: BaseException) -> Optional[int]:
+    """获取异常对应的HTTP状态码，没有时返回 None"""
+    for error in _exception_chain(exc):
+        code = getattr(error, 'status_code', None)
+        if code is None:
+            code = getattr(getattr(error, 'response', None), 'status_code', None)
+        if isinstance(code, int):
+            return code
+    return None
+
+
+def get_retry_after(exc: BaseException) -> Optional[float]:
+    """从异常的响应头中读取 Retry-After(秒数或HTTP日期)，没有时返回 None"""
+    for error in _exception_chain(exc):
+        headers = getattr(getattr(error, 'response', None), 'headers', None)
+        if not headers:
+            continue
+        value = headers.get('retry-after-ms')
+        if value:
+            try:
+                return max(0.0, float(value) / 1000)
+            except ValueError:
+                pass
+        value = headers.get('retry-after')
+        if not value:
+            continue
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            try:
+                retry_at = parsedate_to_datetime(value)
+                return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+            except (TypeError, ValueError):
+                pass
+    return None
+
+
+def is_network_error(exc: BaseException) -> bool:
+    """连接失败、读写超时等网络错误"""
+    for error in _exception_chain(exc):
+        if isinstance(error, (ConnectionError, TimeoutError, asyncio.TimeoutError)):
+            return True
+        if any(cls.__name__ in NETWORK_ERROR_NAMES for cls in type(error).__mro__):
+            return True
+    return False
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """
+    判断异常是否值得重试: 限流(429)、服务端错误(5xx)、网络错误和超时可以重试；
+    参数错误、鉴权失败等 4xx 错误、熔断拒绝以及 TypeError / KeyError 等程序错误不重试
+    """
+    if isinstance(exc, CircuitOpenException):
+        return False
+    code = get_status_code(exc)
+    if code is None:
+        return is_network_error(exc)
+    return code in RETRYABLE_STATUS_CODES or code >= 500
+
+
+class RetryBudget:
+    """
+    重试预算: 时间窗口内的重试次数不超过 min_per_second * window + ratio * 请求数
+
+    后端整体故障时限制重试放大的流量，避免重试风暴把后端压垮
+    """
+
+    def __init__(self, ratio: float = 0.2, min_per_second: float = 1.0, window: float = 10.0):
+        """
+        Args:
+            ratio: 重试次数占请求数的比例上限
+            min_per_second: 请求很少时每秒至少允许的重试次数
+            window: 统计窗口(秒)
+        """
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.window = window
+        self._requests = deque()
+        self._retries = deque()
+        self._lock = threading.Lock()
+
+    def _prune(self, now: float):
+        for timestamps in (self._requests, self._retries):
+            while timestamps and now - timestamps[0] > self.window:
+                timestamps.popleft()
+
+    def record_request(self):
+        """记录一次请求(不含重试)"""
+        now = time.monotonic()
+        with self._lock:
+            self._prune(now)
+            self._requests.append(now)
+
+    def try_acquire(self) -> bool:
+        """申请一次重试，预算用完时返回 False"""
+        now = time.monotonic()
+        with self._lock:
+            self._prune(now)
+            if len(self._retries) >= self.min_per_second * self.window + self.ratio * len(self._requests):
+                return False
+            self._retries.append(now)
+            return True
+
+
+class CircuitBreaker:
+    """
+    熔断器: closed -> open -> half_open -> closed
+
+    连续失败 failure_threshold 次后打开，recovery_timeout 秒内拒绝全部调用；
+    之后进入半开状态，放行一次试探调用，成功则关闭，失败则重新打开。
+    试探调用在 recovery_timeout 内没有结果(如流式输出被客户端中断)时再放行一次。
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, recovery_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.state = 'closed'
+        self.trips = 0
+        self.rejections = 0
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_at = 0.0
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """
+        调用前检查
+
+        Raises:
+            CircuitOpenException: 熔断器打开
+        """
+        with self._lock:
+            if self.state == 'closed':
+                return
+            now = time.monotonic()
+            if self.state == 'open' and now - self._opened_at >= self.recovery_timeout:
+                self.state = 'half_open'
+                self._probe_at = now
+                logger.info(f"熔断器半开，放行试探调用: {self.name}")
+                return
+            if self.state == 'half_open' and now - self._probe_at >= self.recovery_timeout:
+                self._probe_at = now
+                return
+            self.rejections += 1
+        raise CircuitOpenException(f"{self.name} 熔断中，请稍后再试")
+
+    def allows_call(self) -> bool:
+        """当前是否会放行调用(不改变状态)，用于路由时跳过熔断中的后端"""
+        with self._lock:
+            if self.state == 'closed':
+                return True
+            since = self._opened_at if self.state == 'open' else self._probe_at
+            return time.monotonic() - since >= self.recovery_timeout
+
+    def record_success(self):
+        with self._lock:
+            if self.state != 'closed':
+                logger.info(f"熔断器关闭: {self.name}")
+            self.state = 'closed'
+            self._failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.state == 'half_open' or (self.state == 'closed' and self._failures >= self.failure_threshold):
+                self.state = 'open'
+                self._opened_at = time.monotonic()
+                self.trips += 1
+                logger.warning(f"熔断器打开: {self.name}，连续失败 {self._failures} 次，"
+                               f"{self.recovery_timeout} 秒后试探恢复")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self._failures,
+                "trips": self.trips,
+                "rejections": self.rejections
+            }
+
+
+class Resilience:
+    """
+    单个后端的容错调用: 熔断检查 -> 调用 -> 失败时按退避/Retry-After 等待后重试
+
+    重试条件: 异常可重试(is_retryable)、未超过最大重试次数、重试预算未用完、
+    Retry-After 不超过 max_retry_after
+    """
+
+    def __init__(self, name: str, max_retries: int = 3, base_delay: float = 0.5, max_delay: float = 8.0,
+                 multiplier: float = 2.0, max_retry_after: float = 30.0, budget: Optional[RetryBudget] = None,
+                 breaker: Optional[CircuitBreaker] = None):
+        """
+        Args:
+            name: 后端名称，用于日志和指标
+            max_retries: 最大重试次数
+            base_delay: 第一次重试的退避上限(秒)
+            max_delay: 退避上限(秒)
+            multiplier: 退避倍数
+            max_retry_after: 服务端要求等待超过该时间(秒)时不再重试
+            budget: 重试预算，多个后端可以共用
+            breaker: 熔断器
+        """
+        self.name = name
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.multiplier = multiplier
+        self.max_retry_after = max_retry_after
+        self.budget = budget
+        self.breaker = breaker
+        self._lock = threading.Lock()
+        self._metrics = {
+            "calls": 0,
+            "successes": 0,
+            "failures": 0,
+            "retries": 0,
+            "retries_exhausted": 0,
+            "budget_exhausted": 0,
+            "retry_after_honored": 0
+        }
+
+    def _count(self, key: str):
+        with self._lock:
+            self._metrics[key] += 1
+
+    def backoff(self, attempt: int) -> float:
+        """第 attempt 次重试(从0开始)的等待时间: 全抖动指数退避"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * self.multiplier ** attempt))
+
+    def _before_call(self, attempt: int):
+        if attempt == 0:
+            self._count("calls")
+            if self.budget is not None:
+                self.budget.record_request()
+        if self.breaker is not None:
+            self.breaker.before_call()
+
+    def _on_success(self):
+        self._count("successes")
+        if self.breaker is not None:
+            self.breaker.record_success()
+
+    def _on_failure(self, exc: BaseException):
+        self._count("failures")
+        if self.breaker is not None and is_retryable(exc):
+            self.breaker.record_failure()
+
+    def _retry_delay(self, attempt: int, exc: BaseException) -> Optional[float]:
+        """返回重试前的等待时间，不应重试时返回 None"""
+        if not is_retryable(exc):
+            return None
+        if attempt >= self.max_retries:
+            self._count("retries_exhausted")
+            return None
+        retry_after = get_retry_after(exc)
+        if retry_after is not None and retry_after > self.max_retry_after:
+            logger.warning(f"{self.name} 要求 {retry_after:.1f} 秒后重试，超过上限，放弃重试")
+            return None
+        if self.budget is not None and not self.budget.try_acquire():
+            self._count("budget_exhausted")
+            logger.warning(f"{self.name} 重试预算已用完，放弃重试")
+            return None
+        delay = self.backoff(attempt)
+        if retry_after is not None:
+            self._count("retry_after_honored")
+            delay = max(delay, retry_after)
+        self._count("retries")
+        logger.warning(f"{self.name} 调用失败，{delay:.2f} 秒后第 {attempt + 1}/{self.max_retries} 次重试: {exc}")
+        return delay
+
+    def call(self, func: Callable, *args, **kwargs) -> Any:
+        """同步调用"""
+        attempt = 0
+        while True:
+            self._before_call(attempt)
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                self._on_failure(e)
+                delay = self._retry_delay(attempt, e)
+                if delay is None:
+                    raise
+                attempt += 1
+                time.sleep(delay)
+                continue
+            self._on_success()
+            return result
+
+    async def acall(self, func: Callable, *args, **kwargs) -> Any:
+        """异步调用，func 返回 awaitable"""
+        attempt = 0
+        while True:
+            self._before_call(attempt)
+            try:
+                result = await func(*args, **kwargs)
+            except Exception as e:
+                self._on_failure(e)
+                delay = self._retry_delay(attempt, e)
+                if delay is None:
+                    raise
+                attempt += 1
+                await asyncio.sleep(delay)
+                continue
+            self._on_success()
+            return result
+
+    def stream(self, factory: Callable[[], Iterator[Any]]) -> Generator[Any, None, None]:
+        """同步流式调用，factory 每次调用返回一个新的迭代器"""
+        attempt = 0
+        while True:
+            self._before_call(attempt)
+            started = False
+            try:
+                for chunk in factory():
+                    started = True
+                    yield chunk
+            except Exception as e:
+                self._on_failure(e)
+                # 已经输出了内容，重试会导致内容重复
+                delay = None if started else self._retry_delay(attempt, e)
+                if delay is None:
+                    raise
+                attempt += 1
+                time.sleep(delay)
+                continue
+            self._on_success()
+            return
+
+    async def astream(self, factory: Callable[[], AsyncIterator[Any]]) -> AsyncGenerator[Any, None]:
+        """异步流式调用，factory 每次调用返回一个新的异步迭代器"""
+        attempt = 0
+        while True:
+            self._before_call(attempt)
+            started = False
+            try:
+                async for chunk in factory():
+                    started = True
+                    yield chunk
+            except Exception as e:
+                self._on_failure(e)
+                # 已经输出了内容，重试会导致内容重复
+                delay = None if started else self._retry_delay(attempt, e)
+                if delay is None:
+                    raise
+                attempt += 1
+                await asyncio.sleep(delay)
+                continue
+            self._on_success()
+            return
+
+    def stats(self) -> Dict[str, Any]:
+        """重试和熔断指标"""
+        with self._lock:
+            stats = dict(self._metrics)
+        if self.breaker is not None:
+            stats["breaker"] = self.breaker.stats()
+        return stats
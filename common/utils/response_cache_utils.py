@@ -0,0 +1,219 @@
+"""
+大模型响应缓存
+
+按 消息 + 调用参数 的哈希精确匹配；开启语义匹配时，对同一模型和参数下的历史提示词计算向量余弦相似度，
+超过阈值即视为命中。命中的响应可以按流式输出的方式重放。
+"""
+
+import json
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, AsyncGenerator, AsyncIterator, Callable, Dict, Generator, Iterator, List, Optional
+
+import numpy as np
+
+from common.utils.cache_utils import LRUCache
+
+logger = logging.getLogger(__name__)
+
+
+class CacheLookup:
+    """
+    一次缓存查询的结果，未命中时用于写入
+
+    Attributes:
+        key: 精确匹配的键
+        scope: 模型和调用参数的哈希，语义匹配只在同一 scope 内进行
+        route: 调用方路由名称，用于统计
+        vector: 提示词向量(开启语义匹配时)
+        response: 命中的响应，未命中为 None
+        match: 命中方式 exact / semantic
+    """
+
+    __slots__ = ('key', 'scope', 'route', 'vector', 'response', 'match')
+
+    def __init__(self, key: str, scope: str, route: Optional[str] = None):
+        self.key = key
+        self.scope = scope
+        self.route = route
+        self.vector: Optional[np.ndarray] = None
+        self.response: Optional[str] = None
+        self.match: Optional[str] = None
+
+
+class ResponseCache:
+    """
+    大模型响应缓存: 精确匹配 + 可选的语义匹配，条目有过期时间，超过容量时淘汰最久未使用的条目
+    """
+
+    def __init__(self, max_size: int = 1000, ttl: Optional[float] = 3600, semantic: bool = False,
+                 similarity_threshold: float = 0.95, encoder: Optional[Callable[[List[str]], Any]] = None):
+        """
+        Args:
+            max_size: 最大条目数
+            ttl: 条目过期时间(秒)，None 或 0 表示不过期
+            semantic: 是否开启语义匹配
+            similarity_threshold: 语义匹配的余弦相似度阈值
+            encoder: 文本向量生成函数，输入文本列表，返回二维向量数组
+        """
+        self._cache = LRUCache(max_size, ttl)
+        self.semantic = semantic and encoder is not None
+        self.similarity_threshold = similarity_threshold
+        self._encoder = encoder
+        # 语义索引: 键 -> (scope, 归一化后的向量)，条目随精确缓存淘汰或过期而失效
+        self._vectors: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._metrics = {"exact_hits": 0, "semantic_hits": 0, "misses": 0, "stores": 0, "encode_errors": 0}
+        self._routes: Dict[str, Dict[str, int]] = {}
+
+    @staticmethod
+    def _digest(value: Any) -> str:
+        data = json.dumps(value, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def prompt_text(messages: List[Dict[str, str]]) -> str:
+        """用于语义匹配的提示词文本"""
+        return "\n".join(f"{message.get('role', '')}: {message.get('content', '')}" for message in messages)
+
+    def _count(self, key: str, route: Optional[str] = None, hit: Optional[bool] = None):
+        with self._lock:
+            self._metrics[key] += 1
+            if route and hit is not None:
+                counters = self._routes.setdefault(route, {"hits": 0, "misses": 0})
+                counters["hits" if hit else "misses"] += 1
+
+    def _encode(self, text: str) -> Optional[np.ndarray]:
+        try:
+            vector = np.asarray(self._encoder([text]), dtype='float32').reshape(-1)
+        except Exception as e:
+            self._count("encode_errors")
+            logger.warning(f"响应缓存生成提示词向量失败，跳过语义匹配: {str(e)}")
+            return None
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else None
+
+    def _semantic_match(self, lookup: CacheLookup) -> Optional[str]:
+        """在同一 scope 的条目中查找最相似的提示词，超过阈值时返回其响应"""
+        with self._lock:
+            candidates = [(key, vector) for key, (scope, vector) in self._vectors.items() if scope == lookup.scope]
+        if not candidates:
+            return None
+        scores = np.vstack([vector for _, vector in candidates]) @ lookup.vector
+        for index in np.argsort(-scores):
+            if scores[index] < self.similarity_threshold:
+                break
+            key = candidates[index][0]
+            response = self._cache.get(key)
+            if response is not None:
+                logger.debug(f"响应缓存语义命中，相似度: {scores[index]:.4f}")
+                return response
+            # 条目已过期或被淘汰
+            with self._lock:
+                self._vectors.pop(key, None)
+        return None
+
+    def lookup(self, messages: List[Dict[str, str]], params: Dict[str, Any],
+               route: Optional[str] = None) -> CacheLookup:
+        """
+        查询缓存
+
+        Args:
+            messages: 消息列表
+            params: 影响输出的调用参数(模型名称、温度、响应格式等)
+            route: 调用方路由名称
+
+        Returns:
+            CacheLookup: response 不为 None 表示命中
+        """
+        scope = self._digest(params)
+        lookup = CacheLookup(self._digest({'scope': scope, 'messages': messages}), scope, route)
+        response = self._cache.get(lookup.key)
+        if response is not None:
+            lookup.response, lookup.match = response, 'exact'
+            self._count("exact_hits", route, True)
+            return lookup
+        if self.semantic:
+            lookup.vector = self._encode(self.prompt_text(messages))
+            if lookup.vector is not None:
+                response = self._semantic_match(lookup)
+                if response is not None:
+                    lookup.response, lookup.match = response, 'semantic'
+                    self._count("semantic_hits", route, True)
+                    return lookup
+        self._count("misses", route, False)
+        return lookup
+
+    def store(self, lookup: CacheLookup, response: Any):
+        """写入未命中的查询对应的响应，空响应和非文本响应不缓存"""
+        if not isinstance(response, str) or not response:
+            return
+        self._cache.set(lookup.key, response)
+        self._count("stores")
+        if lookup.vector is None:
+            return
+        with self._lock:
+            self._vectors[lookup.key] = (lookup.scope, lookup.vector)
+            self._vectors.move_to_end(lookup.key)
+            while len(self._vectors) > self._cache.max_size:
+                self._vectors.popitem(last=False)
+
+    def clear(self):
+        """清空缓存(保留统计)"""
+        self._cache.clear()
+        with self._lock:
+            self._vectors.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """缓存统计信息"""
+        with self._lock:
+            metrics = dict(self._metrics)
+            routes = {route: dict(counters) for route, counters in self._routes.items()}
+            semantic_entries = len(self._vectors)
+        hits = metrics["exact_hits"] + metrics["semantic_hits"]
+        total = hits + metrics["misses"]
+        return {
+            "size": len(self._cache),
+            "max_size": self._cache.max_size,
+            "ttl": self._cache.ttl,
+            "semantic": self.semantic,
+            "semantic_entries": semantic_entries,
+            **metrics,
+            "hit_rate": round(hits / total, 4) if total else 0.0,
+            "routes": routes
+        }
+
+
+def replay_stream(response: str, chunk_chars: int = 32) -> Generator[str, None, None]:
+    """把缓存的完整响应按固定长度切分，以流式输出的方式重放"""
+    chunk_chars = max(1, chunk_chars)
+    for start in range(0, len(response), chunk_chars):
+        yield response[start:start + chunk_chars]
+
+
+async def areplay_stream(response: str, chunk_chars: int = 32) -> AsyncGenerator[str, None]:
+    """replay_stream 的异步版本"""
+    for chunk in replay_stream(response, chunk_chars):
+        yield chunk
+
+
+def record_stream(source: Iterator[str], on_complete: Callable[[str], None]) -> Generator[str, None, None]:
+    """原样输出流式响应，正常结束后把完整响应交给 on_complete(中途出错或被中断时不调用)"""
+    parts = []
+    for chunk in source:
+        if chunk:
+            parts.append(chunk)
+        yield chunk
+    on_complete(''.join(parts))
+
+
+async def arecord_stream(source: AsyncIterator[str], on_complete: Callable[[str], None]) -> AsyncGenerator[str, None]:
+    """record_stream 的异步版本"""
+    parts = []
+    async for chunk in source:
+        if chunk:
+            parts.append(chunk)
+        yield chunk
+    on_complete(''.join(parts))
@@ -0,0 +1,327 @@
+"""
+大模型多后端路由
+
+按权重或最近的 p95 延迟选择后端，出错时自动切换到下一个后端；流式对话可开启对冲请求:
+主后端在对冲延迟内没有输出第一个数据块时，同时向备用后端发起请求，先输出的一方胜出，另一方取消。
+"""
+
+import time
+import random
+import asyncio
+import logging
+import threading
+from collections import deque
+from typing import Any, AsyncIterator, AsyncGenerator, Callable, Dict, Generator, Iterator, List, Optional, Tuple
+
+from common.utils.resilience_utils import Resilience
+
+logger = logging.getLogger(__name__)
+
+STRATEGIES = ('weighted', 'latency')
+
+
+class LatencyTracker:
+    """最近若干次调用的延迟"""
+
+    def __init__(self, window: int = 200):
+        self._values = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._values.append(seconds)
+
+    def count(self) -> int:
+        with self._lock:
+            return len(self._values)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """延迟分位数(秒)，没有样本时返回 None"""
+        with self._lock:
+            values = sorted(self._values)
+        if not values:
+            return None
+        return values[min(len(values) - 1, int(q * len(values)))]
+
+
+class Backend:
+    """
+    路由中的一个后端
+
+    Attributes:
+        name: 后端名称
+        weight: 权重
+        resilience: 该后端的重试和熔断
+        ttft: 流式输出的首 token 延迟
+        latency: 非流式调用的总延迟
+    """
+
+    def __init__(self, name: str, weight: float, resilience: Resilience, window: int = 200):
+        self.name = name
+        self.weight = max(0.0, float(weight))
+        self.resilience = resilience
+        self.ttft = LatencyTracker(window)
+        self.latency = LatencyTracker(window)
+        self.errors = 0
+
+    def available(self) -> bool:
+        """熔断器未打开(或已到试探时间)"""
+        breaker = self.resilience.breaker
+        return breaker is None or breaker.allows_call()
+
+    def stats(self) -> Dict[str, Any]:
+        def ms(value: Optional[float]) -> Optional[float]:
+            return round(value * 1000, 1) if value is not None else None
+        return {
+            "weight": self.weight,
+            "errors": self.errors,
+            "ttft_p50_ms": ms(self.ttft.percentile(0.5)),
+            "ttft_p95_ms": ms(self.ttft.percentile(0.95)),
+            "latency_p50_ms": ms(self.latency.percentile(0.5)),
+            "latency_p95_ms": ms(self.latency.percentile(0.95)),
+            "resilience": self.resilience.stats()
+        }
+
+
+class LLMRouter:
+    """
+    多后端路由
+
+    strategy:
+        weighted: 按权重随机选择主后端，其余后端按权重随机排序作为备用，权重为 0 的后端只用于切换
+        latency: 按最近 p95 延迟从低到高排序，样本不足 min_samples 的后端优先(用于探测)
+    熔断中的后端排在最后；failover 开启时依次尝试最多 1 + max_failover 个后端。
+    """
+
+    def __init__(self, backends: List[Backend], strategy: str = 'weighted', failover: bool = True,
+                 max_failover: int = 2, min_samples: int = 20, hedge: bool = False,
+                 hedge_delay: Optional[float] = None, hedge_min_delay: float = 0.2):
+        """
+        Args:
+            backends: 后端列表
+            strategy: 路由策略 weighted / latency
+            failover: 出错时是否切换到下一个后端
+            max_failover: 最多切换次数
+            min_samples: latency 策略下延迟样本少于该值的后端优先被选中
+            hedge: 流式对话是否开启对冲请求
+            hedge_delay: 对冲延迟(秒)，None 表示使用主后端首 token 延迟的 p95
+            hedge_min_delay: 对冲延迟下限(秒)
+        """
+        if not backends:
+            raise ValueError("至少需要一个大模型后端")
+        if strategy not in STRATEGIES:
+            raise ValueError(f"不支持的路由策略: {strategy}，可选: {', '.join(STRATEGIES)}")
+        self.backends = backends
+        self.strategy = strategy
+        self.failover = failover
+        self.max_failover = max_failover
+        self.min_samples = min_samples
+        self.hedge = hedge
+        self.hedge_delay = hedge_delay
+        self.hedge_min_delay = hedge_min_delay
+        self._lock = threading.Lock()
+        self._metrics = {"failovers": 0, "hedges": 0, "hedge_wins": 0}
+
+    def _count(self, key: str):
+        with self._lock:
+            self._metrics[key] += 1
+
+    @staticmethod
+    def _weighted_order(backends: List[Backend]) -> List[Backend]:
+        """按权重随机排序(不放回抽样)"""
+        remaining, ordered = list(backends), []
+        while remaining:
+            total = sum(backend.weight for backend in remaining)
+            if total <= 0:
+                random.shuffle(remaining)
+                ordered.extend(remaining)
+                break
+            point, acc = random.uniform(0, total), 0.0
+            for index, backend in enumerate(remaining):
+                acc += backend.weight
+                if point <= acc:
+                    ordered.append(remaining.pop(index))
+                    break
+            else:
+                ordered.append(remaining.pop())
+        return ordered
+
+    def order(self, stream: bool = False) -> List[Backend]:
+        """
+        本次调用依次尝试的后端
+
+        Args:
+            stream: 是否为流式调用，latency 策略下流式按首 token 延迟排序，否则按总延迟
+        """
+        if self.strategy == 'latency':
+            def score(backend: Backend) -> Tuple[int, float, float]:
+                tracker = backend.ttft if stream else backend.latency
+                if tracker.count() < self.min_samples:
+                    return 0, 0.0, -backend.weight
+                return 1, tracker.percentile(0.95), -backend.weight
+            ordered = sorted(self.backends, key=score)
+        else:
+            # 权重为 0 的后端只作为备用
+            ordered = self._weighted_order([backend for backend in self.backends if backend.weight > 0]) + \
+                [backend for backend in self.backends if backend.weight <= 0]
+        ordered = [backend for backend in ordered if backend.available()] + \
+                  [backend for backend in ordered if not backend.available()]
+        return ordered[:1 + self.max_failover] if self.failover else ordered[:1]
+
+    def _on_error(self, backend: Backend, exc: Exception, has_next: bool):
+        backend.errors += 1
+        if has_next:
+            self._count("failovers")
+            logger.warning(f"大模型后端 {backend.name} 调用失败，切换到下一个后端: {exc}")
+
+    def call(self, func: Callable[[Backend], Any]) -> Any:
+        """同步调用，func(backend) 执行一次调用"""
+        candidates = self.order()
+        for index, backend in enumerate(candidates):
+            started = time.perf_counter()
+            try:
+                result = backend.resilience.call(func, backend)
+            except Exception as e:
+                self._on_error(backend, e, index < len(candidates) - 1)
+                if index == len(candidates) - 1:
+                    raise
+                continue
+            backend.latency.record(time.perf_counter() - started)
+            return result
+
+    async def acall(self, func: Callable[[Backend], Any]) -> Any:
+        """异步调用，func(backend) 返回 awaitable"""
+        candidates = self.order()
+        for index, backend in enumerate(candidates):
+            started = time.perf_counter()
+            try:
+                result = await backend.resilience.acall(func, backend)
+            except Exception as e:
+                self._on_error(backend, e, index < len(candidates) - 1)
+                if index == len(candidates) - 1:
+                    raise
+                continue
+            backend.latency.record(time.perf_counter() - started)
+            return result
+
+    def stream(self, factory: Callable[[Backend], Iterator[Any]]) -> Generator[Any, None, None]:
+        """同步流式调用，输出第一个数据块之前失败时切换后端"""
+        candidates = self.order(stream=True)
+        for index, backend in enumerate(candidates):
+            started = time.perf_counter()
+            iterator = iter(backend.resilience.stream(lambda: factory(backend)))
+            try:
+                first = next(iterator)
+            except StopIteration:
+                return
+            except Exception as e:
+                self._on_error(backend, e, index < len(candidates) - 1)
+                if index == len(candidates) - 1:
+                    raise
+                continue
+            backend.ttft.record(time.perf_counter() - started)
+            yield first
+            yield from iterator
+            return
+
+    @staticmethod
+    def _start(backend: Backend, factory: Callable[[Backend], AsyncIterator[Any]]):
+        """开始一个后端的流式调用，返回 (迭代器, 读取第一个数据块的任务)"""
+        iterator = backend.resilience.astream(lambda: factory(backend)).__aiter__()
+        return iterator, asyncio.ensure_future(iterator.__anext__())
+
+    @staticmethod
+    async def _discard(iterator, task: asyncio.Future):
+        task.cancel()
+        try:
+            await iterator.aclose()
+        except BaseException:
+            pass
+
+    def _hedge_delay(self, backend: Backend) -> Optional[float]:
+        if self.hedge_delay is not None:
+            return max(self.hedge_delay, self.hedge_min_delay)
+        if backend.ttft.count() < self.min_samples:
+            return None
+        return max(backend.ttft.percentile(0.95), self.hedge_min_delay)
+
+    async def astream(self, factory: Callable[[Backend], AsyncIterator[Any]]) -> AsyncGenerator[Any, None]:
+        """
+        异步流式调用
+
+        输出第一个数据块之前失败时切换后端；开启对冲时，主后端超过对冲延迟仍未输出，
+        同时请求下一个后端，先输出第一个数据块的一方胜出
+        """
+        candidates = self.order(stream=True)
+        # 正在等待第一个数据块的调用: 任务 -> (后端, 迭代器, 开始时间)
+        pending: Dict[asyncio.Future, Tuple[Backend, Any, float]] = {}
+        next_index = 0
+        hedged = set()
+        last_error: Optional[BaseException] = None
+        winner = None
+        try:
+            while winner is None:
+                if not pending:
+                    if next_index >= len(candidates):
+                        if last_error is not None:
+                            raise last_error
+                        return
+                    backend = candidates[next_index]
+                    next_index += 1
+                    iterator, task = self._start(backend, factory)
+                    pending[task] = (backend, iterator, time.perf_counter())
+                # 只有一个调用在等待且还有备用后端时，超过对冲延迟发起对冲请求
+                timeout = None
+                if self.hedge and len(pending) == 1 and next_index < len(candidates):
+                    timeout = self._hedge_delay(next(iter(pending.values()))[0])
+                done, _ = await asyncio.wait(set(pending), timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    backend = candidates[next_index]
+                    next_index += 1
+                    self._count("hedges")
+                    hedged.add(backend.name)
+                    logger.info(f"主后端超过对冲延迟 {timeout:.2f} 秒未响应，发起对冲请求: {backend.name}")
+                    iterator, task = self._start(backend, factory)
+                    pending[task] = (backend, iterator, time.perf_counter())
+                    continue
+                for task in done:
+                    backend, iterator, started = pending.pop(task)
+                    finished = False
+                    try:
+                        first = task.result()
+                    except StopAsyncIteration:
+                        # 没有任何输出就正常结束
+                        first, finished = None, True
+                    except Exception as e:
+                        last_error = e
+                        self._on_error(backend, e, bool(pending) or next_index < len(candidates))
+                        continue
+                    if winner is None:
+                        backend.ttft.record(time.perf_counter() - started)
+                        if backend.name in hedged:
+                            self._count("hedge_wins")
+                        winner = (iterator, first, finished)
+                    else:
+                        await self._discard(iterator, task)
+        finally:
+            # 取消落败或未完成的调用
+            for task, (_, iterator, _) in list(pending.items()):
+                await self._discard(iterator, task)
+
+        iterator, first, finished = winner
+        if finished:
+            return
+        yield first
+        async for chunk in iterator:
+            yield chunk
+
+    def stats(self) -> Dict[str, Any]:
+        """路由指标和各后端延迟"""
+        with self._lock:
+            metrics = dict(self._metrics)
+        return {
+            "strategy": self.strategy,
+            "hedge": self.hedge,
+            **metrics,
+            "backends": {backend.name: backend.stats() for backend in self.backends}
+        }
@@ -0,0 +1,169 @@
+"""
+SSE(Server-Sent Events) 流式输出
+
+把大模型逐个 token 输出的增量按大小/时间窗口合并成帧，以标准的 `data: <json>\\n\\n` 格式输出，
+并统计首 token 时间(TTFT)等指标。
+"""
+
+import json
+import time
+import asyncio
+import logging
+import threading
+from collections import deque
+from typing import Any, AsyncIterator, AsyncGenerator, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def sse_event(data: Dict[str, Any], event: Optional[str] = None) -> str:
+    """
+    格式化一个SSE帧
+
+    Args:
+        data: 帧内容，序列化为一行JSON
+        event: 事件类型，默认不设置(客户端按 message 处理)
+    """
+    frame = f"event: {event}\n" if event else ""
+    return f"{frame}data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def coalesce_stream(source: AsyncIterator[str], max_chars: int = 64,
+                          max_delay: float = 0.05, flush_first: bool = True) -> AsyncGenerator[str, None]:
+    """
+    合并细碎的增量输出
+
+    缓冲区达到 max_chars 个字符，或第一个增量进入缓冲区后已过 max_delay 秒时输出一次；
+    上游暂停输出时到时间也会把缓冲区发出去，不会等到下一个增量才发送。
+
+    Args:
+        source: 增量输出
+        max_chars: 每帧最多合并的字符数，达到后立即输出
+        max_delay: 增量在缓冲区中最长等待时间(秒)，0 表示不合并
+        flush_first: 第一个增量立即输出，不计入合并，保证首 token 时间
+
+    Yields:
+        str: 合并后的文本
+    """
+    loop = asyncio.get_running_loop()
+    iterator = source.__aiter__()
+    buffer, size, deadline = [], 0, None
+    first = flush_first
+    pending: Optional[asyncio.Future] = None
+    try:
+        while True:
+            if pending is None:
+                pending = asyncio.ensure_future(iterator.__anext__())
+            timeout = None if deadline is None else max(0.0, deadline - loop.time())
+            done, _ = await asyncio.wait({pending}, timeout=timeout)
+            if not done:
+                # 时间窗口到期，上游还没有新的增量
+                yield ''.join(buffer)
+                buffer, size, deadline = [], 0, None
+                continue
+            future, pending = pending, None
+            try:
+                chunk = future.result()
+            except StopAsyncIteration:
+                break
+            if not chunk:
+                continue
+            buffer.append(chunk)
+            size += len(chunk)
+            if first or size >= max_chars or max_delay <= 0:
+                first = False
+                yield ''.join(buffer)
+                buffer, size, deadline = [], 0, None
+            elif deadline is None:
+                deadline = loop.time() + max_delay
+        if buffer:
+            yield ''.join(buffer)
+    finally:
+        # 客户端断开时取消尚未完成的读取
+        if pending is not None and not pending.done():
+            pending.cancel()
+
+
+class StreamMetrics:
+    """
+    单次流式输出的指标
+
+    ttft: 请求开始到收到第一个增量的时间(秒)
+    first_frame: 请求开始到发出第一帧的时间(秒)
+    total: 请求开始到输出结束的时间(秒)
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.ttft: Optional[float] = None
+        self.first_frame: Optional[float] = None
+        self.total: Optional[float] = None
+        self.chunks = 0
+        self.frames = 0
+        self.chars = 0
+
+    def on_chunk(self, chunk: str):
+        if self.ttft is None:
+            self.ttft = time.perf_counter() - self.started
+        self.chunks += 1
+        self.chars += len(chunk)
+
+    def on_frame(self):
+        if self.first_frame is None:
+            self.first_frame = time.perf_counter() - self.started
+        self.frames += 1
+
+    def finish(self):
+        self.total = time.perf_counter() - self.started
+
+    def to_dict(self) -> Dict[str, Any]:
+        def ms(value: Optional[float]) -> Optional[float]:
+            return round(value * 1000, 1) if value is not None else None
+        return {
+            "ttft_ms": ms(self.ttft),
+            "first_frame_ms": ms(self.first_frame),
+            "total_ms": ms(self.total),
+            "chunks": self.chunks,
+            "frames": self.frames,
+            "chars": self.chars
+        }
+
+
+class StreamMetricsRecorder:
+    """最近若干次流式输出的指标汇总(首 token 时间分位数等)"""
+
+    def __init__(self, window: int = 500):
+        self._lock = threading.Lock()
+        self._ttft = deque(maxlen=window)
+        self._total = deque(maxlen=window)
+        self.streams = 0
+        self.errors = 0
+
+    def record(self, metrics: StreamMetrics, error: bool = False):
+        with self._lock:
+            self.streams += 1
+            if error:
+                self.errors += 1
+            if metrics.ttft is not None:
+                self._ttft.append(metrics.ttft)
+            if metrics.total is not None:
+                self._total.append(metrics.total)
+
+    @staticmethod
+    def _percentile(values, q: float) -> Optional[float]:
+        if not values:
+            return None
+        ordered = sorted(values)
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 1)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            ttft, total = list(self._ttft), list(self._total)
+            return {
+                "streams": self.streams,
+                "errors": self.errors,
+                "ttft_p50_ms": self._percentile(ttft, 0.5),
+                "ttft_p95_ms": self._percentile(ttft, 0.95),
+                "total_p50_ms": self._percentile(total, 0.5),
+                "total_p95_ms": self._percentile(total, 0.95)
+            }
@@ -0,0 +1,83 @@
+import os
+import hashlib
+import logging
+from typing import Optional, Tuple
+
+from common.exception import FileTooLargeException
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+
+
+def _check_declared_size(upload, max_bytes: Optional[int]):
+    """上传框架已知文件大小时，在读取内容之前拒绝超限的文件"""
+    size = getattr(upload, 'size', None)
+    if max_bytes and size is not None and size > max_bytes:
+        raise FileTooLargeException(f"文件大小 {size} 字节超过限制 {max_bytes} 字节")
+
+
+async def save_upload_file(upload, file_path: str, max_bytes: Optional[int] = None,
+                           chunk_size: int = DEFAULT_CHUNK_SIZE) -> Tuple[int, str]:
+    """
+    分块将上传文件写入磁盘，同时计算内容的SHA-256哈希，不会一次性读入整个文件
+
+    先写入 file_path + '.part'，完整写入后再重命名，失败或超限时删除临时文件
+
+    Args:
+        upload: 上传文件对象，需提供异步的 read(size) 方法(如 fastapi.UploadFile)
+        file_path: 保存路径
+        max_bytes: 文件大小上限(字节)，None 表示不限制
+        chunk_size: 每次读写的字节数
+
+    Returns:
+        (文件大小, 内容哈希)
+
+    Raises:
+        FileTooLargeException: 文件超过大小限制
+    """
+    _check_declared_size(upload, max_bytes)
+    part_path = file_path + '.part'
+    sha256 = hashlib.sha256()
+    size = 0
+    try:
+        with open(part_path, 'wb') as f:
+            while True:
+                block = await upload.read(chunk_size)
+                if not block:
+                    break
+                size += len(block)
+                if max_bytes and size > max_bytes:
+                    raise FileTooLargeException(f"文件大小超过限制 {max_bytes} 字节")
+                sha256.update(block)
+                f.write(block)
+        os.replace(part_path, file_path)
+    except BaseException:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        raise
+    return size, sha256.hexdigest()
+
+
+async def read_upload_bytes(upload, max_bytes: Optional[int] = None,
+                            chunk_size: int = DEFAULT_CHUNK_SIZE) -> bytes:
+    """
+    分块读取上传文件内容，超过大小限制时立即停止读取
+
+    用于需要以二进制形式保存到数据库的小文件(如简历)
+
+    Raises:
+        FileTooLargeException: 文件超过大小限制
+    """
+    _check_declared_size(upload, max_bytes)
+    blocks = []
+    size = 0
+    while True:
+        block = await upload.read(chunk_size)
+        if not block:
+            break
+        size += len(block)
+        if max_bytes and size > max_bytes:
+            raise FileTooLargeException(f"文件大小超过限制 {max_bytes} 字节")
+        blocks.append(block)
+    return b''.join(blocks)
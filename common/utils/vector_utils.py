@@ -1,12 +1,23 @@
 import os
-from typing import List, Dict, Any
+import glob
+import json
+from typing import List, Dict, Any, Optional, Tuple
 import numpy as np
 import faiss
 from sentence_transformers import SentenceTransformer
 import torch
-import json
-from ekbase.config import STORAGE
+from ekbase.config import STORAGE, VECTOR_DB, PARSING, CHUNKING, HYBRID_SEARCH
 from common.exception import VectorOperationException
+from common.utils.wal_utils import SegmentLog
+from common.utils.metadata_utils import ChunkMetadataStore
+from common.utils.file_utils import compute_file_hash, configure_parsing, delete_parse_cache
+from common.utils.cache_utils import LRUCache
+from common.utils.embedding_utils import EmbeddingCache
+from common.utils.ingest_utils import read_and_chunk, get_ingest_pool, shutdown_ingest_pool
+from common.utils.chunk_utils import BaseChunker, create_chunker
+from common.utils.executor_utils import BoundedExecutor
+from common.utils.bm25_utils import BM25Index, reciprocal_rank_fusion
+from concurrent.futures.process import BrokenProcessPool
 import logging
 import atexit
 import threading
@@ -16,6 +27,9 @@ from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
+# 支持的索引类型
+INDEX_TYPES = ('Flat', 'IVFFlat', 'IVFPQ', 'HNSW')
+
 @contextmanager
 def torch_cuda_context():
     """GPU上下文管理器"""
@@ -63,7 +77,7 @@ class VectorUtils:
         Args:
             model_name: 使用的sentence-transformer模型名称
             index_path: FAISS索引保存路径, 默认使用STORAGE['vector_index']
-            metadata_path: 元数据保存路径, 默认使用STORAGE['vector_index']
+            metadata_path: 元数据(SQLite)保存路径, 默认使用STORAGE['vectors']/metadata.db
             device: 运行设备
         """
         with self._lock:
@@ -98,13 +112,65 @@ class VectorUtils:
                     if not index_path:
                         index_path = os.path.join(STORAGE['vectors'], 'vector_index.faiss')
                     if not metadata_path:
-                        metadata_path = os.path.join(STORAGE['vectors'], 'metadata.json')
+                        metadata_path = os.path.join(STORAGE['vectors'], 'metadata.db')
                     self.index_path = index_path
                     self.metadata_path = metadata_path
                     self.dimension = self.model.get_sentence_embedding_dimension()
                     self.index = None
-                    self.metadata = {}
+                    self.metadata = ChunkMetadataStore(metadata_path)
+                    # 文件路径 -> 向量ID、文件路径 -> 内容哈希、内容哈希 -> 文件路径
+                    self._file_ids: Dict[str, List[int]] = {}
+                    self._file_hashes: Dict[str, Optional[str]] = {}
+                    self._hash_files: Dict[str, str] = {}
+                    # 64位向量ID分配器，ID删除后不复用，保证删除后其余向量ID稳定
+                    self._next_id = 0
+                    self._live_vectors = 0
+                    # HNSW 中已删除但尚未清理的向量ID，检索时通过选择器排除
+                    self._hnsw_deleted = set()
+                    self._deleted_selector = None
+                    # 查询文本 -> 查询向量；(查询文本, top_k, 索引版本) -> 检索结果
+                    self._query_cache = LRUCache(VECTOR_DB.get('query_cache_size', 1024),
+                                                 VECTOR_DB.get('query_cache_ttl', 3600))
+                    self._result_cache = LRUCache(VECTOR_DB.get('result_cache_size', 1024),
+                                                  VECTOR_DB.get('result_cache_ttl', 300))
+                    self._index_version = 0
+                    # 分块文本 -> 向量的持久化缓存，delete_all_indexes 不会清空
+                    self._embedding_cache = None
+                    if VECTOR_DB.get('embedding_cache', True):
+                        self._embedding_cache = EmbeddingCache(
+                            os.path.join(STORAGE['vectors'], 'embedding_cache.db'),
+                            model_name,
+                            self.dimension,
+                            VECTOR_DB.get('embedding_cache_dtype', 'float16')
+                        )
+                    # 异步检索使用的有界线程池，避免阻塞事件循环
+                    self._search_executor = BoundedExecutor(
+                        max_workers=VECTOR_DB.get('search_workers', 4),
+                        max_pending=VECTOR_DB.get('search_max_pending', 64),
+                        name='vector-search'
+                    )
+                    # 与向量索引同步维护的BM25词法索引，用于混合检索
+                    self._lexical = None
+                    if HYBRID_SEARCH.get('enabled', True):
+                        self._lexical = BM25Index(
+                            os.path.join(STORAGE['vectors'], 'lexical_index.db'),
+                            k1=HYBRID_SEARCH.get('bm25_k1', 1.5),
+                            b=HYBRID_SEARCH.get('bm25_b', 0.75),
+                            use_jieba=HYBRID_SEARCH.get('use_jieba', True),
+                            max_df_ratio=HYBRID_SEARCH.get('max_df_ratio', 0.5),
+                            max_postings_per_term=HYBRID_SEARCH.get('max_postings_per_term', 1000)
+                        )
+                    self._index_lock = threading.RLock()
+                    self._compact_lock = threading.Lock()
+                    self._compact_thread = None
+                    self._segment_log = SegmentLog(os.path.dirname(self.index_path), self.dimension)
+                    configure_parsing(
+                        cache_dir=STORAGE['parse_cache'] if PARSING.get('parse_cache', False) else None,
+                        pdf_workers=PARSING.get('pdf_workers'),
+                        pdf_parallel_min_pages=PARSING.get('pdf_parallel_min_pages')
+                    )
                     self._load_or_create_index()
+                    self._maybe_schedule_compaction()
                     self._initialized = True
                     logger.info("向量工具类初始化完成")
                     
@@ -126,6 +192,9 @@ class VectorUtils:
             if self._ref_count <= 0:
                 try:
                     logger.info("开始清理向量工具资源")
+                    # 退出前将增量日志合并到基础索引，缩短下次启动的回放时间
+                    if hasattr(self, '_segment_log') and self._segment_log.pending_ops:
+                        self.compact()
                     if hasattr(self, 'model'):
                         with torch_cuda_context():
                             if hasattr(self.model, 'to'):
@@ -134,7 +203,12 @@ class VectorUtils:
                     if hasattr(self, 'index'):
                         del self.index
                     if hasattr(self, 'metadata'):
+                        self.metadata.close()
                         del self.metadata
+                    if getattr(self, '_embedding_cache', None) is not None:
+                        self._embedding_cache.close()
+                    if getattr(self, '_lexical', None) is not None:
+                        self._lexical.close()
                     logger.info("向量工具资源清理完成")
                 except Exception as e:
                     logger.error(f"向量工具资源清理失败: {str(e)}")
@@ -161,84 +235,765 @@ class VectorUtils:
         except:
             return False
 
+    def _create_index(self):
+        """创建带显式ID映射的空索引(暴力检索)，向量数达到阈值后再升级"""
+        return faiss.IndexIDMap2(faiss.IndexFlatL2(self.dimension))
+
+    def _index_kind(self) -> str:
+        """
+        当前索引类型
+
+        Flat/HNSW 使用 IndexIDMap2 包装；IVF 自带ID支持，直接使用；
+        未包装的 IndexFlat 为旧版本按位置编号的索引
+        """
+        if isinstance(self.index, (faiss.IndexIDMap, faiss.IndexIDMap2)):
+            inner = faiss.downcast_index(self.index.index)
+            return 'HNSW' if isinstance(inner, faiss.IndexHNSW) else 'Flat'
+        if isinstance(self.index, faiss.IndexIVFPQ):
+            return 'IVFPQ'
+        if isinstance(self.index, faiss.IndexIVF):
+            return 'IVFFlat'
+        return 'Legacy'
+
+    def _configured_index_type(self) -> str:
+        index_type = VECTOR_DB.get('index_type', 'Flat')
+        if index_type not in INDEX_TYPES:
+            logger.warning(f"不支持的索引类型 {index_type}，使用 Flat")
+            return 'Flat'
+        return index_type
+
+    def _effective_nlist(self, n: int) -> int:
+        """聚类数量不超过训练样本数/39，避免聚类中心训练不足"""
+        return max(1, min(VECTOR_DB.get('nlist', 100), n // 39))
+
+    def _pq_m(self) -> int:
+        """取不超过配置值且能整除向量维度的子量化器数量"""
+        m = VECTOR_DB.get('pq_m', 16)
+        while self.dimension % m:
+            m -= 1
+        return m
+
+    def _build_index(self, index_type: str, vectors: np.ndarray, ids: np.ndarray):
+        """
+        构建指定类型的索引并写入向量
+
+        Args:
+            index_type: 索引类型
+            vectors: 全部向量(同时作为训练数据来源)
+            ids: 向量ID
+        """
+        n = len(vectors)
+        if index_type in ('IVFFlat', 'IVFPQ'):
+            nbits = VECTOR_DB.get('pq_nbits', 8)
+            if n < (1 << nbits if index_type == 'IVFPQ' else 1):
+                logger.warning(f"向量数量 {n} 不足以训练 {index_type}，使用 Flat")
+                return self._build_index('Flat', vectors, ids)
+            nlist = self._effective_nlist(n)
+            quantizer = faiss.IndexFlatL2(self.dimension)
+            if index_type == 'IVFPQ':
+                index = faiss.IndexIVFPQ(quantizer, self.dimension, nlist, self._pq_m(), nbits)
+            else:
+                index = faiss.IndexIVFFlat(quantizer, self.dimension, nlist)
+            sample_size = VECTOR_DB.get('train_sample_size', 50000)
+            if n > sample_size:
+                sample = vectors[np.random.choice(n, sample_size, replace=False)]
+            else:
+                sample = vectors
+            logger.info(f"开始训练 {index_type} 索引，nlist: {nlist}，训练样本: {len(sample)}")
+            index.train(sample)
+            # 哈希表直接映射支持按ID重建向量和删除
+            index.set_direct_map_type(faiss.DirectMap.Hashtable)
+        elif index_type == 'HNSW':
+            inner = faiss.IndexHNSWFlat(self.dimension, VECTOR_DB.get('hnsw_m', 32))
+            inner.hnsw.efConstruction = VECTOR_DB.get('ef_construction', 200)
+            index = faiss.IndexIDMap2(inner)
+        else:
+            index = self._create_index()
+        if n:
+            index.add_with_ids(vectors, ids)
+        return index
+
+    def _apply_search_params(self):
+        """设置 nprobe / efSearch 等检索参数"""
+        kind = self._index_kind()
+        if kind in ('IVFFlat', 'IVFPQ'):
+            self.index.nprobe = min(VECTOR_DB.get('nprobe', 10), self.index.nlist)
+        elif kind == 'HNSW':
+            faiss.downcast_index(self.index.index).hnsw.efSearch = VECTOR_DB.get('ef_search', 64)
+
+    def _search_params(self, selector):
+        """
+        构造只检索选择器中ID的 FAISS 检索参数(调用方需在检索结束前持有 selector 的引用)
+
+        IndexIDMap2 会把外部ID选择器转换为内部位置，因此 Flat/HNSW 同样适用；
+        传入检索参数时索引上设置的 nprobe / efSearch 不生效，需要在参数中重新指定
+        """
+        kind = self._index_kind()
+        if kind in ('IVFFlat', 'IVFPQ'):
+            params = faiss.SearchParametersIVF(sel=selector, nprobe=self.index.nprobe)
+        elif kind == 'HNSW':
+            params = faiss.SearchParametersHNSW(sel=selector,
+                                                efSearch=faiss.downcast_index(self.index.index).hnsw.efSearch)
+        else:
+            params = faiss.SearchParameters(sel=selector)
+        return params
+
+    def _exact_search(self, query_vectors: np.ndarray, allowed_ids: np.ndarray, k: int):
+        """
+        在少量候选向量中精确计算L2距离，返回与 index.search 相同格式的 (distances, indices)
+
+        过滤条件很严格时，近似索引(HNSW/IVF)在选择器下召回率下降，直接按ID取出向量计算更快也更准
+        """
+        vectors = self.index.reconstruct_batch(allowed_ids)
+        distances = (
+            (query_vectors ** 2).sum(axis=1, keepdims=True)
+            - 2 * query_vectors @ vectors.T
+            + (vectors ** 2).sum(axis=1)
+        )
+        k = min(k, len(allowed_ids))
+        order = np.argsort(distances, axis=1)[:, :k]
+        return np.take_along_axis(distances, order, axis=1).clip(min=0), allowed_ids[order]
+
+    def _resolve_filters(self, filters: Optional[Dict[str, Any]]) -> Optional[np.ndarray]:
+        """
+        把过滤条件解析为允许检索的向量ID，没有过滤条件时返回 None
+
+        Args:
+            filters: 过滤条件，可包含 file_paths / file_types / processed_after / processed_before / tags
+        """
+        if not filters:
+            return None
+        ids = self.metadata.filter_ids(
+            file_paths=filters.get('file_paths'),
+            file_types=filters.get('file_types'),
+            processed_after=filters.get('processed_after'),
+            processed_before=filters.get('processed_before'),
+            tags=filters.get('tags')
+        )
+        return np.array(sorted(ids), dtype='int64')
+
+    @staticmethod
+    def _filters_key(filters: Optional[Dict[str, Any]]) -> Optional[str]:
+        """过滤条件的缓存键"""
+        if not filters:
+            return None
+        return json.dumps({key: sorted(value) if isinstance(value, (list, tuple, set)) else value
+                           for key, value in filters.items() if value is not None},
+                          sort_keys=True, ensure_ascii=False, default=str)
+
+    def _rebuild_target(self) -> Optional[str]:
+        """
+        判断是否需要重建索引，返回目标索引类型
+
+        - 向量数达到阈值时由 Flat 升级为配置的索引类型
+        - 配置的索引类型变化
+        - IVF 的聚类数量因数据量增长可以翻倍时重新训练
+        - HNSW 已删除向量占比过高时清理
+        """
+        configured = self._configured_index_type()
+        kind = self._index_kind()
+        n = self._live_vectors
+        if kind == 'Flat':
+            if configured != 'Flat' and n >= VECTOR_DB.get('upgrade_threshold', 10000):
+                return configured
+            return None
+        if kind != configured:
+            return configured
+        if kind in ('IVFFlat', 'IVFPQ') and self._effective_nlist(n) >= 2 * self.index.nlist:
+            return configured
+        if kind == 'HNSW' and self.index.ntotal:
+            stale = self.index.ntotal - n
+            if stale / self.index.ntotal >= VECTOR_DB.get('hnsw_rebuild_ratio', 0.2):
+                return configured
+        return None
+
+    def _rebuild_index(self, index_type: str):
+        """
+        重建索引：在索引锁内取出全部向量，锁外训练和构建，
+        最后在锁内回放构建期间产生的增量日志并切换索引
+        """
+        with self._index_lock:
+            ids = np.array(sorted(idx for file_ids in self._file_ids.values() for idx in file_ids), dtype='int64')
+            if self._index_kind() == 'IVFPQ':
+                logger.warning("从 IVFPQ 索引重建，向量为量化后的近似值")
+            vectors = self.index.reconstruct_batch(ids) if len(ids) else np.zeros((0, self.dimension), dtype='float32')
+            snapshot_seq = self._segment_log.last_seq
+        logger.info(f"开始重建索引: {self._index_kind()} -> {index_type}，向量数: {len(ids)}")
+        new_index = self._build_index(index_type, np.asarray(vectors, dtype='float32'), ids)
+        with self._index_lock:
+            self.index = new_index
+            self._invalidate_results()
+            for record in self._segment_log.replay(after_seq=snapshot_seq):
+                self._apply_record(record)
+            self._sync_deleted_ids()
+            self._apply_search_params()
+        logger.info(f"索引重建完成: {self._index_kind()}，向量数: {self.index.ntotal}")
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        """批量生成文本向量"""
+        with torch_cuda_context():
+            with torch.no_grad():
+                embeddings = self.model.encode(texts)
+        return np.array(embeddings).astype('float32')
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """生成文本向量，供检索以外的场景复用已加载的编码模型(如大模型响应的语义缓存)"""
+        return self._encode(texts)
+
+    def _encode_chunks(self, chunks: List[str]) -> np.ndarray:
+        """生成分块向量，已缓存的分块直接复用，只对未命中的分块批量调用模型"""
+        if self._embedding_cache is None or not chunks:
+            return self._encode(chunks)
+        cached = self._embedding_cache.get_many(chunks)
+        missing = [i for i in range(len(chunks)) if i not in cached]
+        vectors = np.zeros((len(chunks), self.dimension), dtype='float32')
+        for i, vector in cached.items():
+            vectors[i] = vector
+        if missing:
+            missing_chunks = [chunks[i] for i in missing]
+            encoded = self._encode(missing_chunks)
+            vectors[missing] = encoded
+            self._embedding_cache.put_many(missing_chunks, encoded)
+        logger.debug(f"分块向量生成完成，缓存命中: {len(cached)}，新生成: {len(missing)}")
+        return vectors
+
+    def _invalidate_results(self):
+        """索引变更后使检索结果缓存失效(调用方需持有索引锁)"""
+        self._index_version += 1
+        self._result_cache.clear()
+
+    @staticmethod
+    def _normalize_query(query: str) -> str:
+        """归一化查询文本作为缓存键"""
+        return " ".join(query.split()).lower()
+
+    def _encode_queries(self, queries: List[str], keys: Optional[List[str]] = None) -> np.ndarray:
+        """
+        生成查询向量，优先使用查询向量缓存，未命中的查询一次批量生成
+
+        Args:
+            queries: 原始查询文本，模型对原文编码(大小写、空白可能影响向量)
+            keys: 与 queries 对应的缓存键(归一化后的查询)，默认使用原文
+        """
+        keys = keys or queries
+        vectors = [self._query_cache.get(key) for key in keys]
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            encoded = self._encode([queries[i] for i in missing])
+            for i, vector in zip(missing, encoded):
+                self._query_cache.set(keys[i], vector)
+                vectors[i] = vector
+        return np.vstack(vectors).astype('float32')
+
+    def _allocate_ids(self, count: int) -> List[int]:
+        """分配一段连续的新向量ID(调用方需持有索引锁)"""
+        start = self._next_id
+        self._next_id += count
+        return list(range(start, start + count))
+
     def _load_or_create_index(self):
-        """加载或创建FAISS索引"""
-        if os.path.exists(self.index_path):
-            logger.debug(f"索引已经存在，加载索引: {self.index_path}")
-            self.index = faiss.read_index(self.index_path)
-            with open(self.metadata_path, 'r', encoding='utf-8') as f:
-                self.metadata = json.load(f)
-            logger.debug(f"索引加载完成，元数据: {self.metadata}")
+        """加载基础索引并回放增量日志，不存在时创建新索引"""
+        base_path = self._base_path()
+        if os.path.exists(base_path):
+            logger.debug(f"索引已经存在，加载索引: {base_path}")
+            self.index = faiss.read_index(base_path)
+        else:
+            self.index = self._create_index()
+        # 兼容旧版本：将 metadata.json 导入SQLite后改名备份
+        legacy_metadata_path = os.path.join(os.path.dirname(self.index_path), 'metadata.json')
+        if os.path.exists(legacy_metadata_path):
+            if self.metadata.count() == 0:
+                imported = self.metadata.import_json(legacy_metadata_path)
+                logger.info(f"已从 {legacy_metadata_path} 导入元数据: {imported} 条")
+            os.replace(legacy_metadata_path, legacy_metadata_path + '.bak')
+        self._build_file_index()
+        self._next_id = self.metadata.max_id() + 1
+
+        if self._index_kind() == 'Legacy':
+            # 旧版本按位置编号的索引在删除后位置与元数据不一致，根据元数据重建
+            logger.info("检测到旧版本索引，根据元数据重建带ID映射的索引")
+            self._rebuild_from_metadata()
+            self._save_index()
         else:
-            self.index = faiss.IndexFlatL2(self.dimension)
-            self.metadata = {}
-            logger.debug(f"索引创建完成，元数据: {self.metadata}")
+            replayed = 0
+            added, deleted = set(), set()
+            for record in self._segment_log.replay():
+                self._apply_record(record)
+                (added if record['op'] == 'add' else deleted).update(int(idx) for idx in record['ids'])
+                replayed += 1
+            self._reconcile_replayed(added - deleted, deleted)
+            self._sync_deleted_ids()
+            logger.debug(f"索引加载完成，向量数: {self.index.ntotal}，回放日志记录: {replayed}")
+            # 上次合并未完成，启动时同步补做一次合并
+            if self._segment_log.has_rotated():
+                logger.info("检测到未完成的索引合并，开始重新合并")
+                self._save_index()
+        self._apply_search_params()
+        self._sync_lexical_index()
+
+    def _reconcile_replayed(self, added: set, deleted: set):
+        """
+        修复写日志和写元数据之间进程退出造成的不一致
+
+        新增和删除都是先写日志再写元数据，元数据以日志为准:
+        回放的新增向量没有元数据时，元数据未写入，删除这些向量；
+        回放的删除向量仍有元数据时，元数据未删除，补删元数据
+        """
+        orphan_vectors = sorted(added - self.metadata.existing_ids(added)) if added else []
+        stale_rows = sorted(self.metadata.existing_ids(deleted)) if deleted else []
+        if orphan_vectors:
+            logger.warning(f"日志中的新增向量没有元数据，删除: {len(orphan_vectors)} 个")
+            self._segment_log.append_delete(orphan_vectors)
+            self._apply_record({'op': 'delete', 'ids': orphan_vectors})
+        if stale_rows:
+            logger.warning(f"日志中已删除的向量仍有元数据，补删: {len(stale_rows)} 条")
+            self.metadata.delete_ids(stale_rows)
+            if self._lexical is not None:
+                self._lexical.delete_ids(stale_rows)
+            self._build_file_index()
+
+    def _sync_lexical_index(self, batch_size: int = 1000):
+        """词法索引与元数据的分块数不一致(首次启用或写入中途退出)时，根据元数据重建词法索引"""
+        if self._lexical is None or self._lexical.count() == self.metadata.count():
+            return
+        logger.info("词法索引与元数据不一致，开始重建词法索引")
+        self._lexical.clear()
+        for batch in self.metadata.iter_chunks(batch_size):
+            self._lexical.add_many(dict(batch))
+        logger.info(f"词法索引重建完成，分块数: {self._lexical.count()}")
+
+    def _rebuild_from_metadata(self, batch_size: int = 1000):
+        """根据元数据中的分块文本重新生成向量并重建索引"""
+        self.index = self._create_index()
+        for batch in self.metadata.iter_chunks(batch_size):
+            ids = np.array([idx for idx, _ in batch], dtype='int64')
+            self.index.add_with_ids(self._encode_chunks([chunk for _, chunk in batch]), ids)
+        logger.info(f"索引重建完成，向量数: {self.index.ntotal}")
+
+    def _sync_deleted_ids(self):
+        """根据索引中的ID和元数据重新计算 HNSW 中已删除但尚未清理的向量ID(加载或重建索引后调用)"""
+        self._hnsw_deleted = set()
+        self._deleted_selector = None
+        if self._index_kind() == 'HNSW' and self.index.ntotal > self._live_vectors:
+            live = {idx for ids in self._file_ids.values() for idx in ids}
+            self._hnsw_deleted = {int(idx) for idx in faiss.vector_to_array(self.index.id_map) if int(idx) not in live}
+
+    def _deleted_ids_selector(self):
+        """排除 HNSW 中已删除向量的选择器，删除集合变化后重新生成(调用方需持有索引锁)"""
+        if self._deleted_selector is None:
+            deleted = np.array(sorted(self._hnsw_deleted), dtype='int64')
+            batch = faiss.IDSelectorBatch(deleted)
+            # IDSelectorNot 只保存指针，同时保留内部选择器的引用
+            self._deleted_selector = (faiss.IDSelectorNot(batch), batch, deleted)
+        return self._deleted_selector[0]
+
+    def _build_file_index(self):
+        """从元数据表构建文件路径/内容哈希的内存倒排索引"""
+        self._file_ids.clear()
+        self._file_hashes.clear()
+        self._hash_files.clear()
+        self._live_vectors = 0
+        for idx, file_path, file_hash in self.metadata.iter_file_ids():
+            self._live_vectors += 1
+            self._file_ids.setdefault(file_path, []).append(idx)
+            self._file_hashes[file_path] = file_hash
+            if file_hash:
+                self._hash_files[file_hash] = file_path
+
+    def _register_file(self, file_path: str, file_hash: Optional[str], ids: List[int]):
+        """登记文件对应的向量ID和内容哈希"""
+        self._file_ids.setdefault(file_path, []).extend(ids)
+        self._live_vectors += len(ids)
+        self._file_hashes[file_path] = file_hash
+        if file_hash:
+            self._hash_files[file_hash] = file_path
+
+    def _unregister_file(self, file_path: str) -> List[int]:
+        """移除文件的倒排索引记录，返回其向量ID"""
+        ids = self._file_ids.pop(file_path, [])
+        self._live_vectors -= len(ids)
+        file_hash = self._file_hashes.pop(file_path, None)
+        if file_hash and self._hash_files.get(file_hash) == file_path:
+            del self._hash_files[file_hash]
+        return ids
+
+    def _remove_file_vectors(self, file_path: str) -> List[int]:
+        """删除文件的全部向量和元数据(调用方需持有索引锁)，返回被删除的向量ID"""
+        file_hash = self._file_hashes.get(file_path)
+        ids = self._unregister_file(file_path)
+        if file_hash and file_hash not in self._hash_files:
+            # 没有其他文件的内容与之相同时，删除该内容的解析缓存
+            delete_parse_cache(file_hash)
+        if ids:
+            # 先写增量日志，再从索引和元数据中删除
+            self._segment_log.append_delete(ids)
+            self._apply_record({'op': 'delete', 'ids': ids})
+            self.metadata.delete_ids(ids)
+            if self._lexical is not None:
+                self._lexical.delete_ids(ids)
+        return ids
+
+    def set_file_tags(self, file_path: str, tags: List[str]):
+        """
+        设置文件的标签(覆盖原有标签)，用于检索时按标签过滤
+
+        Args:
+            file_path: 文件路径
+            tags: 标签列表
+        """
+        self.metadata.set_file_tags(file_path, [tag.strip() for tag in tags if tag and tag.strip()])
+        self._invalidate_results()
+
+    def get_file_tags(self, file_path: str) -> List[str]:
+        """获取文件的标签"""
+        return self.metadata.get_file_tags(file_path)
+
+    def is_file_processed(self, file_path: str) -> bool:
+        """文件是否已写入向量库"""
+        return file_path in self._file_ids
+
+    def find_file_by_hash(self, file_hash: str) -> Optional[str]:
+        """按内容哈希查找已写入向量库的文件路径"""
+        return self._hash_files.get(file_hash)
+
+    def _apply_record(self, record: Dict[str, Any]):
+        """将一条增量日志记录应用到内存索引(元数据已实时写入SQLite)"""
+        self._invalidate_results()
+        if record['op'] == 'add':
+            self.index.add_with_ids(
+                np.asarray(record['vectors'], dtype='float32'),
+                np.array(record['ids'], dtype='int64')
+            )
+            self._next_id = max(self._next_id, max(record['ids']) + 1)
+        elif record['op'] == 'delete':
+            ids = np.array(record['ids'], dtype='int64')
+            kind = self._index_kind()
+            if kind == 'HNSW':
+                # HNSW 不支持物理删除：检索时用选择器排除，已删除占比过高时重建
+                self._hnsw_deleted.update(int(idx) for idx in ids)
+                self._deleted_selector = None
+                return
+            if kind in ('IVFFlat', 'IVFPQ'):
+                # 哈希表直接映射只支持按ID数组删除
+                self.index.remove_ids(faiss.IDSelectorArray(len(ids), faiss.swig_ptr(ids)))
+            else:
+                self.index.remove_ids(ids)
+
+    def _base_path(self) -> str:
+        """清单中记录的基础索引文件，旧版本没有记录时使用 index_path"""
+        base_file = self._segment_log.manifest.get('base_file')
+        return os.path.join(os.path.dirname(self.index_path), base_file) if base_file else self.index_path
+
+    def _base_files(self) -> List[str]:
+        """磁盘上全部基础索引文件(含崩溃时遗留的未提交文件)"""
+        return [path for path in [self.index_path] + glob.glob(f"{glob.escape(self.index_path)}.*")
+                if os.path.exists(path) and not path.endswith('.tmp')]
+
+    def _write_base(self, index_bytes: np.ndarray, last_seq: int):
+        """
+        写入包含 last_seq 之前全部日志记录的基础索引
+
+        索引写入以序列号命名的新文件，再通过一次清单替换同时提交文件名和序列号；
+        清单替换前崩溃时仍使用旧的基础索引和旧序列号，不会重复回放已合并的新增记录
+        """
+        base_path = f"{self.index_path}.{last_seq}"
+        index_tmp = base_path + '.tmp'
+        with open(index_tmp, 'wb') as f:
+            f.write(index_bytes.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(index_tmp, base_path)
+        self._segment_log.commit_base(last_seq, base_file=os.path.basename(base_path))
+        # 删除旧的基础索引
+        for path in self._base_files():
+            if path != base_path:
+                os.remove(path)
 
     def _save_index(self):
-        """保存索引和元数据"""
-        logger.debug(f"开始保存索引: {self.index_path}")
-        faiss.write_index(self.index, self.index_path)
-        logger.debug(f"索引保存完成")
-        with open(self.metadata_path, 'w', encoding='utf-8') as f:
-            json.dump(self.metadata, f, ensure_ascii=False, indent=2)
-            logger.debug(f"元数据保存完成")
+        """全量保存索引，保存后清空增量日志"""
+        with self._index_lock:
+            logger.debug(f"开始保存索引: {self.index_path}")
+            self._write_base(faiss.serialize_index(self.index), self._segment_log.last_seq)
+            self._segment_log.truncate()
+            logger.debug(f"索引保存完成")
+
+    def _maybe_schedule_compaction(self):
+        """增量日志超过阈值或索引需要重建时在后台线程中合并"""
+        log = self._segment_log
+        if (log.pending_ops < VECTOR_DB.get('compact_threshold', 200)
+                and log.delta_bytes < VECTOR_DB.get('compact_delta_mb', 64) * 1024 * 1024
+                and self._rebuild_target() is None):
+            return
+        if self._compact_thread is not None and self._compact_thread.is_alive():
+            return
+        self._compact_thread = threading.Thread(target=self.compact, name="vector-compaction", daemon=True)
+        self._compact_thread.start()
 
-    def process_file(self, file_path: str, chunk_size: int = 1000) -> None:
+    def compact(self):
+        """
+        将增量日志合并到基础索引
+
+        在索引锁内只做内存快照和日志切换，写盘在锁外进行，不阻塞新的写入和查询；
+        需要升级或重建索引时先完成重建
+        """
+        with self._compact_lock:
+            try:
+                rebuild_target = self._rebuild_target()
+                if rebuild_target:
+                    self._rebuild_index(rebuild_target)
+                with self._index_lock:
+                    if not self._segment_log.pending_ops and not rebuild_target:
+                        return
+                    index_bytes = faiss.serialize_index(self.index)
+                    last_seq = self._segment_log.last_seq
+                    self._segment_log.rotate()
+                logger.debug(f"开始合并增量日志，序列号: {last_seq}")
+                self._write_base(index_bytes, last_seq)
+                logger.info(f"增量日志合并完成，序列号: {last_seq}")
+            except Exception as e:
+                # 上一代日志保留在磁盘上，下次启动时会重新合并
+                logger.error(f"合并增量日志失败: {str(e)}")
+
+    def _check_file(self, file_path: str, force: bool = False) -> Optional[Tuple[str, Tuple[int, int]]]:
+        """
+        检查文件是否需要处理
+
+        已处理过的文件先比较大小和修改时间，都未变化时直接跳过，不读取文件内容
+
+        Returns:
+            需要处理时返回 (文件内容哈希, (大小, 修改时间纳秒))，已处理过且内容未变化时返回 None
+        """
+        stat = os.stat(file_path)
+        file_stat = (stat.st_size, stat.st_mtime_ns)
+        processed = file_path in self._file_ids and not force
+        if processed and self.metadata.get_file_stat(file_path) == file_stat:
+            logger.info(f"文件已处理过，跳过: {file_path}")
+            return None
+        file_hash = compute_file_hash(file_path)
+        if processed:
+            old_hash = self._file_hashes.get(file_path)
+            if old_hash == file_hash:
+                # 只有修改时间变化(如复制、touch)，记录新的大小和修改时间，下次不再计算哈希
+                self.metadata.set_file_stat(file_path, *file_stat)
+                logger.info(f"文件已处理过，跳过: {file_path}")
+                return None
+            if old_hash is None:
+                # 旧版本(metadata.json 导入)没有记录内容哈希，无法判断内容是否变化，重新处理并记录哈希
+                logger.info(f"文件没有内容哈希记录，重新处理: {file_path}")
+            else:
+                logger.info(f"文件内容已变化，重新处理: {file_path}")
+        duplicate_path = self._hash_files.get(file_hash)
+        if duplicate_path and duplicate_path != file_path:
+            logger.info(f"文件内容与已处理文件相同: {file_path} -> {duplicate_path}")
+        return file_hash, file_stat
+
+    def _add_file_chunks(self, file_path: str, file_hash: str, chunks: List[str], vectors: np.ndarray,
+                         file_stat: Optional[Tuple[int, int]] = None):
+        """写入一个文件的分块向量，文件已存在时原地替换旧向量；file_stat 为计算哈希时的 (大小, 修改时间纳秒)"""
+        with self._index_lock:
+            # 删除内容已变化文件的旧向量
+            self._remove_file_vectors(file_path)
+
+            # 分配新ID并生成元数据
+            ids = self._allocate_ids(len(chunks))
+            new_metadata = {}
+            for i, (idx, chunk) in enumerate(zip(ids, chunks)):
+                new_metadata[idx] = {
+                    "file_path": file_path,
+                    "chunk": chunk,
+                    "chunk_index": i,
+                    "processed_at": datetime.now().isoformat(),  # 添加处理时间
+                    "file_hash": file_hash
+                }
+
+            # 先写增量日志，再更新内存索引和元数据
+            self._segment_log.append_add(ids, vectors)
+            self.index.add_with_ids(vectors, np.array(ids, dtype='int64'))
+            self.metadata.add_many(new_metadata)
+            if self._lexical is not None:
+                self._lexical.add_many({idx: meta["chunk"] for idx, meta in new_metadata.items()})
+            self._register_file(file_path, file_hash, ids)
+            # 记录计算哈希时的大小和修改时间，处理期间文件被修改时下次检查会重新计算哈希
+            if file_stat is not None:
+                self.metadata.set_file_stat(file_path, *file_stat)
+            self._invalidate_results()
+
+    def get_chunker(self, file_path: str, chunker: Optional[str] = None,
+                    chunk_size: Optional[int] = None) -> BaseChunker:
+        """
+        按 CHUNKING 配置创建文件对应的分块器，文件扩展名的策略覆盖默认配置
+
+        Args:
+            file_path: 文件路径
+            chunker: 分块器名称，指定时覆盖配置
+            chunk_size: 分块大小，指定时覆盖配置
+
+        Raises:
+            ValueError: 分块器不存在或参数不合法
+        """
+        extension = os.path.splitext(file_path)[1].lower()
+        options = {**CHUNKING, **CHUNKING.get('strategies', {}).get(extension, {})}
+        if chunker:
+            options['chunker'] = chunker
+        if chunk_size:
+            options['chunk_size'] = chunk_size
+            options['chunk_overlap'] = min(options.get('chunk_overlap', 0), chunk_size // 2)
+        return create_chunker(
+            options.get('chunker', 'sentence'),
+            chunk_size=options.get('chunk_size', 500),
+            chunk_overlap=options.get('chunk_overlap', 0),
+            size_unit=options.get('size_unit', 'char')
+        )
+
+    def process_file(self, file_path: str, chunk_size: Optional[int] = None, force: bool = False,
+                     chunker: Optional[str] = None) -> None:
         """
         处理文件并存储到向量数据库
-        
+
+        文件已处理过时，按原ID删除旧向量后写入新向量，不需要重建整个索引
+
         Args:
             file_path: 文件路径
-            chunk_size: 文本分块大小
+            chunk_size: 文本分块大小，默认使用 CHUNKING 配置
+            force: 文件内容未变化时也重新处理
+            chunker: 分块器名称(fixed / sentence)，默认使用 CHUNKING 配置
         """
         if not os.path.exists(file_path):
             raise FileNotFoundError(f"文件不存在: {file_path}")
             
         try:
-            # 检查文件是否已经处理过
-            file_processed = False
-            for metadata in self.metadata.values():
-                if metadata.get("file_path") == file_path:
-                    file_processed = True
-                    logger.info(f"文件已处理过，跳过: {file_path}")
-                    break
-            
-            if file_processed:
+            # 检查文件是否已经处理过，内容变化时重新处理
+            checked = self._check_file(file_path, force)
+            if checked is None:
                 return
-                
-            # 读取文件内容
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-                
-            # 简单的文本分块
-            chunks = [content[i:i+chunk_size] for i in range(0, len(content), chunk_size)]
-            
+            file_hash, file_stat = checked
+
+            # 读取文件内容并分块
+            _, chunks, error = read_and_chunk(file_path, self.get_chunker(file_path, chunker, chunk_size))
+            if error:
+                raise VectorOperationException(error)
+            if not chunks:
+                logger.warning(f"文件内容为空，跳过: {file_path}")
+                return
+
             # 生成向量
-            with torch_cuda_context():
-                with torch.no_grad():
-                    embeddings = self.model.encode(chunks)
-            
-            # 添加到索引
-            self.index.add(np.array(embeddings).astype('float32'))
-            
-            # 更新元数据
-            start_idx = len(self.metadata)
-            for i, chunk in enumerate(chunks):
-                self.metadata[str(start_idx + i)] = {
-                    "file_path": file_path,
-                    "chunk": chunk,
-                    "chunk_index": i,
-                    "processed_at": datetime.now().isoformat()  # 添加处理时间
-                }
-                
-            # 保存更新后的索引和元数据
-            self._save_index()
+            vectors = self._encode_chunks(chunks)
+            self._add_file_chunks(file_path, file_hash, chunks, vectors, file_stat)
+            self._maybe_schedule_compaction()
             logger.info(f"文件处理完成: {file_path}")
             
         except Exception as e:
             logger.error(f"处理文件失败: {str(e)}")
             raise VectorOperationException(f"处理文件失败: {str(e)}")
 
+    def process_files(self, file_paths: List[str], chunk_size: Optional[int] = None, force: bool = False,
+                      progress_callback=None, chunker: Optional[str] = None) -> Dict[str, Any]:
+        """
+        批量处理文件：进程池并行解析/分块，跨文件批量生成向量，全部写入后只合并一次索引
+
+        Args:
+            file_paths: 文件路径列表
+            chunk_size: 文本分块大小，默认使用 CHUNKING 配置
+            force: 文件内容未变化时也重新处理
+            progress_callback: 每个文件处理结束后调用 progress_callback(file_path, error)
+            chunker: 分块器名称(fixed / sentence)，默认按文件类型使用 CHUNKING 配置
+
+        Returns:
+            dict: processed/skipped 为文件路径列表，failed 为 文件路径 -> 错误信息
+        """
+        summary = {"processed": [], "skipped": [], "failed": {}}
+
+        def finish(file_path: str, error: Optional[str] = None):
+            if error:
+                logger.error(f"处理文件失败: {file_path}, {error}")
+                summary["failed"][file_path] = error
+            if progress_callback:
+                progress_callback(file_path, error)
+
+        # 过滤不存在和已处理过的文件
+        pending = {}
+        for file_path in file_paths:
+            if not os.path.exists(file_path):
+                finish(file_path, "文件不存在")
+                continue
+            try:
+                checked = self._check_file(file_path, force)
+            except Exception as e:
+                finish(file_path, str(e))
+                continue
+            if checked is None:
+                summary["skipped"].append(file_path)
+                finish(file_path)
+            else:
+                pending[file_path] = checked
+        if not pending:
+            return summary
+
+        batch_size = VECTOR_DB.get('encode_batch_size', 256)
+        batch: List[tuple] = []
+
+        def flush():
+            """对累积的多个文件的分块一次生成向量，再按文件写入索引"""
+            if not batch:
+                return
+            all_chunks = [chunk for _, chunks in batch for chunk in chunks]
+            try:
+                vectors = self._encode_chunks(all_chunks)
+            except Exception as e:
+                for file_path, _ in batch:
+                    finish(file_path, f"生成向量失败: {str(e)}")
+                batch.clear()
+                return
+            offset = 0
+            for file_path, chunks in batch:
+                try:
+                    file_hash, file_stat = pending[file_path]
+                    self._add_file_chunks(file_path, file_hash, chunks,
+                                          vectors[offset:offset + len(chunks)], file_stat)
+                    summary["processed"].append(file_path)
+                    finish(file_path)
+                except Exception as e:
+                    finish(file_path, str(e))
+                offset += len(chunks)
+            batch.clear()
+
+        def consume(results):
+            for file_path, chunks, error in results:
+                if error:
+                    finish(file_path, error)
+                    continue
+                if not chunks:
+                    logger.warning(f"文件内容为空，跳过: {file_path}")
+                    summary["skipped"].append(file_path)
+                    finish(file_path)
+                    continue
+                batch.append((file_path, chunks))
+                if sum(len(c) for _, c in batch) >= batch_size:
+                    flush()
+            flush()
+
+        paths = list(pending.keys())
+        chunkers = [self.get_chunker(path, chunker, chunk_size) for path in paths]
+        workers = min(VECTOR_DB.get('ingest_workers', 4), len(paths))
+        logger.info(f"开始批量处理文件: {len(paths)} 个，解析进程数: {workers}")
+        if workers > 1:
+            # 子进程解析/分块的同时，主进程对已完成的文件生成向量；进程池跨调用共享，按配置的进程数创建
+            executor = get_ingest_pool(VECTOR_DB.get('ingest_workers', 4))
+            try:
+                consume(executor.map(read_and_chunk, paths, chunkers))
+            except BrokenProcessPool:
+                # 子进程异常退出后进程池不可再用，下次调用时重建
+                shutdown_ingest_pool()
+                raise
+        else:
+            consume(map(read_and_chunk, paths, chunkers))
+
+        # 全部写入后统一合并一次索引
+        self.compact()
+        logger.info(f"批量处理完成，成功: {len(summary['processed'])}，跳过: {len(summary['skipped'])}，"
+                    f"失败: {len(summary['failed'])}")
+        return summary
+
     def delete_file(self, file_path: str, remove_file: bool = True):
         """
         删除文件，并删除索引中的相关向量
@@ -253,78 +1008,239 @@ class VectorUtils:
         if not os.path.exists(file_path):
             return
             
-        # 找出所有与该文件相关的向量索引
-        indices_to_remove = []
-        for idx, metadata in self.metadata.items():
-            if metadata["file_path"] == file_path:
-                indices_to_remove.append(int(idx))
-                
-        if not indices_to_remove:
-            raise VectorOperationException(f"警告：在向量库中未找到文件 {file_path} 的相关记录")
-            
-        # 从索引中删除向量
-        self.index.remove_ids(np.array(indices_to_remove))
-        
-        # 从元数据中删除相关记录
-        for idx in indices_to_remove:
-            del self.metadata[str(idx)]
-            
+        with self._index_lock:
+            # 只处理该文件相关的向量
+            if not self._remove_file_vectors(file_path):
+                raise VectorOperationException(f"警告：在向量库中未找到文件 {file_path} 的相关记录")
+            self.metadata.delete_file_tags(file_path)
+            self.metadata.delete_file_stat(file_path)
+            self._invalidate_results()
+
         # 删除实际文件
         if remove_file:
             os.remove(file_path)
+
+        self._maybe_schedule_compaction()
         
-        # 保存更新后的索引和元数据
-        self._save_index()
-        
-    def search(self, query: str, top_k: int = 5) -> List[Dict[str, Any]]:
+    def search(self, query: str, top_k: int = 5, filters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
         """
         搜索相似内容
         
         Args:
             query: 查询文本
             top_k: 返回结果数量
+            filters: 元数据过滤条件，见 search_batch
             
         Returns:
             包含相似内容的列表，每个元素包含文件路径和内容
         """
-        try:
-            # 生成查询向量
-            with torch_cuda_context():
-                with torch.no_grad():
-                    query_vector = self.model.encode([query])
-            logger.debug(f"查询向量生成完成")
-            
-            # 搜索最相似的向量
-            distances, indices = self.index.search(
-                np.array(query_vector).astype('float32'),
-                top_k
+        return self.search_batch([query], top_k, filters)[0]
+
+    async def asearch(self, query: str, top_k: int = 5, timeout: Optional[float] = None,
+                      filters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """
+        异步搜索相似内容，在有界线程池中执行，不阻塞事件循环
+
+        Args:
+            query: 查询文本
+            top_k: 返回结果数量
+            timeout: 超时时间(秒)，默认使用 VECTOR_DB['search_timeout']
+            filters: 元数据过滤条件，见 search_batch
+
+        Raises:
+            ServiceOverloadedException: 检索队列已满
+            OperationTimeoutException: 检索超时
+        """
+        return (await self.asearch_batch([query], top_k, timeout, filters))[0]
+
+    async def asearch_batch(self, queries: List[str], top_k: int = 5, timeout: Optional[float] = None,
+                            filters: Optional[Dict[str, Any]] = None) -> List[List[Dict[str, Any]]]:
+        """
+        异步批量搜索相似内容，参数和返回值同 search_batch
+
+        Args:
+            timeout: 超时时间(秒)，默认使用 VECTOR_DB['search_timeout']
+        """
+        if not queries:
+            return []
+        if timeout is None:
+            timeout = VECTOR_DB.get('search_timeout', 10)
+        return await self._search_executor.run(self.search_batch, queries, top_k, filters, timeout=timeout)
+
+    def _fuse(self, vector_hits: List[tuple], lexical_hits: List[tuple]) -> List[tuple]:
+        """
+        融合向量检索和词法检索的结果
+
+        Args:
+            vector_hits: [(向量ID, 相似度)]，按相似度从高到低
+            lexical_hits: [(向量ID, BM25分数)]，按分数从高到低
+
+        Returns:
+            [(向量ID, 融合分数, 相似度, BM25分数)]，按融合分数从高到低
+        """
+        similarities = dict(vector_hits)
+        lexical_scores = dict(lexical_hits)
+        if HYBRID_SEARCH.get('fusion', 'rrf') == 'weighted':
+            # 相似度已在 (0, 1] 区间，BM25分数按本次查询的最高分归一化
+            weight = HYBRID_SEARCH.get('vector_weight', 0.7)
+            max_lexical = max(lexical_scores.values(), default=0.0) or 1.0
+            fused = {
+                idx: weight * similarities.get(idx, 0.0) + (1 - weight) * lexical_scores.get(idx, 0.0) / max_lexical
+                for idx in set(similarities) | set(lexical_scores)
+            }
+        else:
+            fused = reciprocal_rank_fusion(
+                [[idx for idx, _ in vector_hits], [idx for idx, _ in lexical_hits]],
+                k=HYBRID_SEARCH.get('rrf_k', 60)
             )
-            logger.debug(f"搜索完成，结果: {distances}, {indices}")
-
-            # 整理结果
-            results = []
-            for distance, idx in zip(distances[0], indices[0]):
-                if str(idx) in self.metadata:
-                    result = self.metadata[str(idx)].copy()
-                    result["similarity_score"] = float(1 / (1 + distance))
-                    results.append(result)
-                    
-            return results
+        ranked = sorted(fused.items(), key=lambda item: item[1], reverse=True)
+        return [(idx, score, similarities.get(idx), lexical_scores.get(idx)) for idx, score in ranked]
+
+    def search_batch(self, queries: List[str], top_k: int = 5,
+                     filters: Optional[Dict[str, Any]] = None) -> List[List[Dict[str, Any]]]:
+        """
+        批量搜索相似内容：一次生成全部查询向量，一次FAISS检索，一次读取元数据
+
+        启用混合检索时，同时在BM25词法索引中召回候选，按 HYBRID_SEARCH['fusion'] 与向量结果融合。
+        有过滤条件时先在元数据中筛选出向量ID，通过ID选择器在索引内部过滤，返回的是满足条件的 top_k；
+        筛选出的分块较少时(VECTOR_DB['filter_exact_max'])直接精确计算距离
+
+        Args:
+            queries: 查询文本列表
+            top_k: 每个查询返回的结果数量
+            filters: 元数据过滤条件(各条件之间为"且")
+                file_paths: 文件路径列表
+                file_types: 文件扩展名列表，如 [".pdf"]
+                processed_after / processed_before: 处理时间范围(ISO格式)
+                tags: 标签列表，文件包含任一标签即匹配
+
+        Returns:
+            与 queries 顺序一致的结果列表，每个元素同 search 的返回值。
+            每个结果包含 similarity_score(向量相似度)、lexical_score(BM25分数) 和 score(最终排序分数)
+        """
+        if not queries:
+            return []
+        try:
+            normalized = [self._normalize_query(query) for query in queries]
+            filters_key = self._filters_key(filters)
+            batch_results: List[Optional[List[Dict[str, Any]]]] = [
+                self._result_cache.get((query, top_k, filters_key, self._index_version)) for query in normalized
+            ]
+            missing = [i for i, results in enumerate(batch_results) if results is None]
+            allowed_ids = self._resolve_filters(filters) if missing else None
+            if allowed_ids is not None and not len(allowed_ids):
+                # 没有满足过滤条件的分块
+                return [[] for _ in queries]
+            if missing:
+                hybrid = self._lexical is not None
+                # 融合前每一路多召回一些候选
+                fetch_k = max(top_k, HYBRID_SEARCH.get('candidate_k', 50)) if hybrid else top_k
+
+                # 生成查询向量
+                # 归一化后的查询只作为缓存键，向量和BM25均使用原始查询
+                query_vectors = self._encode_queries([queries[i] for i in missing],
+                                                     [normalized[i] for i in missing])
+                logger.debug(f"查询向量生成完成，数量: {len(missing)}")
+                allowed_set = set(allowed_ids.tolist()) if allowed_ids is not None else None
+                lexical_hits = [self._lexical.search(queries[i], fetch_k, allowed_set) if hybrid else []
+                                for i in missing]
+
+                with self._index_lock:
+                    version = self._index_version
+                    if allowed_ids is None:
+                        if self._index_kind() == 'HNSW' and self._hnsw_deleted:
+                            # 检索时排除 HNSW 中已删除但未清理的向量，不占用结果名额
+                            distances, indices = self.index.search(
+                                query_vectors, fetch_k, params=self._search_params(self._deleted_ids_selector()))
+                        else:
+                            # 搜索最相似的向量
+                            distances, indices = self.index.search(query_vectors, fetch_k)
+                    elif len(allowed_ids) <= VECTOR_DB.get('filter_exact_max', 2048):
+                        distances, indices = self._exact_search(query_vectors, allowed_ids, fetch_k)
+                    else:
+                        # 过滤条件中的ID均来自元数据(未删除)，无需为已删除向量多取
+                        selector = faiss.IDSelectorBatch(allowed_ids)
+                        distances, indices = self.index.search(query_vectors, fetch_k,
+                                                               params=self._search_params(selector))
+                    logger.debug(f"搜索完成，结果: {distances}, {indices}")
+
+                    # 只读取命中的元数据(已删除的向量/分块读不到元数据，会被过滤掉)
+                    hit_ids = set(int(idx) for idx in np.unique(indices))
+                    hit_ids.update(idx for hits in lexical_hits for idx, _ in hits)
+                    rows = self.metadata.get_many(hit_ids)
+
+                for i, query_distances, query_indices, query_lexical in zip(missing, distances, indices, lexical_hits):
+                    vector_hits = [
+                        (int(idx), float(1 / (1 + distance)))
+                        for distance, idx in zip(query_distances, query_indices) if int(idx) in rows
+                    ][:fetch_k]
+                    if hybrid:
+                        ranked = self._fuse(vector_hits, [(idx, score) for idx, score in query_lexical if idx in rows])
+                    else:
+                        ranked = [(idx, similarity, similarity, None) for idx, similarity in vector_hits]
+                    results = []
+                    for idx, score, similarity, lexical_score in ranked[:top_k]:
+                        result = dict(rows[idx])
+                        result["similarity_score"] = similarity if similarity is not None else 0.0
+                        result["lexical_score"] = lexical_score if lexical_score is not None else 0.0
+                        result["score"] = float(score)
+                        results.append(result)
+                    self._result_cache.set((normalized[i], top_k, filters_key, version), results)
+                    batch_results[i] = results
+            # 返回副本，避免调用方修改缓存内容
+            return [[dict(result) for result in results] for results in batch_results]
         except Exception as e:
             logger.error(f"搜索失败: {str(e)}")
-            raise VectorOperationException(f"搜索失败: {str(e)}") 
-        
+            raise VectorOperationException(f"搜索失败: {str(e)}")
 
     # 删除当前已经创建的所有索引
-    def delete_all_indexes(self):
+    def delete_all_indexes(self, keep_tags: bool = True):
         """
-        删除当前已经创建的所有索引
+        删除当前已经创建的所有索引(包括增量日志)，并重置内存中的索引
+
+        Args:
+            keep_tags: 保留仍存在的文件的标签，重建索引后标签继续生效
         """
-        if os.path.exists(self.index_path):
-            os.remove(self.index_path)
+        with self._compact_lock, self._index_lock:
+            for path in self._base_files():
+                os.remove(path)
             logger.debug(f"索引删除完成")
-            if os.path.exists(self.metadata_path):
-                os.remove(self.metadata_path)
-                logger.debug(f"元数据删除完成")
-        else:
-            logger.debug(f"索引不存在，无需删除")
+            self.metadata.clear(keep_tags=keep_tags)
+            logger.debug(f"元数据删除完成")
+            if self._lexical is not None:
+                self._lexical.clear()
+            self._segment_log.clear()
+            self.index = self._create_index()
+            self._next_id = 0
+            self._hnsw_deleted = set()
+            self._deleted_selector = None
+            self._apply_search_params()
+            self._invalidate_results()
+            self._build_file_index()
+
+    def get_index_status(self) -> Dict[str, Any]:
+        """
+        获取索引状态
+
+        Returns:
+            dict: 向量数量、文件数量以及增量日志情况
+        """
+        with self._index_lock:
+            kind = self._index_kind()
+            return {
+                "index_type": kind,
+                "configured_index_type": self._configured_index_type(),
+                "nprobe": self.index.nprobe if kind in ('IVFFlat', 'IVFPQ') else None,
+                "ef_search": faiss.downcast_index(self.index.index).hnsw.efSearch if kind == 'HNSW' else None,
+                "total_vectors": int(self.index.ntotal),
+                "query_cache": self._query_cache.stats(),
+                "result_cache": self._result_cache.stats(),
+                "embedding_cache": self._embedding_cache.stats() if self._embedding_cache else None,
+                "search_executor": self._search_executor.stats(),
+                "lexical_index": self._lexical.stats() if self._lexical is not None else None,
+                "total_chunks": self.metadata.count(),
+                "total_files": len(self._file_ids),
+                "pending_log_records": self._segment_log.pending_ops,
+                "delta_bytes": self._segment_log.delta_bytes,
+                "compacting": self._compact_thread is not None and self._compact_thread.is_alive()
+            }
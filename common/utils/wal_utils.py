@@ -0,0 +1,227 @@
+import os
+import json
+import logging
+import threading
+from typing import List, Dict, Any, Iterator
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class SegmentLog:
+    """
+    向量增量段 + 预写日志(WAL)
+
+    新增向量以 float32 行的形式追加写入增量段文件，每次变更(新增/删除)
+    以一行 JSON 追加写入预写日志，记录递增的序列号。基础索引落盘后，
+    清单文件记录已合并的最大序列号，加载时只回放序列号更大的日志记录。
+
+    文件布局(以 prefix='vector' 为例):
+        vector_delta.bin        当前增量段
+        vector_wal.jsonl        当前预写日志
+        vector_*.compacting     正在合并中的上一代增量段/日志
+        vector_manifest.json    基础索引清单(基础索引文件名 + 已合并的最大序列号)
+    """
+
+    COMPACTING_SUFFIX = '.compacting'
+
+    def __init__(self, directory: str, dimension: int, prefix: str = 'vector'):
+        """
+        初始化增量日志
+
+        Args:
+            directory: 日志文件所在目录
+            dimension: 向量维度
+            prefix: 文件名前缀
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.dimension = dimension
+        self.delta_path = os.path.join(directory, f'{prefix}_delta.bin')
+        self.wal_path = os.path.join(directory, f'{prefix}_wal.jsonl')
+        self.manifest_path = os.path.join(directory, f'{prefix}_manifest.json')
+        self._lock = threading.Lock()
+        self._manifest = self._read_manifest()
+        self.last_seq = self._manifest.get('last_seq', 0)
+        self.pending_ops = 0
+        self._delta_rows = self._count_delta_rows(self.delta_path)
+        # 扫描已有日志，恢复序列号和待合并数量
+        for record in self._read_wal(self.rotated_wal_path) + self._read_wal(self.wal_path):
+            self.last_seq = max(self.last_seq, record['seq'])
+            self.pending_ops += 1
+
+    @property
+    def rotated_wal_path(self) -> str:
+        return self.wal_path + self.COMPACTING_SUFFIX
+
+    @property
+    def rotated_delta_path(self) -> str:
+        return self.delta_path + self.COMPACTING_SUFFIX
+
+    @property
+    def base_seq(self) -> int:
+        """基础索引已包含的最大序列号"""
+        return self._manifest.get('last_seq', 0)
+
+    @property
+    def manifest(self) -> Dict[str, Any]:
+        return dict(self._manifest)
+
+    @property
+    def delta_bytes(self) -> int:
+        """当前增量段大小(字节)"""
+        return self._delta_rows * self.dimension * 4
+
+    def has_rotated(self) -> bool:
+        """是否存在未完成合并的上一代日志"""
+        return os.path.exists(self.rotated_wal_path) or os.path.exists(self.rotated_delta_path)
+
+    def _read_manifest(self) -> Dict[str, Any]:
+        if not os.path.exists(self.manifest_path):
+            return {}
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            logger.warning(f"读取清单文件失败，按空清单处理: {str(e)}")
+            return {}
+
+    def _count_delta_rows(self, path: str) -> int:
+        if not os.path.exists(path):
+            return 0
+        return os.path.getsize(path) // (self.dimension * 4)
+
+    def _read_wal(self, path: str) -> List[Dict[str, Any]]:
+        """读取日志记录，忽略崩溃时写了一半的末尾行"""
+        records = []
+        if not os.path.exists(path):
+            return records
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    logger.warning(f"忽略不完整的日志记录: {path}")
+                    break
+        return records
+
+    def _append_record(self, record: Dict[str, Any]) -> int:
+        self.last_seq += 1
+        record['seq'] = self.last_seq
+        with open(self.wal_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        self.pending_ops += 1
+        return self.last_seq
+
+    def append_add(self, ids: List[int], vectors: np.ndarray) -> int:
+        """
+        追加新增记录：先写增量段再写日志，保证日志引用的向量一定已落盘
+
+        Args:
+            ids: 向量ID列表
+            vectors: 向量数组, shape=(len(ids), dimension)
+
+        Returns:
+            int: 记录序列号
+        """
+        vectors = np.ascontiguousarray(vectors, dtype='float32')
+        with self._lock:
+            offset = self._delta_rows
+            with open(self.delta_path, 'ab') as f:
+                f.write(vectors.tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            self._delta_rows += len(vectors)
+            return self._append_record({
+                'op': 'add',
+                'offset': offset,
+                'count': len(vectors),
+                'ids': [int(i) for i in ids]
+            })
+
+    def append_delete(self, ids: List[int]) -> int:
+        """追加删除记录"""
+        with self._lock:
+            return self._append_record({'op': 'delete', 'ids': [int(i) for i in ids]})
+
+    def replay(self, after_seq: int = None) -> Iterator[Dict[str, Any]]:
+        """
+        按顺序回放基础索引之后的日志记录(先上一代，再当前代)
+
+        Args:
+            after_seq: 只回放序列号大于该值的记录，默认使用基础索引的序列号
+
+        Yields:
+            dict: 日志记录，新增记录附带 'vectors' 字段
+        """
+        for wal_path, delta_path in ((self.rotated_wal_path, self.rotated_delta_path),
+                                     (self.wal_path, self.delta_path)):
+            records = self._read_wal(wal_path)
+            if not records:
+                continue
+            delta = None
+            for record in records:
+                if record['seq'] <= (self.base_seq if after_seq is None else after_seq):
+                    continue
+                if record['op'] == 'add':
+                    if delta is None:
+                        delta = np.fromfile(delta_path, dtype='float32').reshape(-1, self.dimension)
+                    start = record['offset']
+                    record['vectors'] = delta[start:start + record['count']]
+                yield record
+
+    def rotate(self):
+        """将当前日志切换为上一代，后续写入进入新的日志文件"""
+        with self._lock:
+            if os.path.exists(self.wal_path):
+                os.replace(self.wal_path, self.rotated_wal_path)
+            if os.path.exists(self.delta_path):
+                os.replace(self.delta_path, self.rotated_delta_path)
+            self._delta_rows = 0
+            self.pending_ops = 0
+
+    def commit_base(self, last_seq: int, **extra):
+        """
+        基础索引落盘后写入清单，并删除已合并的上一代日志
+
+        基础索引需先完整写入新文件，文件名通过 extra(base_file) 与序列号一起原子写入清单，
+        两者同时生效
+
+        Args:
+            last_seq: 基础索引包含的最大序列号
+            extra: 其他需要记录到清单中的字段
+        """
+        manifest = {**self._manifest, **extra, 'last_seq': last_seq}
+        tmp_path = self.manifest_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.manifest_path)
+        self._manifest = manifest
+        for path in (self.rotated_wal_path, self.rotated_delta_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def truncate(self):
+        """删除全部日志(保留清单)，仅在基础索引已包含全部记录时调用"""
+        with self._lock:
+            for path in (self.wal_path, self.delta_path, self.rotated_wal_path, self.rotated_delta_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            self.pending_ops = 0
+            self._delta_rows = 0
+
+    def clear(self):
+        """删除全部日志和清单"""
+        self.truncate()
+        with self._lock:
+            if os.path.exists(self.manifest_path):
+                os.remove(self.manifest_path)
+            self._manifest = {}
+            self.last_seq = 0
@@ -1,5 +1,7 @@
 from fastapi import APIRouter, status
+from fastapi.responses import JSONResponse
 from typing import Dict
+from ekbase.core.services.document_core_service import DocumentCoreService
 
 router = APIRouter()
 
@@ -13,3 +15,15 @@ async def health_check() -> Dict[str, str]:
         "status": "healthy",
         "message": "Service is running normally"
     }
+
+@router.get("/ready")
+async def readiness_check():
+    """
+    就绪检查接口
+    向量索引加载完成时返回200，加载中或加载失败时返回503，并返回加载进度
+    """
+    load_status = DocumentCoreService().get_load_status()
+    return JSONResponse(
+        status_code=status.HTTP_200_OK if load_status["ready"] else status.HTTP_503_SERVICE_UNAVAILABLE,
+        content=load_status
+    )
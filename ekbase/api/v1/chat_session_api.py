@@ -45,6 +45,16 @@ async def delete_session(session_id: str):
     return {"message": "Session deleted successfully"}
 
 
+@router.get("/stream_metrics")
+async def stream_metrics():
+    """流式输出指标(首 token 时间、总耗时的分位数)"""
+    return ChatService.get_stream_metrics()
+
+@router.get("/llm_metrics")
+async def llm_metrics():
+    """大模型调用的重试和熔断指标"""
+    return ChatService().get_llm_metrics()
+
 @router.post("/stream")
 async def stream_post(request: Request):
     try:
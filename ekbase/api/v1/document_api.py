@@ -1,20 +1,58 @@
-from http.client import HTTPException
-from fastapi import APIRouter, UploadFile, File
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException
+from typing import List, Optional
 from ekbase.core.services.document_core_service import DocumentCoreService
+from ekbase.core.services.ingest_job_service import IngestJobService
+from ekbase.core.models.search_request import SearchRequest, SearchBatchRequest, DocumentTagsRequest
+from common.exception import IndexNotReadyException, ServiceOverloadedException, OperationTimeoutException
 
 router = APIRouter(prefix="/documents", tags=["documents"])
 
+def _parse_tags(tags: Optional[str]) -> List[str]:
+    """表单中的标签以逗号分隔"""
+    return [tag.strip() for tag in (tags or '').replace('，', ',').split(',') if tag.strip()]
+
 # 上传文档
 @router.post("/upload")
-async def upload_document(file: UploadFile = File(...)):
-    """上传文档"""
+async def upload_document(file: UploadFile = File(...), chunker: Optional[str] = Form(None),
+                          tags: Optional[str] = Form(None)):
+    """上传文档, chunker 指定分块器(fixed / sentence)，默认按文件类型使用配置; tags 为逗号分隔的标签"""
     try:
         document_service = DocumentCoreService()
-        document = await document_service.upload_document(file)
+        document = await document_service.upload_document(file, chunker, _parse_tags(tags))
         return document
+    except HTTPException:
+        raise
+    except IndexNotReadyException as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     
+# 批量上传文档
+@router.post("/bulk_upload")
+async def bulk_upload(files: List[UploadFile] = File(...), chunker: Optional[str] = Form(None),
+                      tags: Optional[str] = Form(None)):
+    """批量上传文档(支持 .zip 压缩包)，后台导入，返回任务信息; tags 为逗号分隔的标签"""
+    try:
+        return await IngestJobService().submit(files, chunker, _parse_tags(tags))
+    except HTTPException:
+        raise
+    except IndexNotReadyException as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+# 批量导入任务列表
+@router.get("/jobs")
+async def list_ingest_jobs():
+    """列出最近的批量导入任务"""
+    return IngestJobService().list_jobs()
+
+# 批量导入任务进度
+@router.get("/jobs/{job_id}")
+async def get_ingest_job(job_id: str):
+    """获取批量导入任务进度"""
+    return IngestJobService().get_job(job_id)
+
 # 重建索引
 @router.post("/reload_index")
 async def reload_index():
@@ -23,6 +61,38 @@ async def reload_index():
         document_service = DocumentCoreService()
         document_service.reload_index()
         return {"message": "索引重建成功"}
+    except IndexNotReadyException as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+# 搜索
+@router.post("/search")
+async def search(request: SearchRequest):
+    """搜索文档，filters 按文档ID/文件类型/处理时间/标签过滤"""
+    try:
+        document_service = DocumentCoreService()
+        filters = request.filters.to_dict() if request.filters else None
+        return await document_service.asearch_document(request.query, request.top_k, filters=filters)
+    except ServiceOverloadedException as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except OperationTimeoutException as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+# 批量搜索
+@router.post("/search_batch")
+async def search_batch(request: SearchBatchRequest):
+    """批量搜索文档，filters 同 /search"""
+    try:
+        document_service = DocumentCoreService()
+        filters = request.filters.to_dict() if request.filters else None
+        return await document_service.asearch_documents_batch(request.queries, request.top_k, filters=filters)
+    except ServiceOverloadedException as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except OperationTimeoutException as e:
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -43,10 +113,26 @@ async def delete_document(document_id: str):
         document_service = DocumentCoreService()
         document_service.delete_document(document_id)
         return {"message": "文档删除成功"}
+    except IndexNotReadyException as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# 设置文档标签
+@router.put("/{document_id}/tags")
+async def set_document_tags(document_id: str, request: DocumentTagsRequest):
+    """设置文档标签(覆盖原有标签)"""
+    try:
+        document_service = DocumentCoreService()
+        return {"document_id": document_id, "tags": document_service.set_document_tags(document_id, request.tags)}
+    except HTTPException:
+        raise
+    except IndexNotReadyException as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.get("/get_index_status")
 async def get_index_status():
     """获取索引状态"""
@@ -63,5 +149,7 @@ async def reset_index(document_id: str):
         document_service = DocumentCoreService()
         document_service.reset_index(document_id)
         return {"message": "索引重置成功"}
+    except IndexNotReadyException as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -8,6 +8,9 @@ from ekbase.database.models.position import Position
 from fastapi.responses import StreamingResponse
 from urllib.parse import quote
 from ekbase.core.models.generate_questions_request import GenerateQuestionsRequest
+from ekbase.config import INGEST
+from common.utils.upload_utils import read_upload_bytes
+from common.exception import FileTooLargeException
 
 router = APIRouter(prefix="/interview", tags=["interview"])
 
@@ -55,7 +58,10 @@ async def create_candidate(
 ):
     """创建新候选人"""
     try:
-        resume_content_data = await resume_content.read()
+        # 分块读取并限制大小，超限时不再继续读取
+        resume_content_data = await read_upload_bytes(
+            resume_content, max_bytes=INGEST.get('max_resume_mb', 10) * 1024 * 1024
+        )
         if not resume_content_data:
             raise HTTPException(status_code=400, detail="简历文件不能为空")
             
@@ -72,6 +78,8 @@ async def create_candidate(
         )
         interview_core_service = InterviewCoreService()
         return await interview_core_service.create_candidate(candidate)
+    except FileTooLargeException as e:
+        raise HTTPException(status_code=413, detail=e.message)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
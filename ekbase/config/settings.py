@@ -84,14 +84,114 @@ STORAGE = {
     'documents': os.path.join(BASE_DIR, 'storage', 'documents'),
     'vectors': os.path.join(BASE_DIR, 'storage', 'vectors'),
     'temp': os.path.join(BASE_DIR, 'storage', 'temp'),
-    'models': os.path.join(BASE_DIR, 'storage', 'models')
+    'models': os.path.join(BASE_DIR, 'storage', 'models'),
+    'parse_cache': os.path.join(BASE_DIR, 'storage', 'parse_cache')
+}
+
+# 文档解析配置
+PARSING = {
+    'parse_cache': False,  # 是否按文件内容哈希把解析出的文本缓存到磁盘，重建索引时不再重复解析(文档删除时同时删除缓存)
+    'pdf_workers': 4,  # PDF逐页解析的进程数
+    'pdf_parallel_min_pages': 32,  # 页数达到该值时才使用多进程解析
+}
+
+# 文档导入配置
+INGEST = {
+    'allowed_extensions': ('.txt', '.pdf', '.docx'),  # 允许上传的文件类型
+    'job_workers': 1,  # 同时执行的批量导入任务数(单个任务内部按 VECTOR_DB['ingest_workers'] 并行解析)
+    'max_files_per_job': 10000,  # 单个批量导入任务的最大文件数(含压缩包内文件)
+    'job_retention': 100,  # 内存中保留的任务记录数
+    'copy_buffer_size': 1024 * 1024,  # 保存上传文件时每次读写的字节数
+    'max_upload_mb': 100,  # 单个上传文档的大小上限(MB)，也用于压缩包内的单个文件(解压后)
+    'max_archive_mb': 1024,  # 单个上传压缩包的大小上限(MB)
+    'max_extracted_mb': 4096,  # 单个任务中压缩包解压后的总大小上限(MB)
+    'max_resume_mb': 10,  # 单个简历文件的大小上限(MB)
+    'dedupe_uploads': True,  # 内容与已入库文档相同的上传直接返回已有文档，不重复保存和向量化
+}
+
+# 文本分块配置
+CHUNKING = {
+    'chunker': 'sentence',  # 默认分块器: sentence 按句子/段落边界分块, fixed 定长分块
+    'chunk_size': 500,  # 分块大小
+    'chunk_overlap': 50,  # 相邻分块的重叠大小
+    'size_unit': 'char',  # 分块大小单位: char 字符数 / token 近似token数
+    # 按文件扩展名覆盖上面的配置
+    'strategies': {
+        '.xlsx': {'chunker': 'fixed', 'chunk_overlap': 0},
+        '.xls': {'chunker': 'fixed', 'chunk_overlap': 0},
+        '.md': {'chunk_size': 800},
+    },
 }
 
 # 向量数据库配置
 VECTOR_DB = {
     'dimension': 768,  # 向量维度
-    'index_type': 'IVFFlat',  # 索引类型
+    'index_type': 'IVFFlat',  # 索引类型: Flat / IVFFlat / IVFPQ / HNSW
+    'upgrade_threshold': 10000,  # 向量数达到该值后由暴力检索(Flat)升级为 index_type
+    'train_sample_size': 50000,  # IVF 训练采样数量
     'nlist': 100,  # 聚类中心数量
+    'nprobe': 10,  # IVF 检索时访问的聚类数量
+    'pq_m': 16,  # IVFPQ 子量化器数量(需整除向量维度)
+    'pq_nbits': 8,  # IVFPQ 每个子量化器的编码位数
+    'hnsw_m': 32,  # HNSW 每个节点的邻居数量
+    'ef_construction': 200,  # HNSW 构建时的候选数量
+    'ef_search': 64,  # HNSW 检索时的候选数量
+    'hnsw_rebuild_ratio': 0.2,  # HNSW 已删除向量占比达到该值时重建索引
+    'query_cache_size': 1024,  # 查询向量缓存条目数
+    'query_cache_ttl': 3600,  # 查询向量缓存过期时间（秒）
+    'result_cache_size': 1024,  # 检索结果缓存条目数，索引变更时失效
+    'result_cache_ttl': 300,  # 检索结果缓存过期时间（秒）
+    'embedding_cache': True,  # 是否启用分块向量持久化缓存，重建索引时复用未变化分块的向量
+    'embedding_cache_dtype': 'float16',  # 向量缓存存储精度: float16 / float32
+    'ingest_workers': 4,  # 批量入库时解析/分块的进程数
+    'encode_batch_size': 256,  # 批量入库时跨文件合并生成向量的分块数量
+    'compact_threshold': 200,  # 增量日志记录数达到该值时触发后台合并
+    'compact_delta_mb': 64,  # 增量段大小(MB)达到该值时触发后台合并
+    'search_workers': 4,  # 异步检索线程数
+    'search_max_pending': 64,  # 异步检索最大排队数，超过时直接拒绝
+    'search_timeout': 10,  # 异步检索超时时间（秒）
+    'filter_exact_max': 2048,  # 过滤后的候选分块数不超过该值时直接精确计算距离，不走近似索引
+}
+
+# 混合检索配置(BM25词法索引 + 向量索引)
+HYBRID_SEARCH = {
+    'enabled': True,  # 是否维护词法索引并与向量检索结果融合
+    'fusion': 'rrf',  # 融合方式: rrf 倒数排名融合 / weighted 加权分数
+    'rrf_k': 60,  # RRF 平滑常数
+    'vector_weight': 0.7,  # weighted 融合时向量相似度的权重，词法分数权重为 1 - vector_weight
+    'candidate_k': 50,  # 融合前向量检索和词法检索各自召回的候选数量
+    'bm25_k1': 1.5,  # BM25 词频饱和参数
+    'bm25_b': 0.75,  # BM25 文档长度归一化参数
+    'use_jieba': True,  # 中文使用 jieba 分词，未安装时按单字和二元组切分
+    'max_df_ratio': 0.5,  # 出现在超过该比例分块中的词检索时忽略
+    'max_postings_per_term': 1000,  # 每个查询词最多读取的倒排项数(按该词的 BM25 贡献从高到低)
+}
+
+# 检索增强配置
+RAG = {
+    'top_k': 8,  # 向量检索召回数量
+    'max_context_tokens': 2000,  # 放入提示词的检索上下文 token 预算
+    'min_score': 0.0,  # 最低检索分数(混合检索时为融合分数)，低于该值的结果不放入上下文
+    'dedupe_threshold': 0.85,  # 与已选分块的文本重合度达到该值时视为重复
+    'min_chunk_tokens': 32,  # 剩余预算至少还有这么多 token 时才截断放入下一个分块
+}
+
+# 重排序配置
+RERANK = {
+    'enabled': False,  # 是否使用交叉编码器对检索结果重排序(开启后首次检索时下载并加载模型)
+    # 交叉编码器模型，默认使用支持中文的小模型(MiniLM, 12层/384维)；纯英文语料可用 cross-encoder/ms-marco-MiniLM-L-6-v2
+    'model_name': 'cross-encoder/mmarco-mMiniLMv2-L12-H384-v1',
+    'backend': 'torch',  # 推理后端: torch / onnx(需要安装 optimum[onnxruntime])
+    'quantize': True,  # CPU 上使用 int8 动态量化
+    'candidate_k': 30,  # 重排序前向量检索召回的候选数量
+    'batch_size': 32,  # 打分批大小
+    'max_length': 512,  # (查询, 分块) 拼接后的最大长度
+    'min_score': 0.0,  # 重排序后最低相关度(0~1)，低于该值的结果不放入上下文
+    'cache_size': 4096,  # (查询, 分块) 分数缓存条目数
+    'cache_ttl': 3600,  # 分数缓存过期时间（秒）
+    'workers': 1,  # 重排序线程数
+    'max_pending': 8,  # 重排序最大排队数，超过时跳过重排序
+    'timeout': 2,  # 重排序超时时间（秒），超时时跳过重排序
 }
 
 # 大模型配置
@@ -101,7 +201,80 @@ LLM = {
     'max_length': 2048,
     'top_p': 0.9,
     'base_url': 'https://ark.cn-beijing.volces.com/api/v3',
-    'api_key': os.getenv("OPENAI_API_KEY")
+    'api_key': os.getenv("OPENAI_API_KEY"),
+    # 远程模型共用的HTTP连接池
+    'http_pool': {
+        'max_connections': 100,  # 最大连接数
+        'max_keepalive_connections': 20,  # 最大空闲保持连接数
+        'keepalive_expiry': 30,  # 空闲连接保持时间（秒）
+        'connect_timeout': 5,  # 建立连接超时时间（秒）
+        'read_timeout': 60,  # 读取超时时间（秒），流式输出时为两个数据块之间的最长间隔
+        'write_timeout': 10,  # 发送请求超时时间（秒）
+        'pool_timeout': 5,  # 等待连接池空闲连接的超时时间（秒）
+        'http2': False,  # 是否启用HTTP/2(需要安装 h2)
+    },
+    # 重试和熔断(每个模型后端一个熔断器，共用重试预算)
+    'resilience': {
+        'max_retries': 3,  # 最大重试次数
+        'base_delay': 0.5,  # 第一次重试的退避上限（秒），之后按 multiplier 倍增并随机抖动
+        'max_delay': 8.0,  # 退避上限（秒）
+        'multiplier': 2.0,  # 退避倍数
+        'max_retry_after': 30.0,  # 服务端 Retry-After 超过该值（秒）时不再重试
+        'retry_budget_ratio': 0.2,  # 重试次数占请求数的比例上限
+        'retry_budget_min_per_second': 1.0,  # 请求很少时每秒至少允许的重试次数
+        'retry_budget_window': 10.0,  # 重试预算统计窗口（秒）
+        'breaker_failure_threshold': 5,  # 连续失败该次数后熔断
+        'breaker_recovery_timeout': 30.0,  # 熔断后经过该时间（秒）放行试探调用
+    },
+    # 多个模型后端，为空时只使用上面的默认模型；每个后端的配置覆盖上面的同名字段
+    'backends': [
+        # {
+        #     'name': 'doubao-main',  # 后端名称，默认为 model_name
+        #     'model_name': 'doubao-1-5-thinking-pro-250415',
+        #     'provider': 'doubao',  # doubao / gpt / claude / chatglm，默认按模型名称前缀判断
+        #     'weight': 3,  # weighted 策略下的权重
+        # },
+        # {
+        #     'name': 'gpt-backup',
+        #     'model_name': 'gpt-4o-mini',
+        #     'api_key': os.getenv("OPENAI_BACKUP_API_KEY"),
+        #     'weight': 1,
+        # },
+    ],
+    # 多后端路由(未指定模型名称的调用经过路由)
+    'router': {
+        'strategy': 'weighted',  # weighted: 按权重随机选择; latency: 选择最近 p95 延迟最低的后端
+        'failover': True,  # 出错时切换到下一个后端
+        'max_failover': 2,  # 最多切换次数
+        'latency_window': 200,  # 每个后端统计最近的调用次数
+        'min_samples': 20,  # 样本少于该值时 latency 策略优先探测该后端，也不按 p95 自动对冲
+        'hedge': False,  # 流式对话是否开启对冲请求(主后端首 token 过慢时同时请求备用后端)
+        'hedge_delay_ms': 0,  # 对冲延迟（毫秒），0 表示使用主后端首 token 延迟的 p95
+        'hedge_min_delay_ms': 200,  # 对冲延迟下限（毫秒）
+    },
+    # 大模型响应缓存(相同或相似的提示词直接返回缓存的响应，流式调用按流式重放)
+    'response_cache': {
+        'enabled': True,
+        'max_size': 1000,  # 最大缓存条目数，超过后淘汰最久未使用的条目
+        'ttl': 3600,  # 缓存过期时间（秒）
+        'semantic': False,  # 是否开启语义匹配(使用向量检索的编码模型计算提示词相似度)
+        'similarity_threshold': 0.95,  # 语义匹配的余弦相似度阈值
+        'replay_chunk_chars': 32,  # 流式重放时每个增量的字符数
+        # 按调用方开启缓存
+        'routes': {
+            'chat_stream': False,  # 知识库问答 /v1/chat/stream(检索上下文相同时才会命中，按需开启)
+            'create_position': True,  # 从文本中提取岗位信息
+            'interview_questions': False,  # 根据简历生成面试问题(简历各不相同，命中率低)
+        },
+    },
+}
+
+# 流式输出配置
+STREAM = {
+    'coalesce_chars': 64,  # 合并的增量达到该字符数时立即发送一帧
+    'coalesce_ms': 50,  # 增量最长等待时间（毫秒），0 表示每个增量单独发送
+    'flush_first': True,  # 第一个增量立即发送，不参与合并
+    'metrics_window': 500,  # 首 token 时间等指标统计最近的流式输出次数
 }
 
 # 安全配置
@@ -2,10 +2,12 @@ from ekbase.core.models.chat_request import ChatRequest
 from ekbase.core.models.mcp_server_request import MCPServerRequest
 from ekbase.core.models.prompt_process_model import PromptProcessModel
 from ekbase.core.models.generate_questions_request import GenerateQuestionsRequest
+from ekbase.core.models.search_request import SearchBatchRequest
 
 __all__ = [
     'ChatRequest',
     'MCPServerRequest',
     'PromptProcessModel',
-    'GenerateQuestionsRequest'
+    'GenerateQuestionsRequest',
+    'SearchBatchRequest'
 ]
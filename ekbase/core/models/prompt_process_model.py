@@ -9,7 +9,8 @@ class PromptProcessModel:
     # 最终结果
     final_result: str
 
-    def __init__(self, json_data: dict):
-        self.prompt = json_data.get("prompt")
-        self.is_end = json_data.get("is_end")
+    def __init__(self, json_data: dict = None):
+        json_data = json_data or {}
+        self.prompt = json_data.get("prompt") or ""
+        self.is_end = json_data.get("is_end") or False
         self.final_result = json_data.get("final_result")
@@ -0,0 +1,37 @@
+from datetime import datetime
+from typing import List, Optional, Dict, Any
+from pydantic import BaseModel
+
+class SearchFilters(BaseModel):
+    """检索过滤条件，各条件之间为"且"，同一条件的多个取值之间为"或\""""
+    # 文档ID
+    document_ids: Optional[List[str]] = None
+    # 文件类型，如 pdf / .docx
+    file_types: Optional[List[str]] = None
+    # 处理(向量化)时间范围
+    processed_after: Optional[datetime] = None
+    processed_before: Optional[datetime] = None
+    # 标签，文档包含任一标签即匹配
+    tags: Optional[List[str]] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'document_ids': self.document_ids,
+            'file_types': self.file_types,
+            'processed_after': self.processed_after,
+            'processed_before': self.processed_before,
+            'tags': self.tags
+        }
+
+class SearchRequest(BaseModel):
+    query: str
+    top_k: int = 5
+    filters: Optional[SearchFilters] = None
+
+class SearchBatchRequest(BaseModel):
+    queries: List[str]
+    top_k: int = 5
+    filters: Optional[SearchFilters] = None
+
+class DocumentTagsRequest(BaseModel):
+    tags: List[str]
@@ -1,5 +1,3 @@
-import asyncio
-import json
 from ekbase.core.models.chat_request import ChatRequest
 from ekbase.core.models.prompt_process_model import PromptProcessModel
 from ekbase.handler.handlerimpl.history_message_handler import HistoryMessageHandler
@@ -12,13 +10,24 @@ from datetime import datetime
 import uuid
 from ekbase.core.services.document_core_service import DocumentCoreService
 import logging
-from ekbase.config import LLM
+from ekbase.config import LLM, STREAM
 from common.utils.llm_utils import LLMUtils
+from common.utils.sse_utils import sse_event, coalesce_stream, StreamMetrics, StreamMetricsRecorder
 import os
 from typing import List, Dict, Any
 
 logger = logging.getLogger(__name__)
 
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "Connection": "keep-alive",
+    # 关闭反向代理(nginx)的响应缓冲，帧生成后立即到达客户端
+    "X-Accel-Buffering": "no"
+}
+
+# 进程内的流式输出指标汇总
+stream_metrics = StreamMetricsRecorder(STREAM.get('metrics_window', 500))
+
 class ChatService:
     def __init__(self):
         self.session_service = ChatSessionService()
@@ -32,6 +41,8 @@ class ChatService:
     
     async def process_stream_request(self, chat_request: ChatRequest):
         """处理聊天请求"""
+        # 从收到请求开始计时，首 token 时间包含检索和构建提示词的耗时
+        metrics = StreamMetrics()
         try:
             # 获取或创建会话
             session_id = chat_request.session_id
@@ -57,41 +68,53 @@ class ChatService:
                 else:
                     await self.create_new_chat_session(session_id, chat_request.query, process_model.final_result)
 
-                return StreamingResponse(
-                    generate(initial_content=process_model.final_result),
-                    media_type="text/event-stream",
-                    headers={"Cache-Control": "no-cache", "Connection": "keep-alive", "Transfer-Encoding": "chunked"}
-                )
+                async def generate_final():
+                    metrics.on_chunk(process_model.final_result or '')
+                    metrics.on_frame()
+                    yield sse_event({'content': process_model.final_result, 'session_id': session_id})
+                    metrics.finish()
+                    stream_metrics.record(metrics)
+                    yield sse_event({'content': '', 'session_id': session_id, 'done': True,
+                                     'metrics': metrics.to_dict()})
+
+                return StreamingResponse(generate_final(), media_type="text/event-stream", headers=SSE_HEADERS)
             
             # 用于保存完整响应
             full_response = ""
+
+            async def llm_chunks():
+                # 调用llm的异步流式输出方法，等待模型输出时不阻塞事件循环
+                async for chunk in self.llm.astream(
+                    messages=[
+                        # {"role": "system", "content": "你是一个专业的问答助手。请仅基于提供的上下文信息回答问题，不要添加任何未在上下文中提及的信息。如果没有相关信息，请明确告知用户无法回答该问题。"},
+                        {"role": "system", "content": "你是一个专业的问答助手。请优先基于提供的上下文信息回答问题，如果上下文信息不足，请根据用户的问题给出回答。"},
+                        {"role": "user", "content": prompt}
+                    ],
+                    cache_route='chat_stream'
+                ):
+                    if chunk:  # 确保chunk不为None
+                        metrics.on_chunk(chunk)
+                        yield chunk
             
-            # 创建stream响应    
+            # 创建stream响应: 细碎的增量按大小/时间窗口合并成帧后发送
             async def generate():
                 nonlocal full_response
+                error = False
                 try:
-                    # 调用llm的流式输出方法
-                    stream_response = self.llm.chat(
-                        messages=[
-                            # {"role": "system", "content": "你是一个专业的问答助手。请仅基于提供的上下文信息回答问题，不要添加任何未在上下文中提及的信息。如果没有相关信息，请明确告知用户无法回答该问题。"},
-                            {"role": "system", "content": "你是一个专业的问答助手。请优先基于提供的上下文信息回答问题，如果上下文信息不足，请根据用户的问题给出回答。"},
-                            {"role": "user", "content": prompt}
-                        ],
-                        stream=True
-                    )
-                    
-                    if stream_response is None:
-                        raise RuntimeError("流式响应为空")
-                    
-                    # 使用同步迭代器处理流式响应
-                    for chunk in stream_response:
-                        if chunk:  # 确保chunk不为None
-                            full_response += chunk
-                            yield f"{json.dumps({'content': chunk, 'session_id': session_id})}\n\n"
-                            await asyncio.sleep(0.01)  # 添加小延迟确保流式输出
+                    async for text in coalesce_stream(
+                        llm_chunks(),
+                        max_chars=STREAM.get('coalesce_chars', 64),
+                        max_delay=STREAM.get('coalesce_ms', 50) / 1000,
+                        flush_first=STREAM.get('flush_first', True)
+                    ):
+                        full_response += text
+                        metrics.on_frame()
+                        yield sse_event({'content': text, 'session_id': session_id})
                     
                     # 流式输出完成
-                    yield f"{json.dumps({'content': '', 'session_id': session_id, 'done': True})}\n\n"
+                    metrics.finish()
+                    yield sse_event({'content': '', 'session_id': session_id, 'done': True,
+                                     'metrics': metrics.to_dict()})
                     
                     # 响应完成后，将完整会话保存到数据库
                     if has_session:
@@ -100,23 +123,34 @@ class ChatService:
                         await self.create_new_chat_session(session_id, chat_request.query, full_response)
                         
                 except Exception as e:
+                    error = True
                     logger.error(f"流式处理失败: {str(e)}", exc_info=True)
                     error_msg = f"处理请求时发生错误: {str(e)}"
-                    yield f"data: {json.dumps({'content': error_msg, 'session_id': session_id, 'error': True})}\n\n"
+                    yield sse_event({'content': error_msg, 'session_id': session_id, 'error': True})
+                finally:
+                    if metrics.total is None:
+                        metrics.finish()
+                    stream_metrics.record(metrics, error=error)
+                    logger.info(f"流式输出结束: {session_id}, {metrics.to_dict()}")
             
-            return StreamingResponse(
-                generate(),
-                media_type="text/event-stream",
-                headers={
-                    "Cache-Control": "no-cache",
-                    "Connection": "keep-alive",
-                    "Transfer-Encoding": "chunked"
-                }
-            )
+            return StreamingResponse(generate(), media_type="text/event-stream", headers=SSE_HEADERS)
             
         except Exception as e:
             logger.error(f"处理聊天请求失败: {str(e)}", exc_info=True)
             raise RuntimeError(f"处理聊天请求失败: {str(e)}")
+
+    @staticmethod
+    def get_stream_metrics() -> Dict[str, Any]:
+        """最近的流式输出指标(首 token 时间分位数等)"""
+        return stream_metrics.stats()
+
+    def get_llm_metrics(self) -> Dict[str, Any]:
+        """大模型路由指标、各后端的重试和熔断指标、响应缓存指标"""
+        return {
+            "router": self.llm.router_stats(),
+            "resilience": self.llm.resilience_stats(),
+            "response_cache": self.llm.response_cache_stats()
+        }
     
     async def create_new_chat_session(self, session_id: str, query: str, response: str):
         """创建新的聊天会话"""
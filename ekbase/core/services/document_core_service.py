@@ -2,12 +2,21 @@ import uuid
 from ekbase.database.utils import Database
 from fastapi import UploadFile, HTTPException
 import os
-from ekbase.config import STORAGE
+import shutil
+from ekbase.config import STORAGE, INGEST, RERANK
 from datetime import datetime
 from ekbase.database.models.document import Document
 from ekbase.database.services.document_service import DocumentService
 from common.utils.vector_utils import VectorUtils
+from common.utils.chunk_utils import available_chunkers
+from common.exception import IndexNotReadyException, FileTooLargeException
+from common.utils.upload_utils import save_upload_file
+from common.utils.rerank_utils import Reranker
+import asyncio
+import functools
 import logging
+import threading
+from typing import List, Dict, Any, Optional
 
 logger = logging.getLogger(__name__)
 
@@ -15,6 +24,19 @@ class DocumentCoreService:
     _instance = None
     _document_index = {}
     _vector_utils = None
+    _vector_utils_lock = threading.Lock()
+    _reranker = None
+    _load_thread = None
+    # 后台加载状态: pending -> loading_model -> indexing -> ready / failed
+    _load_status = {
+        "state": "pending",
+        "total": 0,
+        "processed": 0,
+        "failed": 0,
+        "error": None,
+        "started_at": None,
+        "finished_at": None
+    }
 
     def __new__(cls):
         if cls._instance is None:
@@ -22,35 +44,101 @@ class DocumentCoreService:
         return cls._instance
 
     def __init__(self):
-        if self._vector_utils is None:
-            self._vector_utils = VectorUtils()
+        pass
+
+    def _ensure_vector_utils(self) -> VectorUtils:
+        """创建向量工具(加载模型和索引)"""
+        with self._vector_utils_lock:
+            if DocumentCoreService._vector_utils is None:
+                DocumentCoreService._vector_utils = VectorUtils()
+        return self._vector_utils
+
+    def _require_vector_utils(self) -> VectorUtils:
+        """
+        获取向量工具
+
+        未启动后台加载时同步创建；后台加载中模型尚未就绪时抛出 IndexNotReadyException
+        """
+        if self._vector_utils is not None:
+            return self._vector_utils
+        if self._load_thread is not None:
+            raise IndexNotReadyException("向量索引正在加载中，请稍后再试")
+        return self._ensure_vector_utils()
+
+    def _update_load_status(self, **kwargs):
+        DocumentCoreService._load_status = {**self._load_status, **kwargs}
+
+    def start_background_loading(self):
+        """
+        在后台线程中加载模型并向量化全部文档，服务可以立即开始处理请求
+        """
+        if self._load_thread is not None and self._load_thread.is_alive():
+            return
+        self._update_load_status(state="pending", error=None, started_at=datetime.now().isoformat(),
+                                 finished_at=None)
+        DocumentCoreService._load_thread = threading.Thread(target=self._warm_up, name="document-warm-up",
+                                                            daemon=True)
+        self._load_thread.start()
+
+    def _warm_up(self):
+        """后台加载任务"""
+        try:
+            self._update_load_status(state="loading_model")
+            self._ensure_vector_utils()
+            self._update_load_status(state="indexing")
+            self.load_documents()
+            self._update_load_status(state="ready", finished_at=datetime.now().isoformat())
+            logger.info("向量索引加载完成")
+        except Exception as e:
+            logger.error(f"向量索引后台加载失败: {str(e)}", exc_info=True)
+            self._update_load_status(state="failed", error=str(e), finished_at=datetime.now().isoformat())
+
+    @property
+    def is_ready(self) -> bool:
+        """向量索引是否可用于检索"""
+        if self._load_thread is None:
+            return True
+        return self._load_status["state"] == "ready"
+
+    def get_load_status(self) -> Dict[str, Any]:
+        """
+        获取后台加载进度
+        """
+        return dict(self._load_status, ready=self.is_ready)
 
     def load_documents(self):
+        """
+        加载全部文档并向量化: 并行解析分块, 跨文件批量生成向量, 最后统一保存一次索引
+        """
         try:
             logger.info("开始加载文档")
             document_service = DocumentService()
             documents = document_service.list_all(with_file_path=True)
-            
+
+            file_paths = []
             for document in documents:
-                try:
-                    logger.info(f"处理文档: {document.id}")
-                    self._document_index[document.id] = document
-                    
-                    # 检查文件是否存在
-                    if not os.path.exists(document.file_path):
-                        logger.warning(f"文件不存在: {document.file_path}")
-                        continue
-                        
-                    # 处理文件向量化
-                    logger.info(f"开始向量化文件: {document.file_path}")
-                    self._vector_utils.process_file(document.file_path)
-                    logger.info(f"文件向量化完成: {document.file_path}")
-                    
-                except Exception as e:
-                    logger.error(f"处理文档 {document.id} 时出错: {str(e)}")
+                self._document_index[document.id] = document
+                # 检查文件是否存在
+                if not os.path.exists(document.file_path):
+                    logger.warning(f"文件不存在: {document.file_path}")
                     continue
-                    
-            logger.info("文档加载完成")
+                file_paths.append(document.file_path)
+
+            logger.info(f"开始向量化文件: {len(file_paths)} 个")
+            self._update_load_status(total=len(file_paths), processed=0, failed=0)
+
+            def on_progress(file_path: str, error: Optional[str]):
+                if error:
+                    self._update_load_status(failed=self._load_status["failed"] + 1)
+                else:
+                    self._update_load_status(processed=self._load_status["processed"] + 1)
+
+            summary = self._require_vector_utils().process_files(file_paths, progress_callback=on_progress)
+            for file_path, error in summary["failed"].items():
+                logger.error(f"处理文件 {file_path} 时出错: {error}")
+
+            logger.info(f"文档加载完成，新处理: {len(summary['processed'])}，跳过: {len(summary['skipped'])}，"
+                        f"失败: {len(summary['failed'])}")
             
         except Exception as e:
             logger.error(f"加载文档失败: {str(e)}")
@@ -61,8 +149,8 @@ class DocumentCoreService:
         return self._document_index
     
     def reload_index(self):
-        """重建索引"""
-        self._vector_utils.delete_all_indexes()
+        """重建索引, 内容未变化的分块复用向量缓存, 只对新增或变化的分块生成向量"""
+        self._require_vector_utils().delete_all_indexes()
         self.load_documents()
     
     def add_document(self, document: Document):
@@ -76,53 +164,121 @@ class DocumentCoreService:
                 
             # 处理文件向量化
             logger.info(f"开始向量化文件: {document.file_path}")
-            self._vector_utils.process_file(document.file_path)
+            self._require_vector_utils().process_file(document.file_path)
             logger.info(f"文件向量化完成: {document.file_path}")
             
         except Exception as e:
             logger.error(f"添加文档失败: {str(e)}")
             raise
 
-    async def upload_document(self, file: UploadFile):
+    def find_document_by_hash(self, file_hash: str) -> Optional[Document]:
         """
-        上传文档, 并保存到磁盘, 并保存到数据库, 并重建索引
-        
+        按内容哈希查找已入库的文档
+
         Args:
-            file: 上传的文件
-            
+            file_hash: 文件内容的SHA-256哈希
+
         Returns:
-            Document: 上传的文档
+            Document: 已入库的文档，不存在时返回 None
         """
-        if not file.filename.endswith((".txt", ".pdf", ".docx")):
-            raise HTTPException(status_code=400, detail="仅支持.txt或.pdf或.docx文件")
-        
-        document_dir = STORAGE['documents']
-        # 确保docs目录存在
-        os.makedirs(document_dir, exist_ok=True)
-        today_str = datetime.now().strftime("%Y%m%d")
+        file_path = self._require_vector_utils().find_file_by_hash(file_hash)
+        if not file_path or not os.path.exists(file_path):
+            return None
+        return DocumentService().get_by_file_path(file_path)
 
-        # 判断是否存在以当天日期命名的文件夹
-        today_dir = os.path.join(document_dir, today_str)
+    def allocate_file_path(self, file_name: str):
+        """
+        在当天的文档目录下为上传文件分配保存路径，文件名重复时添加时间戳
+
+        Args:
+            file_name: 上传的文件名
+
+        Returns:
+            (文件路径, 最终文件名)
+        """
+        # 以当天日期命名的文件夹
+        today_dir = os.path.join(STORAGE['documents'], datetime.now().strftime("%Y%m%d"))
         os.makedirs(today_dir, exist_ok=True)
-        
-        file_path = os.path.join(today_dir, file.filename)
+
+        final_file_name = os.path.basename(file_name)
+        file_path = os.path.join(today_dir, final_file_name)
         # 检查文件名是否重复，如果重复则添加时间戳
         if os.path.exists(file_path):
-            timestamp = datetime.now().strftime("%H%M%S")
-            filename, extension = os.path.splitext(file.filename)
-            file_path = os.path.join("docs", f"{filename}_{timestamp}{extension}")
-            final_file_name = f"{filename}_{timestamp}{extension}"
-        else:
-            final_file_name = file.filename
+            filename, extension = os.path.splitext(final_file_name)
+            final_file_name = f"{filename}_{datetime.now().strftime('%H%M%S%f')}{extension}"
+            file_path = os.path.join(today_dir, final_file_name)
+        return file_path, final_file_name
+
+    async def upload_document(self, file: UploadFile, chunker: Optional[str] = None,
+                              tags: Optional[List[str]] = None):
+        """
+        上传文档, 并保存到磁盘, 并保存到数据库, 并重建索引
         
-        # 读取文件内容
-        file_content = file.file.read()
-        # 保存文件到磁盘
-        logger.debug(f"开始保存文件到磁盘: {file_path}")
-        with open(file_path, "wb") as f:
-            f.write(file_content)
-        logger.debug(f"文件保存完成: {file_path}")
-        # 存储文件相关信息到数据库
+        Args:
+            file: 上传的文件
+            chunker: 分块器名称(fixed / sentence)，默认按文件类型使用 CHUNKING 配置
+            tags: 文档标签，检索时可按标签过滤
+            
+        Returns:
+            dict: 文档信息，duplicate 表示内容与已有文档相同(此时返回已有文档，本次标签合并到已有文档)，tags 为文档当前标签
+        """
+        allowed_extensions = INGEST.get('allowed_extensions', ())
+        if os.path.splitext(file.filename)[1].lower() not in allowed_extensions:
+            raise HTTPException(status_code=400, detail=f"仅支持{'或'.join(allowed_extensions)}文件")
+        if chunker and chunker not in available_chunkers():
+            raise HTTPException(status_code=400, detail=f"不支持的分块器: {chunker}，可选: {', '.join(available_chunkers())}")
+        # 索引加载完成前不接收新文档
+        vector_utils = self._require_vector_utils()
+
+        # 先分块写入临时文件并计算内容哈希，超过大小限制时立即中止
+        os.makedirs(STORAGE['temp'], exist_ok=True)
+        temp_path = os.path.join(STORAGE['temp'], f"upload_{uuid.uuid4().hex}")
+        try:
+            try:
+                _, file_hash = await save_upload_file(
+                    file, temp_path,
+                    max_bytes=INGEST.get('max_upload_mb', 100) * 1024 * 1024,
+                    chunk_size=INGEST.get('copy_buffer_size', 1024 * 1024)
+                )
+            except FileTooLargeException as e:
+                raise HTTPException(status_code=413, detail=f"{file.filename}: {e.message}")
+
+            # 内容相同的文档已入库时不再重复向量化，本次的标签合并到已有文档(分块器不会重新应用)
+            if INGEST.get('dedupe_uploads', True):
+                existing = self.find_document_by_hash(file_hash)
+                if existing is not None:
+                    merged_tags = self.merge_document_tags(existing.file_path, tags)
+                    logger.info(f"上传内容与已有文档相同，跳过向量化: {file.filename} -> {existing.id}")
+                    return {
+                        **existing.to_dict(),
+                        "duplicate": True,
+                        "tags": merged_tags,
+                        "message": "内容与已有文档相同，标签已合并到已有文档，未重新分块"
+                    }
+
+            file_path, final_file_name = self.allocate_file_path(file.filename)
+            logger.debug(f"保存文件到磁盘: {file_path}")
+            shutil.move(temp_path, file_path)
+        finally:
+            # 超限、重复或保存失败时删除临时文件
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+        # 向量化新文件(只处理一次)，解析和编码在线程池中执行，不阻塞事件循环
+        logger.debug(f"开始向量化文件: {file_path}")
+        try:
+            await asyncio.get_running_loop().run_in_executor(
+                None, functools.partial(vector_utils.process_file, file_path, chunker=chunker)
+            )
+        except Exception:
+            os.remove(file_path)
+            raise
+        if not vector_utils.is_file_processed(file_path):
+            # 没有产生向量的文件不登记为文档，否则之后无法删除
+            os.remove(file_path)
+            raise HTTPException(status_code=400, detail=f"{file.filename}: 文件内容为空或无法提取文本")
+
+        # 向量化成功后再存储文件相关信息到数据库
         document = Document(
             id=str(uuid.uuid4()),
             file_name=final_file_name,
@@ -132,36 +288,183 @@ class DocumentCoreService:
         document_service = DocumentService()
         document_service.create(document)
         logger.debug(f"文件信息存储到数据库: {document.id}")
-        # 更新_document_index
-        logger.debug(f"开始更新_document_index: {document.id}")
-        self.add_document(document)
-        logger.debug(f"_document_index更新完成: {document.id}")
-
-        # 重建索引
-        logger.debug(f"开始重建索引: {document.id}")
-        self._vector_utils.process_file(file_path)
-        logger.debug(f"索引重建完成: {document.id}")
+        self._document_index[document.id] = document
+        if tags:
+            vector_utils.set_file_tags(file_path, tags)
+        logger.debug(f"文件向量化完成: {document.id}")
+        return {
+            **document.to_dict(),
+            "duplicate": False,
+            "tags": vector_utils.get_file_tags(file_path)
+        }
+
+    def _get_document(self, document_id: str) -> Optional[Document]:
+        document = self._document_index.get(document_id)
+        if document is None:
+            try:
+                document = DocumentService().get_by_id(document_id)
+            except Exception:
+                return None
         return document
 
-    def search_document(self, query: str, top_k: int = 5):
+    def resolve_search_filters(self, filters: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """
+        将接口的过滤条件转换为向量库的过滤条件: 文档ID转换为文件路径，时间转换为ISO格式，文件类型补全"."
+
+        Args:
+            filters: document_ids / file_types / processed_after / processed_before / tags
+
+        Returns:
+            dict: VectorUtils.search_batch 的 filters 参数，没有任何条件时返回 None
+        """
+        if not filters:
+            return None
+        resolved = {}
+        if filters.get('document_ids') is not None:
+            # 不存在的文档ID忽略，全部不存在时结果为空
+            documents = [self._get_document(document_id) for document_id in filters['document_ids']]
+            resolved['file_paths'] = [document.file_path for document in documents if document is not None]
+        if filters.get('file_types') is not None:
+            resolved['file_types'] = [
+                file_type.lower() if file_type.startswith('.') else f".{file_type.lower()}"
+                for file_type in filters['file_types']
+            ]
+        for key in ('processed_after', 'processed_before'):
+            value = filters.get(key)
+            if value is not None:
+                resolved[key] = value.isoformat() if isinstance(value, datetime) else str(value)
+        if filters.get('tags') is not None:
+            resolved['tags'] = list(filters['tags'])
+        return resolved or None
+
+    def merge_document_tags(self, file_path: str, tags: Optional[List[str]]) -> List[str]:
+        """
+        把标签合并到已入库的文档(保留原有标签)，重复上传的文件使用
+
+        Returns:
+            List[str]: 合并后的标签
+        """
+        vector_utils = self._require_vector_utils()
+        existing_tags = vector_utils.get_file_tags(file_path)
+        if tags and not set(tags) <= set(existing_tags):
+            vector_utils.set_file_tags(file_path, existing_tags + list(tags))
+        return vector_utils.get_file_tags(file_path)
+
+    def set_document_tags(self, document_id: str, tags: List[str]) -> List[str]:
+        """
+        设置文档标签(覆盖原有标签)
+
+        Returns:
+            List[str]: 设置后的标签
+        """
+        document = self._get_document(document_id)
+        if document is None:
+            raise HTTPException(status_code=404, detail=f"文档不存在: {document_id}")
+        vector_utils = self._require_vector_utils()
+        vector_utils.set_file_tags(document.file_path, tags)
+        return vector_utils.get_file_tags(document.file_path)
+
+    def search_document(self, query: str, top_k: int = 5, filters: Optional[Dict[str, Any]] = None):
         """
         搜索文档
 
         Args:
             query: 搜索关键词
             top_k: 返回结果数量
+            filters: 过滤条件，见 resolve_search_filters
             
         Returns:
             List[Document]: 搜索结果
         """
+        if not self.is_ready:
+            logger.warning("向量索引尚未加载完成，跳过向量检索")
+            return []
         try:
             logger.debug(f"开始搜索文档: {query}")
-            results = self._vector_utils.search(query, top_k)
+            results = self._require_vector_utils().search(query, top_k, self.resolve_search_filters(filters))
             return results
         except Exception as e:
             logger.error(f"搜索文档失败: {str(e)}")
             raise
 
+    def search_documents_batch(self, queries: List[str], top_k: int = 5, filters: Optional[Dict[str, Any]] = None):
+        """
+        批量搜索文档，适用于查询改写、子问题拆分等一次请求多路召回的场景
+
+        Args:
+            queries: 搜索关键词列表
+            top_k: 每个关键词返回结果数量
+            filters: 过滤条件，见 resolve_search_filters
+
+        Returns:
+            List[List[dict]]: 与 queries 顺序一致的搜索结果
+        """
+        if not self.is_ready:
+            logger.warning("向量索引尚未加载完成，跳过向量检索")
+            return [[] for _ in queries]
+        try:
+            logger.debug(f"开始批量搜索文档: {len(queries)} 个查询")
+            return self._require_vector_utils().search_batch(queries, top_k, self.resolve_search_filters(filters))
+        except Exception as e:
+            logger.error(f"批量搜索文档失败: {str(e)}")
+            raise
+
+    async def asearch_document(self, query: str, top_k: int = 5, timeout: Optional[float] = None,
+                               filters: Optional[Dict[str, Any]] = None):
+        """
+        异步搜索文档，检索在有界线程池中执行，不阻塞事件循环
+
+        Args:
+            query: 搜索关键词
+            top_k: 返回结果数量
+            timeout: 超时时间(秒)，默认使用 VECTOR_DB['search_timeout']
+            filters: 过滤条件，见 resolve_search_filters
+
+        Raises:
+            ServiceOverloadedException: 检索队列已满
+            OperationTimeoutException: 检索超时
+        """
+        if not self.is_ready:
+            logger.warning("向量索引尚未加载完成，跳过向量检索")
+            return []
+        logger.debug(f"开始异步搜索文档: {query}")
+        return await self._require_vector_utils().asearch(query, top_k, timeout, self.resolve_search_filters(filters))
+
+    @property
+    def reranker(self) -> Optional[Reranker]:
+        """
+        重排序器，未启用时返回 None；模型在第一次打分时(重排序线程中)加载
+        """
+        if not RERANK.get('enabled', False):
+            return None
+        with self._vector_utils_lock:
+            if DocumentCoreService._reranker is None:
+                DocumentCoreService._reranker = Reranker(
+                    RERANK['model_name'],
+                    STORAGE['models'],
+                    backend=RERANK.get('backend', 'torch'),
+                    quantize=RERANK.get('quantize', False),
+                    batch_size=RERANK.get('batch_size', 32),
+                    max_length=RERANK.get('max_length', 512),
+                    cache_size=RERANK.get('cache_size', 4096),
+                    cache_ttl=RERANK.get('cache_ttl', 3600),
+                    workers=RERANK.get('workers', 1),
+                    max_pending=RERANK.get('max_pending', 8)
+                )
+        return self._reranker
+
+    async def asearch_documents_batch(self, queries: List[str], top_k: int = 5, timeout: Optional[float] = None,
+                                      filters: Optional[Dict[str, Any]] = None):
+        """
+        异步批量搜索文档，参数和返回值同 search_documents_batch
+        """
+        if not self.is_ready:
+            logger.warning("向量索引尚未加载完成，跳过向量检索")
+            return [[] for _ in queries]
+        logger.debug(f"开始异步批量搜索文档: {len(queries)} 个查询")
+        return await self._require_vector_utils().asearch_batch(queries, top_k, timeout,
+                                                                self.resolve_search_filters(filters))
+
     def delete_document(self, document_id: str):
         """
         删除文档
@@ -169,8 +472,9 @@ class DocumentCoreService:
         document_service = DocumentService()
         try:
             document = document_service.get_by_id(document_id)
+            vector_utils = self._require_vector_utils()
             document_service.delete(document_id)
-            self._vector_utils.delete_file(document.file_path)
+            vector_utils.delete_file(document.file_path)
         except Exception as e:
             logger.error(f"删除文件失败: {e}")
             raise e
@@ -186,13 +490,17 @@ class DocumentCoreService:
         """
         获取索引状态
         """
-        return self._vector_utils.get_index_status()
+        status = {"load_status": self.get_load_status()}
+        if self._vector_utils is not None:
+            status.update(self._vector_utils.get_index_status())
+        if self._reranker is not None:
+            status["reranker"] = self._reranker.stats()
+        return status
 
     def reset_index(self, document_id: str):
         """
-        重置索引
+        重置索引, 原地替换该文档的向量
         """
-        self._vector_utils.delete_file(document_id, remove_file=False)
         document_service = DocumentService()
         document = document_service.get_by_id(document_id)
-        self._vector_utils.process_file(document.file_path)
+        self._require_vector_utils().process_file(document.file_path, force=True)
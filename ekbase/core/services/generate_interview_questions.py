@@ -1,15 +1,19 @@
 import json
 import io
-import PyPDF2
 import logging
 from common.utils.llm_utils import LLMUtils
-from ekbase.config.settings import LLM
+from common.utils.file_utils import iter_pdf_pages, configure_parsing
+from ekbase.config.settings import LLM, PARSING
 
 logger = logging.getLogger(__name__)
 
 class GenerateInterviewQuestionsService:
     def __init__(self):
         self.llm = LLMUtils(LLM)
+        configure_parsing(
+            pdf_workers=PARSING.get('pdf_workers'),
+            pdf_parallel_min_pages=PARSING.get('pdf_parallel_min_pages')
+        )
 
     # 从PDF二进制数据中提取文本内容
     def extract_text_from_pdf(self, pdf_content):
@@ -18,17 +22,8 @@ class GenerateInterviewQuestionsService:
             if pdf_content is None or pdf_content == b'':
                 return "无简历内容"
                 
-            # 创建BytesIO对象处理二进制数据
-            pdf_file = io.BytesIO(pdf_content)
-            
-            # 创建PDF阅读器
-            pdf_reader = PyPDF2.PdfReader(pdf_file)
-            
-            # 提取所有页面的文本
-            text = ""
-            for page_num in range(len(pdf_reader.pages)):
-                page = pdf_reader.pages[page_num]
-                text += page.extract_text() + "\n"
+            # 逐页提取文本，简历含个人信息，不写入解析缓存
+            text = "\n".join(iter_pdf_pages(pdf_content, use_cache=False))
             
             # 如果没有提取到文本，尝试使用另一种方法
             if not text.strip():
@@ -108,13 +103,14 @@ class GenerateInterviewQuestionsService:
         ]
         # 调用OpenAI API生成面试问题
         try:
-            response = self.llm.chat(
+            # 异步调用，重试退避期间不阻塞事件循环
+            response = await self.llm.achat(
                 messages=[
                     {"role": "system", "content": "你是一名专业的招聘面试官，请根据岗位要求和候选人简历生成10个针对性的技术面试问题，每个问题附带评分标准,返回标准的json格式。"},
                     {"role": "user", "content": f"岗位名称: {position_name}\n岗位要求: {requirements}\n岗位职责: {responsibilities}\n候选人简历: {resume_text}\n\n请生成{question_count}个面试问题和评分标准，JSON格式参考 {json_format} ，每个问题满分10分。"}
                 ],
                 response_format={"type": "json_object"},
-                stream = False
+                cache_route='interview_questions'
             )
             
             # 解析响应内容
@@ -0,0 +1,351 @@
+import os
+import uuid
+import shutil
+import zipfile
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Tuple
+
+from fastapi import UploadFile, HTTPException
+
+from ekbase.config import STORAGE, INGEST
+from ekbase.database.models.document import Document
+from ekbase.database.services.document_service import DocumentService
+from ekbase.core.services.document_core_service import DocumentCoreService
+from common.utils.chunk_utils import available_chunkers
+from common.utils.file_utils import compute_file_hash
+from common.utils.upload_utils import save_upload_file
+from common.exception import FileTooLargeException
+
+logger = logging.getLogger(__name__)
+
+
+class IngestJobService:
+    """
+    批量导入任务
+
+    上传请求只负责把文件保存到临时目录并登记任务，解析、分块、向量化在后台任务线程中
+    通过 VectorUtils.process_files 完成(进程池并行解析，跨文件批量生成向量)，
+    调用方按任务ID查询进度。任务状态: pending -> running -> completed / failed
+    """
+    _instance = None
+    _jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+    _jobs_lock = threading.Lock()
+    _executor: Optional[ThreadPoolExecutor] = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(IngestJobService, cls).__new__(cls)
+            cls._executor = ThreadPoolExecutor(max_workers=INGEST.get('job_workers', 1),
+                                               thread_name_prefix="ingest-job")
+        return cls._instance
+
+    def __init__(self):
+        pass
+
+    @staticmethod
+    def _is_allowed(file_name: str) -> bool:
+        return os.path.splitext(file_name)[1].lower() in INGEST.get('allowed_extensions', ())
+
+    @staticmethod
+    def _zip_member_name(info: zipfile.ZipInfo) -> str:
+        """压缩包内的文件名，未标记UTF-8编码的文件名按GBK解码(Windows下创建的压缩包)"""
+        name = info.filename
+        if not info.flag_bits & 0x800:
+            try:
+                name = name.encode('cp437').decode('gbk')
+            except (UnicodeEncodeError, UnicodeDecodeError):
+                pass
+        return name
+
+    def _update_job(self, job_id: str, **kwargs):
+        with self._jobs_lock:
+            self._jobs[job_id].update(kwargs)
+
+    def _add_job(self, job: Dict[str, Any]):
+        with self._jobs_lock:
+            self._jobs[job["id"]] = job
+            # 只保留最近的任务记录，不淘汰未结束的任务
+            retention = INGEST.get('job_retention', 100)
+            for job_id in list(self._jobs.keys()):
+                if len(self._jobs) <= retention:
+                    break
+                if self._jobs[job_id]["state"] in ("completed", "failed"):
+                    del self._jobs[job_id]
+
+    async def submit(self, files: List[UploadFile], chunker: Optional[str] = None,
+                     tags: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        保存上传的文件(支持 .zip 压缩包)并提交后台导入任务
+
+        Args:
+            files: 上传的文件列表
+            chunker: 分块器名称(fixed / sentence)，默认按文件类型使用 CHUNKING 配置
+            tags: 本次导入的全部文档共用的标签
+
+        Returns:
+            dict: 任务信息
+        """
+        if not files:
+            raise HTTPException(status_code=400, detail="没有上传文件")
+        if chunker and chunker not in available_chunkers():
+            raise HTTPException(status_code=400, detail=f"不支持的分块器: {chunker}，可选: {', '.join(available_chunkers())}")
+        for file in files:
+            if not (file.filename.lower().endswith('.zip') or self._is_allowed(file.filename)):
+                raise HTTPException(status_code=400, detail=f"不支持的文件类型: {file.filename}")
+        # 索引加载完成前不接收新文档
+        DocumentCoreService()._require_vector_utils()
+
+        job_id = str(uuid.uuid4())
+        upload_dir = os.path.join(STORAGE['temp'], f"ingest_{job_id}")
+        os.makedirs(upload_dir, exist_ok=True)
+        uploads = []
+        try:
+            for index, file in enumerate(files):
+                # 临时文件名加序号，避免同名文件互相覆盖；压缩包使用单独的大小上限
+                temp_path = os.path.join(upload_dir, f"{index}_{os.path.basename(file.filename)}")
+                max_bytes = INGEST.get('max_archive_mb', 1024) * 1024 * 1024 \
+                    if file.filename.lower().endswith('.zip') \
+                    else INGEST.get('max_upload_mb', 100) * 1024 * 1024
+                await save_upload_file(file, temp_path, max_bytes=max_bytes,
+                                       chunk_size=INGEST.get('copy_buffer_size', 1024 * 1024))
+                uploads.append((file.filename, temp_path))
+        except FileTooLargeException as e:
+            shutil.rmtree(upload_dir, ignore_errors=True)
+            raise HTTPException(status_code=413, detail=f"{file.filename}: {e.message}")
+        except Exception:
+            shutil.rmtree(upload_dir, ignore_errors=True)
+            raise
+
+        job = {
+            "id": job_id,
+            "state": "pending",
+            "chunker": chunker,
+            "tags": list(tags or []),
+            "total": 0,
+            "done": 0,
+            "processed": 0,
+            "skipped": 0,
+            "failed": 0,
+            "errors": {},
+            "duplicates": {},
+            "skipped_files": {},
+            "documents": [],
+            "created_at": datetime.now().isoformat(),
+            "started_at": None,
+            "finished_at": None,
+            "error": None
+        }
+        self._add_job(job)
+        self._executor.submit(self._run, job_id, upload_dir, uploads, chunker, tags)
+        logger.info(f"批量导入任务已提交: {job_id}，上传文件 {len(uploads)} 个")
+        return self.get_job(job_id)
+
+    @staticmethod
+    def _extract_member(archive: zipfile.ZipFile, info: zipfile.ZipInfo, member_path: str, max_bytes: int) -> int:
+        """
+        解压单个文件，按实际写入的字节数检查大小(不信任压缩包中记录的大小)
+
+        Returns:
+            int: 解压后的大小
+
+        Raises:
+            FileTooLargeException: 超过大小上限，已删除写入的部分
+        """
+        buffer_size = INGEST.get('copy_buffer_size', 1024 * 1024)
+        size = 0
+        try:
+            with archive.open(info) as source, open(member_path, "wb") as target:
+                while True:
+                    block = source.read(buffer_size)
+                    if not block:
+                        break
+                    size += len(block)
+                    if size > max_bytes:
+                        raise FileTooLargeException(f"解压后超过大小上限 {max_bytes // (1024 * 1024)}MB")
+                    target.write(block)
+        except Exception:
+            if os.path.exists(member_path):
+                os.remove(member_path)
+            raise
+        return size
+
+    def _collect_files(self, job_id: str, upload_dir: str, uploads: List[Tuple[str, str]]) -> List[Tuple[str, str]]:
+        """
+        展开压缩包，返回 (原始文件名, 临时文件路径) 列表
+
+        解压每个文件前检查单个文件大小、解压总大小和文件数，超过单个文件上限的文件跳过并记录错误，
+        超过总大小或文件数上限时整个任务失败
+
+        Raises:
+            ValueError: 文件数或解压总大小超过上限
+        """
+        max_files = INGEST.get('max_files_per_job', 10000)
+        max_member_bytes = INGEST.get('max_upload_mb', 100) * 1024 * 1024
+        max_extracted_bytes = INGEST.get('max_extracted_mb', 4096) * 1024 * 1024
+        extracted_bytes = 0
+        collected = []
+
+        def check_count():
+            if len(collected) >= max_files:
+                raise ValueError(f"单个任务最多导入 {max_files} 个文件")
+
+        for file_name, temp_path in uploads:
+            if not file_name.lower().endswith('.zip'):
+                check_count()
+                collected.append((os.path.basename(file_name), temp_path))
+                continue
+            try:
+                with zipfile.ZipFile(temp_path) as archive:
+                    extract_dir = f"{temp_path}_files"
+                    os.makedirs(extract_dir, exist_ok=True)
+                    for index, info in enumerate(archive.infolist()):
+                        # 只取文件名，忽略压缩包内的目录结构，防止解压到目录之外
+                        member_name = os.path.basename(self._zip_member_name(info))
+                        if info.is_dir() or not member_name or member_name.startswith('.') \
+                                or '__MACOSX' in info.filename or not self._is_allowed(member_name):
+                            continue
+                        check_count()
+                        error_key = f"{os.path.basename(file_name)}/{member_name}"
+                        if info.file_size > max_member_bytes:
+                            with self._jobs_lock:
+                                self._jobs[job_id]["errors"][error_key] = \
+                                    f"文件超过大小上限 {max_member_bytes // (1024 * 1024)}MB"
+                            continue
+                        if extracted_bytes + info.file_size > max_extracted_bytes:
+                            raise ValueError(f"压缩包解压后超过总大小上限 {max_extracted_bytes // (1024 * 1024)}MB")
+                        member_path = os.path.join(extract_dir, f"{index}_{member_name}")
+                        # 压缩包中记录的大小可能与实际不符，按剩余额度限制实际解压的字节数
+                        limit = min(max_member_bytes, max_extracted_bytes - extracted_bytes)
+                        try:
+                            extracted_bytes += self._extract_member(archive, info, member_path, limit)
+                        except FileTooLargeException as e:
+                            with self._jobs_lock:
+                                self._jobs[job_id]["errors"][error_key] = e.message
+                            continue
+                        collected.append((member_name, member_path))
+            except zipfile.BadZipFile:
+                with self._jobs_lock:
+                    self._jobs[job_id]["errors"][file_name] = "压缩包格式错误"
+        return collected
+
+    def _run(self, job_id: str, upload_dir: str, uploads: List[Tuple[str, str]], chunker: Optional[str],
+             tags: Optional[List[str]] = None):
+        """后台执行导入任务"""
+        self._update_job(job_id, state="running", started_at=datetime.now().isoformat())
+        document_core_service = DocumentCoreService()
+        document_service = DocumentService()
+        vector_utils = document_core_service._require_vector_utils()
+        try:
+            files = self._collect_files(job_id, upload_dir, uploads)
+            with self._jobs_lock:
+                job = self._jobs[job_id]
+                job["total"] = len(files)
+                job["failed"] = len(job["errors"])
+
+            # 移动到文档目录，处理成功后再登记到数据库
+            documents: Dict[str, Document] = {}
+            seen_hashes: Dict[str, str] = {}
+            dedupe = INGEST.get('dedupe_uploads', True)
+            for file_name, temp_path in files:
+                if dedupe:
+                    # 与已入库文档或本任务中其他文件内容相同时跳过
+                    file_hash = compute_file_hash(temp_path)
+                    existing = document_core_service.find_document_by_hash(file_hash)
+                    duplicate_of = existing.id if existing else seen_hashes.get(file_hash)
+                    if duplicate_of:
+                        os.remove(temp_path)
+                        if existing is not None:
+                            # 与单个上传一致，本任务的标签合并到已有文档(本任务中的重复文件登记时会设置相同的标签)
+                            document_core_service.merge_document_tags(existing.file_path, tags)
+                        with self._jobs_lock:
+                            job = self._jobs[job_id]
+                            job["duplicates"][file_name] = duplicate_of
+                            job["done"] += 1
+                        continue
+                file_path, final_file_name = document_core_service.allocate_file_path(file_name)
+                shutil.move(temp_path, file_path)
+                documents[file_path] = Document(
+                    id=str(uuid.uuid4()),
+                    file_name=final_file_name,
+                    file_path=file_path,
+                    created_at=datetime.now()
+                )
+                if dedupe:
+                    seen_hashes[file_hash] = documents[file_path].id
+
+            def on_progress(file_path: str, error: Optional[str]):
+                document = documents[file_path]
+                with self._jobs_lock:
+                    job = self._jobs[job_id]
+                    job["done"] += 1
+                    if error:
+                        job["failed"] += 1
+                        job["errors"][document.file_name] = error
+                if not error and not vector_utils.is_file_processed(file_path):
+                    # 内容为空或提取不出文本的文件没有向量，不登记为文档，计入跳过
+                    with self._jobs_lock:
+                        self._jobs[job_id]["skipped_files"][document.file_name] = "文件内容为空或无法提取文本"
+                if error or not vector_utils.is_file_processed(file_path):
+                    # 处理失败或没有向量的文件不登记，避免每次启动重复处理
+                    if os.path.exists(file_path):
+                        os.remove(file_path)
+                    return
+                document_service.create(document)
+                document_core_service.document_index[document.id] = document
+                if tags:
+                    vector_utils.set_file_tags(file_path, tags)
+                with self._jobs_lock:
+                    job = self._jobs[job_id]
+                    job["documents"].append(document.id)
+
+            summary = vector_utils.process_files(
+                list(documents.keys()), chunker=chunker, progress_callback=on_progress
+            )
+            with self._jobs_lock:
+                duplicates = len(self._jobs[job_id]["duplicates"])
+            self._update_job(job_id, state="completed", processed=len(summary["processed"]),
+                             skipped=len(summary["skipped"]) + duplicates, finished_at=datetime.now().isoformat())
+            logger.info(f"批量导入任务完成: {job_id}，成功: {len(summary['processed'])}，"
+                        f"跳过: {len(summary['skipped'])}，失败: {len(summary['failed'])}")
+        except Exception as e:
+            logger.error(f"批量导入任务失败: {job_id}, {str(e)}", exc_info=True)
+            self._update_job(job_id, state="failed", error=str(e), finished_at=datetime.now().isoformat())
+        finally:
+            shutil.rmtree(upload_dir, ignore_errors=True)
+
+    def get_job(self, job_id: str) -> Dict[str, Any]:
+        """
+        获取任务进度
+
+        Raises:
+            HTTPException: 任务不存在
+        """
+        with self._jobs_lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                raise HTTPException(status_code=404, detail=f"任务不存在: {job_id}")
+            job = {**job, "errors": dict(job["errors"]), "duplicates": dict(job["duplicates"]),
+                   "skipped_files": dict(job["skipped_files"]),
+                   "documents": list(job["documents"]), "tags": list(job["tags"])}
+        if job["state"] == "completed":
+            job["progress"] = 1.0
+        else:
+            job["progress"] = round(job["done"] / job["total"], 4) if job["total"] else 0.0
+        return job
+
+    def list_jobs(self) -> List[Dict[str, Any]]:
+        """列出最近的任务(不含文件明细)"""
+        with self._jobs_lock:
+            job_ids = list(self._jobs.keys())
+        jobs = []
+        for job_id in reversed(job_ids):
+            job = self.get_job(job_id)
+            job.pop("documents")
+            job["errors"] = len(job["errors"])
+            job["duplicates"] = len(job["duplicates"])
+            jobs.append(job)
+        return jobs
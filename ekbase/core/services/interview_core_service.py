@@ -6,6 +6,7 @@ import uuid
 import asyncio
 import threading
 from common.utils.llm_utils import LLMUtils
+from common.utils.http_utils import aclose_async_http_client
 from ekbase.config.settings import LLM,STORAGE
 from ekbase.database.models.interview import Interview
 from ekbase.database.services.interview_service import InterviewService
@@ -61,9 +62,10 @@ class InterviewCoreService:
             "link": "职位链接"
         }}
         """
-        response = self.llm.chat(
+        # 异步调用，重试退避期间不阻塞事件循环
+        response = await self.llm.achat(
             messages=[{"role": "user", "content": prompt}],
-            stream=False
+            cache_route='create_position'
         )
         response = json.loads(response)
         logger.info(f"解析岗位信息，结果为：{response}")
@@ -181,6 +183,8 @@ class InterviewCoreService:
             try:
                 loop.run_until_complete(coro)
             finally:
+                # 关闭该事件循环中创建的大模型HTTP连接池
+                loop.run_until_complete(aclose_async_http_client())
                 loop.close()
         
         thread = threading.Thread(target=run)
@@ -354,9 +358,8 @@ class InterviewCoreService:
         问题：{question.question}
         评分标准：{question.score_standard}
         """
-        return self.llm.chat(
+        return await self.llm.achat(
             messages=[
                 {"role": "system", "content": "请根据以下问题和评分标准，生成一个高分示例答案"},
-                {"role": "user", "content": prompt}],
-            stream=False
+                {"role": "user", "content": prompt}]
         )
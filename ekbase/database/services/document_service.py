@@ -1,4 +1,4 @@
-from typing import List
+from typing import List, Optional
 from ekbase.database.utils import Database
 from ekbase.database.models.document import Document
 
@@ -36,4 +36,9 @@ class DocumentService:
     def get_by_id(self, document_id: str) -> Document:
         query = "SELECT * FROM documents WHERE id = ?"
         cursor = self.db.execute(query, (document_id,))
-        return Document.from_dict(dict(cursor.fetchone()))
\ No newline at end of file
+        return Document.from_dict(dict(cursor.fetchone()))
+    def get_by_file_path(self, file_path: str) -> Optional[Document]:
+        query = "SELECT * FROM documents WHERE file_path = ?"
+        cursor = self.db.execute(query, (file_path,))
+        row = cursor.fetchone()
+        return Document.from_dict(dict(row)) if row else None
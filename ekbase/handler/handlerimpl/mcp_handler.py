@@ -16,7 +16,7 @@ class MCPHandler(PromptHandler):
         self.mcp_core_service = MCPCoreService()
 
     def get_next_handler(self) -> 'PromptHandler':
-        return FinalHandler(self.chat_request)
+        return FinalHandler(self.chat_request, self.process_model)
 
     async def build_prompt(self) -> str:
         if self.chat_request.mcp:
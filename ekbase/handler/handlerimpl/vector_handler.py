@@ -2,22 +2,67 @@ from ekbase.core.models.chat_request import ChatRequest
 from ekbase.handler.prompt_handler import PromptHandler
 from ekbase.handler.handlerimpl.web_search_handler import WebSearchHandler
 from ekbase.core.models.prompt_process_model import PromptProcessModel
+from ekbase.core.services.document_core_service import DocumentCoreService
+from ekbase.config import RAG, RERANK
+from common.utils.context_utils import pack_context, format_context
+import logging
+
+logger = logging.getLogger(__name__)
 
 class VectorHandler(PromptHandler):
     def __init__(self, chat_request: ChatRequest, process_model: PromptProcessModel):
         super().__init__(chat_request, process_model)
 
     def get_next_handler(self) -> 'PromptHandler':
-        return WebSearchHandler(self.chat_request)
+        return WebSearchHandler(self.chat_request, self.process_model)
+
+    async def retrieve(self, query: str) -> str:
+        """
+        从向量数据库检索并打包上下文: 召回候选、交叉编码器重排序、去重、截断到 token 预算
+
+        重排序繁忙、超时或失败时跳过，直接使用向量检索的顺序
+        """
+        document_core_service = DocumentCoreService()
+        reranker = document_core_service.reranker
+        top_k = RAG.get('top_k', 8)
+        # 启用重排序时召回更多候选
+        candidate_k = max(RERANK.get('candidate_k', top_k), top_k) if reranker else top_k
+        results = await document_core_service.asearch_document(query, candidate_k)
+
+        score_key, min_score = "score", RAG.get('min_score', 0.0)
+        if reranker and results:
+            try:
+                results = await reranker.arerank(query, results, top_k, timeout=RERANK.get('timeout'))
+                score_key, min_score = "rerank_score", RERANK.get('min_score', 0.0)
+            except Exception as e:
+                logger.warning(f"跳过重排序: {str(e)}")
+                results = results[:top_k]
+
+        packed = pack_context(
+            results,
+            max_tokens=RAG.get('max_context_tokens', 2000),
+            min_score=min_score,
+            dedupe_threshold=RAG.get('dedupe_threshold', 0.85),
+            min_chunk_tokens=RAG.get('min_chunk_tokens', 32),
+            score_key=score_key
+        )
+        logger.debug(f"向量检索结果 {len(results)} 条，放入上下文 {len(packed)} 条，"
+                     f"共 {sum(result['tokens'] for result in packed)} tokens")
+        return format_context(packed, score_key)
 
-    def get_prompt(self) -> str:
-        # TODO: 从向量数据库中获取上下文
+    async def build_prompt(self) -> str:
         if self.chat_request.vector_db:
-            prompt = f"向量数据库中的上下文信息：\n未获取到上下文\n\n"
+            try:
+                context = await self.retrieve(self.chat_request.query)
+            except Exception as e:
+                # 检索失败(繁忙/超时等)时不影响后续处理器，按没有上下文继续
+                logger.error(f"向量检索失败: {str(e)}")
+                context = ""
+            prompt = f"向量数据库中的上下文信息：\n{context or '未获取到上下文'}\n\n"
         else:
             prompt = ""
         self.process_model.prompt += (prompt + "\n")
-        return prompt + self.get_next_handler().get_prompt()
+        return prompt + await self.get_next_handler().build_prompt()
     
     def get_process_model(self) -> PromptProcessModel:
-        return self.process_model
\ No newline at end of file
+        return self.process_model
@@ -15,11 +15,11 @@ class WebSearchHandler(PromptHandler):
         super().__init__(chat_request, process_model)
 
     def get_next_handler(self) -> 'PromptHandler':
-        return MCPHandler(self.chat_request)
+        return MCPHandler(self.chat_request, self.process_model)
 
     async def build_prompt(self) -> str:
         if self.chat_request.web_search:
-            prompt = "Web搜索结果：\n" + await self.perform_web_search(self.chat_request.web_search)
+            prompt = "Web搜索结果：\n" + await self.perform_web_search(self.chat_request.query)
         else:
             prompt = ""
         self.process_model.prompt += (prompt + "\n")
@@ -27,7 +27,7 @@ class WebSearchHandler(PromptHandler):
 
     # Perform web search (optional, retained for flexibility)
     # https://open.bochaai.com/overview
-    async def perform_web_search(query: str):
+    async def perform_web_search(self, query: str):
         try:
             api_key = WEB_SEARCH['api_key']
             if not api_key:
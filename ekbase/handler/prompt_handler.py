@@ -5,9 +5,12 @@ from ekbase.core.models.prompt_process_model import PromptProcessModel
 class PromptHandler(ABC):
     def __init__(self, chat_request: ChatRequest, process_model: PromptProcessModel):
         self.chat_request = chat_request
+        # 同一条处理链上的处理器共享 process_model，只在未初始化时设置默认值
         if process_model:
-            process_model.is_end = False 
-            process_model.prompt = ""
+            if process_model.is_end is None:
+                process_model.is_end = False
+            if process_model.prompt is None:
+                process_model.prompt = ""
         self.process_model = process_model
 
     @abstractmethod
@@ -19,6 +19,7 @@ from ekbase.api import api_router
 from ekbase.database.init_db import init_database
 from ekbase.core.services.document_core_service import DocumentCoreService
 from ekbase.config import SERVER, LOGGING, CORS, LLM
+from common.utils.http_utils import aclose_http_clients
 
 
 def init():
@@ -34,16 +35,16 @@ def init():
         logger.info(f"日志文件存储位置: {LOGGING['log_dir']}")
         logger.debug(f"环境变量文件路径: {env_path}")
         logger.debug(f"环境变量文件是否存在: {env_path.exists()}")
-        logger.debug(f'api_key:{LLM['api_key']}')
+        logger.debug(f"api_key:{LLM['api_key']}")
         
         # 初始化数据库
         init_database()
         logger.info("初始化数据库成功")
         
-        # 初始化文档服务
+        # 初始化文档服务: 模型加载和文档向量化在后台进行，服务立即可用，进度见 /api/v1/ready
         document_service = DocumentCoreService()
-        document_service.load_documents()
-        logger.info("初始化文档服务成功")
+        document_service.start_background_loading()
+        logger.info("文档服务开始后台加载")
         
     except Exception as e:
         logger.error(f"初始化失败: {str(e)}", exc_info=True)
@@ -69,6 +70,9 @@ async def lifespan(app: FastAPI):
         # 清理其他资源
         if hasattr(app.state, 'llm_utils'):
             app.state.llm_utils._cleanup()
+
+        # 关闭大模型HTTP连接池
+        await aclose_http_clients()
         
         logger.info("资源清理完成")
     except Exception as e:
@@ -24,11 +24,13 @@ setup(
         "torch>=2.0.0",
         "openai>=1.0",
         "anthropic>=0.35.0",
+        "httpx>=0.23.0",
         "python-multipart>=0.0.10",
         "fastmcp>=2.2.5",
         "openai-whisper>=1.0.0",
         "psutil>=6.0.0",
-        "vosk>=0.3.4"
+        "vosk>=0.3.4",
+        "jieba>=0.42.1"
     ],
     python_requires=">=3.8",
     # 支持本地开发
@@ -45,6 +47,10 @@ setup(
             "flake8>=6.0.0",
             "mypy>=1.0.0",
         ],
+        # 重排序模型使用 ONNX 后端
+        "onnx": [
+            "optimum[onnxruntime]>=1.16.0",
+        ],
     },
     classifiers=[
         "Development Status :: 5 - Production/Stable",
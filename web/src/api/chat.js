@@ -55,22 +55,43 @@ export const createEventSource = (params) => {
   return response
 }
 
+// 解析SSE流: 按空行切分帧，每帧把 data: 后的内容(JSON字符串)交给 onData
+// 一次读取可能包含多帧，也可能只有半帧，未结束的部分留到下一次读取
 export const handleStreamResponse = async (stream, onData, onError, onComplete) => {
   try {
     const reader = stream.getReader()
     const decoder = new TextDecoder()
-    
+    let buffer = ''
+
+    const emitFrames = () => {
+      let boundary
+      while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+        const frame = buffer.slice(0, boundary)
+        buffer = buffer.slice(boundary + 2)
+        const data = frame
+          .split('\n')
+          .filter(line => line.startsWith('data:'))
+          .map(line => line.slice(5).trimStart())
+          .join('\n')
+        if (data) {
+          onData?.(data)
+        }
+      }
+    }
+
     while (true) {
       const { done, value } = await reader.read()
       if (done) {
+        buffer += decoder.decode()
+        emitFrames()
         onComplete?.()
         break
       }
-      
-      const chunk = decoder.decode(value)
-      onData?.(chunk)
+
+      buffer += decoder.decode(value, { stream: true })
+      emitFrames()
     }
   } catch (error) {
     onError?.(error)
   }
-} 
\ No newline at end of file
+}